@@ -0,0 +1,305 @@
+"""
+Shared audio capture service.
+
+One persistent capture thread reads from the input device (or a file or
+generator standing in for it) and writes 16-bit mono PCM into a ring buffer.
+Wake-word detection and command recording each read from that buffer through
+their own reader, at whatever frame size they need, so there is no device
+open/close at the hand-off and recording can start from audio that was
+captured before it was asked for.
+
+The ring buffer is single-producer / multi-consumer and lock-free on the data
+path: the writer only ever advances a monotonically increasing sample count,
+and readers validate after copying that the writer has not lapped them.
+"""
+
+import logging
+import threading
+import time
+import wave
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 512  # Porcupine's frame length at 16 kHz
+
+
+class RingBuffer:
+    """Fixed-size int16 ring buffer addressed by absolute sample position."""
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.int16)
+        self.written = 0  # total samples ever written; only the writer updates it
+        self._reserved = 0  # end of the write in progress; slots behind it minus capacity are stale
+
+    def write(self, samples):
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        # Announce the slots about to be overwritten before touching them.
+        self._reserved = self.written + n
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:]
+        # Publish only after the samples are in place.
+        self.written += n
+
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def read(self, position, n):
+        """
+        Copy n samples starting at an absolute position.
+
+        Returns:
+            numpy.ndarray|None: the samples, or None if the writer overwrote
+                                them before or during the copy
+        """
+        if position < self.oldest() or position + n > self.written:
+            return None
+        start = position % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty(n, dtype=np.int16)
+        out[:first] = self._data[start:start + first]
+        if first < n:
+            out[first:] = self._data[:n - first]
+        if position < self._reserved - self.capacity:
+            return None
+        return out
+
+
+class CaptureReader:
+    """An independent read cursor into a CaptureService's ring buffer."""
+
+    def __init__(self, service, position):
+        self.service = service
+        self.position = position
+        self.dropped = 0
+
+    @property
+    def available(self):
+        return self.service.ring.written - self.position
+
+    def read(self, n, timeout=None):
+        """
+        Return the next n samples as raw PCM bytes, waiting for them if needed.
+
+        Raises:
+            EOFError: the source ended before n more samples were captured
+            TimeoutError: timeout elapsed first
+        """
+        service = self.service
+        ring = service.ring
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            oldest = ring.oldest()
+            if self.position < oldest:
+                # Fell more than a buffer behind: skip ahead rather than block capture.
+                self.dropped += oldest - self.position
+                self.position = oldest
+            if ring.written - self.position >= n:
+                samples = ring.read(self.position, n)
+                if samples is not None:
+                    self.position += n
+                    return samples.tobytes()
+                continue
+            if service.finished:
+                raise EOFError("capture source ended")
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"no audio within {timeout}s")
+            service.wait_for_data(self.position + n, remaining)
+
+    def chunks(self, n):
+        """Yield n-sample chunks until the source ends."""
+        while True:
+            try:
+                yield self.read(n)
+            except EOFError:
+                return
+
+
+class MicrophoneSource:
+    """Reads frames from the default PyAudio input device."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_size=FRAME_SIZE):
+        import pyaudio
+        self.frame_size = frame_size
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(format=pyaudio.paInt16,
+                                     channels=1,
+                                     rate=sample_rate,
+                                     input=True,
+                                     frames_per_buffer=frame_size)
+
+    def read(self):
+        return self._stream.read(self.frame_size, exception_on_overflow=False)
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pa.terminate()
+
+
+class WavFileSource:
+    """Reads frames from a 16-bit mono WAV file, optionally paced like a live device."""
+
+    def __init__(self, path, frame_size=FRAME_SIZE, realtime=False):
+        self.frame_size = frame_size
+        self.realtime = realtime
+        self._wf = wave.open(path, "rb")
+        if self._wf.getnchannels() != 1 or self._wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit mono audio")
+        self.sample_rate = self._wf.getframerate()
+
+    def read(self):
+        data = self._wf.readframes(self.frame_size)
+        if self.realtime and data:
+            time.sleep(len(data) / 2 / self.sample_rate)
+        return data
+
+    def close(self):
+        self._wf.close()
+
+
+class IterableSource:
+    """Adapts any iterable of PCM byte chunks (e.g. a generator) to a capture source."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def read(self):
+        return next(self._chunks, b"")
+
+    def close(self):
+        pass
+
+
+class CaptureService:
+    """
+    Persistent capture thread feeding a ring buffer that any number of readers share.
+
+    A source is any object with read() -> bytes (empty at end of stream) and
+    close(). Defaults to the microphone.
+    """
+
+    def __init__(self, source=None, sample_rate=SAMPLE_RATE, frame_size=FRAME_SIZE, buffer_seconds=10.0):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self._source = source
+        self.ring = RingBuffer(int(buffer_seconds * sample_rate))
+        self.finished = False
+        self._running = False
+        self._thread = None
+        self._data_ready = threading.Condition()
+        self.error = None
+
+    def start(self):
+        if self._running:
+            return self
+        if self._source is None:
+            self._source = MicrophoneSource(self.sample_rate, self.frame_size)
+        elif not hasattr(self._source, "read"):
+            self._source = IterableSource(self._source)
+        self._running = True
+        self.finished = False
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while self._running:
+                data = self._source.read()
+                if not data:
+                    break
+                self.ring.write(np.frombuffer(data, dtype=np.int16))
+                with self._data_ready:
+                    self._data_ready.notify_all()
+        except Exception as e:
+            self.error = e
+            logger.error("Audio capture stopped: %s", e)
+        finally:
+            self.finished = True
+            self._source.close()
+            with self._data_ready:
+                self._data_ready.notify_all()
+
+    def wait_for_data(self, target, timeout=None):
+        """Block until `target` samples have been written in total, or capture ends."""
+        with self._data_ready:
+            self._data_ready.wait_for(lambda: self.finished or self.ring.written >= target, timeout)
+
+    def join(self, timeout=None):
+        """Wait for a finite source (file, generator) to be fully captured."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def reader(self, rewind_seconds=0.0, position=None):
+        """
+        Create a reader starting at `position` (default: now), moved back by
+        `rewind_seconds` of already-captured audio where the buffer still has it.
+        """
+        if position is None:
+            position = self.ring.written
+        position -= int(rewind_seconds * self.sample_rate)
+        return CaptureReader(self, max(position, self.ring.oldest()))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def utterance_chunks(reader, vad, sample_rate=SAMPLE_RATE, silence_duration=2.0, chunk_size=1024):
+    """
+    Yield the PCM chunks of one spoken command read from a capture reader.
+
+    Waits for the VAD to detect speech (yielding its pre-roll first, so the
+    first syllable survives) and stops after `silence_duration` of silence.
+    """
+    vad.reset()
+    logger.info("(Waiting for you to start speaking...)")
+    for data in reader.chunks(chunk_size):
+        if vad.process(data):
+            logger.info("Speech detected. Recording...")
+            for chunk in vad.take_pre_roll():
+                yield chunk
+            yield data
+            break
+    else:
+        return
+    silent_chunks = 0
+    required_silent_chunks = int((sample_rate / chunk_size) * silence_duration)
+    for data in reader.chunks(chunk_size):
+        yield data
+        if vad.process(data):
+            silent_chunks = 0
+        else:
+            silent_chunks += 1
+        if silent_chunks > required_silent_chunks:
+            logger.info("Silence detected. Stopping recording.")
+            break
+
+
+_capture = None
+_capture_lock = threading.Lock()
+
+
+def get_capture():
+    """Return the process-wide microphone capture service, starting it on first use."""
+    global _capture
+    with _capture_lock:
+        if _capture is None:
+            _capture = CaptureService().start()
+    return _capture
@@ -0,0 +1,146 @@
+"""
+Barge-in: let the user talk over the assistant.
+
+While a turn is being answered (the LLM generating, speech synthesising and
+playing), a BargeInMonitor keeps reading the shared capture service and runs
+its own VAD on the audio. When the user speaks, playback is stopped, the
+turn's task is cancelled (which cancels the in-flight LLM and TTS work) and
+the ring-buffer position where the speech began is handed back, so the next
+command is recorded from there straight away, without pressing Enter and
+without losing its first syllable.
+
+The speaker leaks into the microphone, so the detector is stricter than the
+one used for recording: a higher threshold, and the speech has to last
+BARGE_IN_MIN_SPEECH_MS before it counts. Headphones (or a device with echo
+cancellation) make it more reliable; BARGE_IN=0 turns it off.
+
+Configuration (read by BargeInMonitor.from_env):
+    BARGE_IN                  "1" to listen during replies, "0" to disable (default "1")
+    BARGE_IN_THRESHOLD_RATIO  speech threshold as a multiple of the noise floor (default 4.0)
+    BARGE_IN_MIN_THRESHOLD    lowest RMS threshold, in 16-bit sample units (default 600)
+    BARGE_IN_MIN_SPEECH_MS    how long speech must last to interrupt (default 250)
+    BARGE_IN_REWIND_MS        audio kept from before the speech onset for the next command (default 500)
+"""
+
+import asyncio
+import logging
+import os
+import threading
+
+from vad import EnergyVAD
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024
+
+
+def enabled():
+    return os.getenv("BARGE_IN", "1") == "1"
+
+
+class BargeInMonitor:
+    """Watches a capture service for speech while a turn runs, and interrupts it."""
+
+    def __init__(self, capture, player=None, vad=None, min_speech_ms=250, rewind_ms=500, chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            capture (CaptureService): the running capture service
+            player (playback.Player|None): stopped as soon as speech is detected
+            vad: voice-activity detector; defaults to a strict EnergyVAD without hangover
+            min_speech_ms (int): continuous speech needed before interrupting
+            rewind_ms (int): audio before the onset included in the returned position
+            chunk_size (int): samples per VAD chunk
+        """
+        self.capture = capture
+        self.player = player
+        self.chunk_size = chunk_size
+        self.vad = vad if vad is not None else EnergyVAD(capture.sample_rate, chunk_size, threshold_ratio=4.0,
+                                                         min_threshold=600, hangover_ms=0, pre_roll_ms=0)
+        chunk_ms = 1000.0 * chunk_size / capture.sample_rate
+        self.min_speech_chunks = max(1, int(round(min_speech_ms / chunk_ms)))
+        self.rewind = int(rewind_ms * capture.sample_rate / 1000)
+
+    @classmethod
+    def from_env(cls, capture, player=None):
+        vad = EnergyVAD(capture.sample_rate, CHUNK_SIZE,
+                        threshold_ratio=float(os.getenv("BARGE_IN_THRESHOLD_RATIO", "4.0")),
+                        min_threshold=float(os.getenv("BARGE_IN_MIN_THRESHOLD", "600")),
+                        hangover_ms=0, pre_roll_ms=0)
+        return cls(capture, player, vad,
+                   min_speech_ms=int(os.getenv("BARGE_IN_MIN_SPEECH_MS", "250")),
+                   rewind_ms=int(os.getenv("BARGE_IN_REWIND_MS", "500")))
+
+    def watch(self, done, position=None):
+        """
+        Block until speech is heard or `done` is set.
+
+        Args:
+            done (threading.Event): set by the caller when the turn is over
+            position (int|None): ring-buffer position to start listening from (default: now)
+
+        Returns:
+            int|None: where the next command should be recorded from, or None
+                      if nobody spoke (or the capture source ended)
+        """
+        # Start a little early: the command that was just recorded ended in
+        # silence, which is what the VAD should calibrate its noise floor on.
+        calibration = getattr(self.vad, "calibration_chunks", 0) * self.chunk_size
+        reader = self.capture.reader(calibration / self.capture.sample_rate, position)
+        self.vad.reset()
+        speech_chunks = 0
+        while not done.is_set():
+            try:
+                data = reader.read(self.chunk_size, timeout=0.1)
+            except TimeoutError:
+                continue
+            except EOFError:
+                return None
+            if not self.vad.process(data):
+                speech_chunks = 0
+                continue
+            speech_chunks += 1
+            if speech_chunks >= self.min_speech_chunks:
+                onset = reader.position - speech_chunks * self.chunk_size
+                return max(onset - self.rewind, self.capture.ring.oldest())
+        return None
+
+    async def guard(self, task, position=None):
+        """
+        Await a turn's task, interrupting it if the user starts speaking.
+
+        Args:
+            task (asyncio.Task): the turn being answered
+            position (int|None): ring-buffer position to listen from (default: now)
+
+        Returns:
+            tuple: (the task's result, or None if it was interrupted;
+                    the position to record the next command from, or None)
+        """
+        if position is None:
+            # Listen from the moment the turn began, however long the thread takes to start
+            position = self.capture.ring.written
+        done = threading.Event()
+        watcher = asyncio.create_task(asyncio.to_thread(self.watch, done, position))
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            task.cancel()
+            raise
+        finally:
+            done.set()
+        if task.done():
+            # Answered first; speech already under way still starts the next command
+            resume = await watcher
+            return task.result(), resume
+        resume = watcher.result()
+        if resume is None:
+            return await task, None
+        logger.info("✋ Heard you - stopping")
+        if self.player is not None:
+            self.player.stop()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return None, resume
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the voice pipeline.
+
+Each command in a corpus of WAV recordings is played into the capture service
+as if it came from the microphone, and goes through the same code as a
+spoken command: elven.run_command (VAD, streaming Whisper, intent, handler,
+reply and speech) with the backends from elven.build_backends. Every remote
+service is replaced by a local stand-in running in this process:
+
+    Phi-2        mock_phi2_server.py
+    OpenRouter   openrouter_stub.py
+    Todoist      todoist_stub.py
+    OpenWeather  weather_stub.py
+    Edge TTS     StubTTS below (WAV audio of a plausible length)
+
+and audio is "played" to a sink that notes when the first sample arrives.
+
+Reports word error rate, intent and entity accuracy, and latency
+distributions (p50/p95/p99) end to end, from end of speech to first audio,
+and per stage (the tracing.py spans). Results can be saved as a baseline and
+later runs compared against it; the exit status is 1 on a regression.
+
+The corpus manifest (bench_corpus/manifest.jsonl) has one command per line:
+    {"id": ..., "audio": "x.wav", "transcript": ..., "intent": ...,
+     "task"/"due"/"location": expected entities (optional)}
+Generate the WAVs once with --make-corpus (Edge TTS voices when online,
+synthetic speech-like audio otherwise).
+
+Without Whisper installed (or with --transcriber oracle) transcription is
+simulated: the oracle returns the manifest transcript after decoding for a
+fraction of the audio's duration. WER is not measured in that mode.
+
+Usage:
+    python3 bench_e2e.py --make-corpus [--voice edge|synthetic]
+    python3 bench_e2e.py [--fast] [--save-baseline bench_e2e_baseline.json]
+    python3 bench_e2e.py --baseline bench_e2e_baseline.json [--latency-tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+import audio_capture
+import logs
+import tracing
+
+CORPUS_MANIFEST = os.path.join("bench_corpus", "manifest.jsonl")
+CORPUS_RATE = audio_capture.SAMPLE_RATE
+ENTITY_FIELDS = ("task", "due", "location")
+TODOIST_TOKEN = "bench-token"
+SEED_TASKS = [("pay rent", "today"), ("book dentist", "tomorrow"), ("renew car insurance", None),
+              ("plan team offsite", "friday"), ("return library books", "today"), ("fix bike", None)]
+
+
+def load_manifest(path=CORPUS_MANIFEST):
+    base = os.path.dirname(path)
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    for entry in entries:
+        entry["path"] = os.path.join(base, entry["audio"])
+    return entries
+
+
+# --- Corpus generation -------------------------------------------------------
+
+def _write_wav(path, samples, rate=CORPUS_RATE):
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.clip(samples, -32768, 32767).astype(np.int16).tobytes())
+
+
+def _pad(speech, rng, lead=0.6, tail=1.5):
+    """Room noise before and after the speech, so the VAD can calibrate and then hear the end."""
+    noise = lambda seconds: rng.normal(0, 120, int(CORPUS_RATE * seconds))
+    return np.concatenate([noise(lead), speech + rng.normal(0, 120, len(speech)), noise(tail)])
+
+
+def synthetic_speech(text, rng):
+    """Voiced bursts, one per word: enough for the VAD, not for a real recogniser."""
+    parts = []
+    for word in text.split():
+        n = int(CORPUS_RATE * (0.12 + 0.06 * len(word)))
+        t = np.arange(n) / CORPUS_RATE
+        pitch = rng.uniform(110, 220)
+        envelope = np.sin(np.pi * np.arange(n) / n)
+        parts.append(6000 * envelope * (np.sin(2 * np.pi * pitch * t) + 0.4 * np.sin(4 * np.pi * pitch * t)))
+        parts.append(np.zeros(int(CORPUS_RATE * 0.07)))
+    return np.concatenate(parts)
+
+
+def edge_speech(text):
+    import miniaudio
+    import tts
+
+    mp3 = asyncio.run(tts.synthesize_edge(text))
+    decoded = miniaudio.decode(mp3, output_format=miniaudio.SampleFormat.SIGNED16, nchannels=1,
+                               sample_rate=CORPUS_RATE)
+    return np.frombuffer(decoded.samples.tobytes(), dtype=np.int16).astype(np.float64)
+
+
+def make_corpus(entries, voice="edge"):
+    rng = np.random.default_rng(0)
+    for entry in entries:
+        speech = None
+        if voice == "edge":
+            try:
+                speech = edge_speech(entry["transcript"])
+            except Exception as e:
+                print(f"[INFO] Edge TTS unavailable ({e}); using synthetic audio")
+                voice = "synthetic"
+        if speech is None:
+            speech = synthetic_speech(entry["transcript"], rng)
+        _write_wav(entry["path"], _pad(speech, rng))
+    print(f"✅ Wrote {len(entries)} {voice} recordings next to {CORPUS_MANIFEST}")
+    return voice
+
+
+# --- Local stand-ins ---------------------------------------------------------
+
+class OracleWhisper:
+    """Whisper stand-in: returns the expected transcript after a decode of rtf x the audio length."""
+
+    def __init__(self, rtf=0.1):
+        self.rtf = rtf
+        self.text = ""
+
+    def transcribe(self, audio, language=None, **options):
+        seconds = len(audio) / CORPUS_RATE
+        time.sleep(self.rtf * seconds)
+        return {"text": " " + self.text,
+                "segments": [{"start": 0.0, "end": seconds, "text": " " + self.text}]}
+
+
+class StubTTS:
+    """Edge TTS stand-in: WAV audio of about the length speech of the text would take."""
+
+    def __init__(self, first_chunk_ms=150.0, chars_per_second=15.0, rate=24000):
+        self.first_chunk_ms = first_chunk_ms
+        self.chars_per_second = chars_per_second
+        self.rate = rate
+
+    def _wav(self, text):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.rate)
+            wf.writeframes(bytes(2 * int(self.rate * max(len(text), 1) / self.chars_per_second)))
+        return buffer.getvalue()
+
+    async def stream(self, text, voice=None):
+        await asyncio.sleep(self.first_chunk_ms / 1000)
+        audio = self._wav(text)
+        for i in range(0, len(audio), 4096):
+            yield audio[i:i + 4096]
+
+    async def synthesize(self, text, voice=None):
+        return b"".join([chunk async for chunk in self.stream(text, voice)])
+
+
+class TimingSink:
+    """Playback sink that notes when the first audio of a turn arrives, optionally paced like a speaker."""
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self.first_audio = None
+        self.sample_rate = 24000
+
+    def open(self, sample_rate):
+        self.sample_rate = sample_rate
+
+    def write(self, pcm):
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+        if self.realtime:
+            time.sleep(len(pcm) / 2 / self.sample_rate)
+
+    def drain(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class TurnCollector:
+    """tracing exporter that keeps the finished turns in memory."""
+
+    def __init__(self):
+        self.turns = []
+
+    def export(self, turn, origin):
+        self.turns.append(turn)
+
+
+@contextlib.contextmanager
+def local_services(args):
+    """Start every stand-in and point elven at them. Yields the configured elven module."""
+    os.environ["TTS_CACHE"] = "0"
+    os.environ["TODOIST_QUEUE_DB"] = os.path.join(tempfile.mkdtemp(prefix="bench_e2e_"), "queue.db")
+    os.environ["MOCK_MODEL_LATENCY_MS"] = str(args.phi2_ms)
+
+    import elven
+    import http_pool
+    import mock_phi2_server
+    import openrouter_stub
+    import playback
+    import todoist_stub
+    import tts
+    import weather_stub
+    from stub_server import serve
+
+    mock_phi2_server.MODEL_LATENCY_MS = args.phi2_ms
+    openrouter_stub.stub.first_token_ms = args.llm_first_token_ms
+    openrouter_stub.stub.token_ms = args.llm_token_ms
+    todoist_stub.stub.reset()
+    todoist_stub.stub.token = TODOIST_TOKEN
+    for content, due in SEED_TASKS:
+        todoist_stub.stub.add_task(content, due_string=due)
+    weather_stub.stub.reset()
+
+    stub_tts = StubTTS(first_chunk_ms=args.tts_first_chunk_ms)
+    tts.stream_edge = stub_tts.stream
+    tts.synthesize_edge = stub_tts.synthesize
+    playback._player = playback.Player(TimingSink(realtime=not args.fast), source_format="wav")
+
+    with serve(mock_phi2_server.app) as phi2_url, serve(openrouter_stub.app) as openrouter_url, \
+            serve(todoist_stub.app) as todoist_url, serve(weather_stub.app) as weather_url:
+        http_pool.configure("phi2", phi2_url, timeout=30, retry_methods=("GET", "POST"), retry_reads=False,
+                            headers={"Content-Type": "application/json"})
+        http_pool.configure("todoist", todoist_url, timeout=10)
+        http_pool.configure("openweathermap", weather_url, timeout=10)
+        elven.OPENROUTER_BASE_URL = f"{openrouter_url}/api/v1"
+        elven.OPENROUTER_API_KEY = "bench-key"
+        elven.OPENWEATHERMAP_API_KEY = "bench-key"
+        elven.TODOIST_API_TOKEN = TODOIST_TOKEN
+        yield elven
+
+
+# --- Scoring -----------------------------------------------------------------
+
+def words(text):
+    return re.sub(r"[^\w\s']", " ", (text or "").lower()).split()
+
+
+def edit_distance(reference, hypothesis):
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def word_error_rate(pairs):
+    """Corpus WER over (reference, hypothesis) pairs: total word edits / total reference words."""
+    edits = total = 0
+    for reference, hypothesis in pairs:
+        ref = words(reference)
+        edits += edit_distance(ref, words(hypothesis))
+        total += len(ref)
+    return edits / total if total else 0.0
+
+
+def entity_matches(entry, classified):
+    """(matched, expected) counts for the entities the manifest lists."""
+    expected = [field for field in ENTITY_FIELDS if entry.get(field)]
+    matched = sum(1 for field in expected
+                  if " ".join(words(classified.get(field))) == " ".join(words(entry[field])))
+    return matched, len(expected)
+
+
+def summarise(results, turns, transcriber):
+    latencies = {}
+    for turn in turns:
+        for span in turn.spans:
+            latencies.setdefault(span.name, tracing.Histogram()).add(span.duration_ms)
+        latencies.setdefault("turn", tracing.Histogram()).add(turn.duration_ms)
+    for result in results:
+        if result["response_ms"] is not None:
+            latencies.setdefault("response", tracing.Histogram()).add(result["response_ms"])
+    intents_ok = sum(result["intent_ok"] for result in results)
+    entities = [result["entities"] for result in results]
+    entity_total = sum(total for _, total in entities)
+    return {
+        "transcriber": transcriber,
+        "commands": len(results),
+        "wer": None if transcriber == "oracle" else round(
+            word_error_rate((r["transcript"], r["hypothesis"]) for r in results), 4),
+        "intent_accuracy": round(intents_ok / len(results), 4) if results else 0.0,
+        "entity_accuracy": round(sum(ok for ok, _ in entities) / entity_total, 4) if entity_total else 1.0,
+        "latency": {name: histogram.summary() for name, histogram in sorted(latencies.items())},
+        "commands_detail": results,
+    }
+
+
+def compare(current, baseline, latency_tolerance=0.25, min_latency_ms=20.0, accuracy_tolerance=0.0,
+            wer_tolerance=0.01):
+    """
+    Regressions of `current` against `baseline`.
+
+    Latency p50/p95 may grow by latency_tolerance (a fraction) and at least
+    min_latency_ms before it counts, so scheduling noise on fast stages is
+    ignored. Accuracy may drop by accuracy_tolerance, WER rise by wer_tolerance.
+
+    Returns:
+        list: one line per regression (empty if none)
+    """
+    regressions = []
+    for metric in ("intent_accuracy", "entity_accuracy"):
+        if current[metric] < baseline[metric] - accuracy_tolerance:
+            regressions.append(f"{metric} fell from {baseline[metric]:.1%} to {current[metric]:.1%}")
+    if current.get("wer") is not None and baseline.get("wer") is not None \
+            and current["wer"] > baseline["wer"] + wer_tolerance:
+        regressions.append(f"WER rose from {baseline['wer']:.1%} to {current['wer']:.1%}")
+    for name, before in baseline.get("latency", {}).items():
+        after = current["latency"].get(name)
+        if after is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            limit = max(before[key] * (1 + latency_tolerance), before[key] + min_latency_ms)
+            if after[key] > limit:
+                regressions.append(f"{name} {key[:3]} rose from {before[key]:.1f} ms to {after[key]:.1f} ms")
+    return regressions
+
+
+# --- Running -----------------------------------------------------------------
+
+async def run_corpus(elven, entries, oracle, silence, fast):
+    import pipeline
+    import playback
+
+    backends = elven.build_backends()
+    classify = backends.classify
+    classified = []
+
+    def recording_classify(text):
+        result = classify(text)
+        classified.append(result)
+        return result
+
+    backends.classify = recording_classify
+    sink = playback.get_player().sink
+    results = []
+    for entry in entries:
+        if oracle is not None:
+            oracle.text = entry["transcript"]
+        classified.clear()
+        sink.first_audio = None
+        capture = audio_capture.CaptureService(audio_capture.WavFileSource(entry["path"], realtime=not fast))
+        with capture:
+            turn = await elven.run_command(backends, capture=capture, silence_duration=silence, start_position=0)
+        intent_data = classified[-1] if classified else dict(pipeline.NULL_INTENT)
+        results.append({"id": entry["id"], "transcript": entry["transcript"],
+                        "hypothesis": turn["transcription"], "expected_intent": entry["intent"],
+                        "intent": turn["intent"], "intent_ok": turn["intent"] == entry["intent"],
+                        "entities": entity_matches(entry, intent_data), "classified": intent_data,
+                        "response": turn["response"], "first_audio": sink.first_audio, "response_ms": None})
+    return results
+
+
+def run_benchmark(args):
+    entries = load_manifest(args.manifest)[:args.limit or None]
+    missing = [entry["path"] for entry in entries if not os.path.exists(entry["path"])]
+    if missing:
+        raise SystemExit(f"[ERROR] {len(missing)} recordings missing (e.g. {missing[0]}); "
+                         f"run: python3 bench_e2e.py --make-corpus")
+
+    import transcriber as transcriber_module
+
+    transcriber = args.transcriber
+    if transcriber == "auto":
+        transcriber = "whisper" if importlib.util.find_spec("whisper") else "oracle"
+    oracle = None
+    if transcriber == "oracle":
+        oracle = OracleWhisper(rtf=args.oracle_rtf)
+        transcriber_module._engine = transcriber_module.TranscriptionEngine(loader=lambda name, device: oracle)
+    transcriber_module.preload()
+
+    collector = TurnCollector()
+    tracing.configure(export=collector)
+    log = io.StringIO()
+    logs.configure()
+    with local_services(args) as elven:
+        elven.TRANSCRIBE_MODE = "stream"
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            results = asyncio.run(run_corpus(elven, entries[:args.warmup] + entries, oracle,
+                                             args.silence, args.fast))
+            logs.flush()
+    # The warm-up commands pay for first-use imports and connection set-up; leave them out
+    results, turns = results[args.warmup:], collector.turns[args.warmup:]
+    for result, turn in zip(results, turns):
+        # End of speech (the VAD closing the recording) to the first reply audio
+        first_audio = result.pop("first_audio")
+        record = next((span for span in turn.spans if span.name == "record"), None)
+        if first_audio is not None and record is not None:
+            result["response_ms"] = round((first_audio - record.end) * 1000, 3)
+    return summarise(results, turns, transcriber)
+
+
+def print_report(summary, regressions=None):
+    print(f"📊 End-to-end benchmark: {summary['commands']} commands (transcriber: {summary['transcriber']})")
+    print("-" * 72)
+    wer = "n/a (oracle transcripts)" if summary["wer"] is None else f"{summary['wer']:.1%}"
+    print(f"Word error rate   : {wer}")
+    print(f"Intent accuracy   : {summary['intent_accuracy']:.1%}")
+    print(f"Entity accuracy   : {summary['entity_accuracy']:.1%}")
+    print()
+    print(tracing.format_stats(summary["latency"]))
+    misses = [r for r in summary["commands_detail"]
+              if not r["intent_ok"] or r["entities"][0] < r["entities"][1]]
+    if misses:
+        print("\nMisclassified:")
+        for r in misses:
+            entities = {field: r["classified"].get(field) for field in ENTITY_FIELDS if r["classified"].get(field)}
+            print(f"  {r['id']:<16} expected {r['expected_intent']}, got {r['intent']} {entities}")
+    if regressions is not None:
+        print()
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against the baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+        else:
+            print("✅ No regressions against the baseline")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end voice pipeline benchmark")
+    parser.add_argument("--manifest", default=CORPUS_MANIFEST)
+    parser.add_argument("--make-corpus", action="store_true", help="generate the corpus WAVs and exit")
+    parser.add_argument("--voice", choices=["edge", "synthetic"], default="edge")
+    parser.add_argument("--transcriber", choices=["auto", "whisper", "oracle"], default="auto")
+    parser.add_argument("--oracle-rtf", type=float, default=0.1,
+                        help="oracle decode time as a fraction of the audio length")
+    parser.add_argument("--fast", action="store_true",
+                        help="feed audio and play replies as fast as possible instead of in real time")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N commands")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured commands run first")
+    parser.add_argument("--silence", type=float, default=0.8, help="seconds of silence that end a command")
+    parser.add_argument("--phi2-ms", type=float, default=150.0, help="simulated Phi-2 model time")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-token-ms", type=float, default=20.0)
+    parser.add_argument("--tts-first-chunk-ms", type=float, default=150.0)
+    parser.add_argument("--output", default="bench_e2e_results.json", help="full results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="save this run as the baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25,
+                        help="allowed fractional growth of p50/p95 latency")
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.0)
+    parser.add_argument("--verbose", action="store_true", help="show the assistant's own output")
+    args = parser.parse_args()
+
+    if args.make_corpus:
+        make_corpus(load_manifest(args.manifest), args.voice)
+        return 0
+
+    summary = run_benchmark(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    regressions = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(summary, baseline, args.latency_tolerance, accuracy_tolerance=args.accuracy_tolerance)
+    print_report(summary, regressions)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({key: value for key, value in summary.items() if key != "commands_detail"}, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Load test: intent server throughput and latency with and without micro-batching.
+
+Starts mock_phi2_server.py in a subprocess for each mode. Every request pays a
+simulated model cost (a fixed cost per forward pass plus a small cost per
+item, as on a GPU). Single /api/convert requests are then sent at increasing
+concurrency, and the script reports throughput and p50/p99 latency.
+
+Usage:
+    python3 bench_intent_batching.py [--concurrency 1,4,16,64] [--seconds 3]
+                                     [--pass-ms 20] [--item-ms 0.5] [--batch-wait-ms 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from bench_intent_fastpath import LABELLED_PHRASES
+from stub_server import free_port
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+def start_server(port, batch_wait_ms, pass_ms, item_ms):
+    env = dict(os.environ, MOCK_MODEL_LATENCY_MS=str(pass_ms), MOCK_MODEL_ITEM_MS=str(item_ms))
+    process = subprocess.Popen(
+        [sys.executable, "mock_phi2_server.py", "--host", "127.0.0.1", "--port", str(port),
+         "--batch-wait-ms", str(batch_wait_ms)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("mock server did not start")
+
+
+def load(url, concurrency, seconds):
+    """Run closed-loop clients for a fixed time; return (requests/s, latencies)."""
+    phrases = [p for p, _, _ in LABELLED_PHRASES]
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client(offset):
+        session = requests.Session()
+        mine = []
+        i = offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            session.post(f"{url}/api/convert", json={"text": phrases[i % len(phrases)]},
+                         timeout=30).raise_for_status()
+            mine.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            latencies.extend(mine)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(latencies) / (time.perf_counter() - started), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent server micro-batching load test")
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--pass-ms", type=float, default=20.0, help="simulated cost per model pass")
+    parser.add_argument("--item-ms", type=float, default=0.5, help="simulated cost per item in a pass")
+    parser.add_argument("--batch-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    print(f"📦 Intent server load test: {args.pass_ms:g} ms/pass + {args.item_ms:g} ms/item, "
+          f"{args.seconds:g} s per level")
+    print("-" * 72)
+    print(f"{'mode':<14}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, wait_ms in [("unbatched", 0), ("micro-batched", args.batch_wait_ms)]:
+        process, url = start_server(free_port(), wait_ms, args.pass_ms, args.item_ms)
+        try:
+            for concurrency in levels:
+                rps, latencies = load(url, concurrency, args.seconds)
+                print(f"{mode:<14}{concurrency:>8}{rps:>10.1f}"
+                      f"{1000 * percentile(latencies, 50):>10.1f}{1000 * percentile(latencies, 99):>10.1f}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
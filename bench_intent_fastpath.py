@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: how much intent traffic the local fast path takes off Phi-2.
+
+Runs a labelled phrase set through intent_rules.classify() and reports how
+many phrases were resolved locally, how accurate those local answers were,
+and the latency saved versus sending every phrase to the intent service.
+By default the mock Phi-2 server is started in-process; pass --url to
+measure against a running server (e.g. the real model) instead.
+
+Usage:
+    python3 bench_intent_fastpath.py [--threshold 0.9] [--url http://localhost:8000]
+"""
+
+import argparse
+import statistics
+import time
+
+import requests
+
+import intent_rules
+from stub_server import serve
+
+# (phrase, expected intent, expected entities)
+LABELLED_PHRASES = [
+    ("Add buy milk to my todo list", "add_task", {"task": "buy milk"}),
+    ("Add call mom tomorrow to my tasks", "add_task", {"task": "call mom", "due": "tomorrow"}),
+    ("Remind me to water the plants tonight", "add_task", {"task": "water the plants", "due": "tonight"}),
+    ("Remember to book the dentist on friday", "add_task", {"task": "book the dentist", "due": "friday"}),
+    ("Create a task to renew my passport next week", "add_task", {"task": "renew my passport", "due": "next week"}),
+    ("Please add pick up the dry cleaning", "add_task", {"task": "pick up the dry cleaning"}),
+    ("Add finish the report by monday", "add_task", {"task": "finish the report", "due": "monday"}),
+    ("Put pay the electricity bill on my to-do list", "add_task", {"task": "pay the electricity bill"}),
+    ("Remind me to check the weather in London", "add_task", {"task": "check the weather in London"}),
+    ("Add water the plants to my to do list today", "add_task", {"task": "water the plants", "due": "today"}),
+    ("Add milk on my shopping list", "add_task", {"task": "milk"}),
+    ("Add renew passport to my list", "add_task", {"task": "renew passport"}),
+    ("List my tasks", "list_tasks", {}),
+    ("Show me my todos", "list_tasks", {}),
+    ("What are my tasks for today?", "list_tasks", {}),
+    ("Read my to do list", "list_tasks", {}),
+    ("What's the weather in London?", "get_weather", {"location": "London"}),
+    ("What's the weather like in New York?", "get_weather", {"location": "New York"}),
+    ("Is it going to rain in Manchester tomorrow?", "get_weather", {"location": "Manchester"}),
+    ("What's the temperature in Tokyo right now", "get_weather", {"location": "Tokyo"}),
+    ("Weather forecast for Paris", "get_weather", {"location": "Paris"}),
+    ("What's the weather in Little Snoring?", "get_weather", {"location": "Little Snoring"}),
+    ("Is it sunny outside?", "get_weather", {}),
+    ("Send an email to John", "send_email", {}),
+    ("Write an email to the landlord about the boiler", "send_email", {}),
+    ("How are you today?", "conversation", {}),
+    ("Hello there", "conversation", {}),
+    ("Thank you", "conversation", {}),
+    ("Tell me a joke about wizards", "conversation", {}),
+    ("What is the capital of Peru?", "conversation", {}),
+    ("Who wrote the Lord of the Rings?", "conversation", {}),
+    ("Explain how rainbows form", "conversation", {}),
+    ("Put the kettle on", "conversation", {}),
+    ("Create a poem about dragons", "conversation", {}),
+    ("I need to sort out the garage at some point", "add_task", {"task": "sort out the garage"}),
+]
+
+
+def matches(result, intent, entities):
+    if result["intent"] != intent:
+        return False
+    return all((result.get(k) or "").lower() == v.lower() for k, v in entities.items())
+
+
+def mock_server():
+    """Run mock_phi2_server in a background thread and yield its base URL."""
+    from mock_phi2_server import app
+    return serve(app)
+
+
+def remote_latencies(url, phrases, repeats):
+    session = requests.Session()
+    latencies = {}
+    for phrase in phrases:
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            session.post(f"{url}/api/convert", json={"text": phrase}, timeout=30).raise_for_status()
+            samples.append(time.perf_counter() - start)
+        latencies[phrase] = statistics.median(samples)
+    return latencies
+
+
+def run(url, threshold, repeats):
+    phrases = [p for p, _, _ in LABELLED_PHRASES]
+    remote = remote_latencies(url, phrases, repeats)
+
+    local_hits = local_correct = 0
+    local_time = saved = 0.0
+    for phrase, intent, entities in LABELLED_PHRASES:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            result, confidence = intent_rules.classify(phrase)
+        elapsed = (time.perf_counter() - start) / repeats
+        local_time += elapsed
+        if confidence >= threshold:
+            local_hits += 1
+            local_correct += matches(result, intent, entities)
+            saved += remote[phrase]
+        else:
+            saved -= elapsed  # escalated: the local attempt is pure overhead
+
+    total = len(LABELLED_PHRASES)
+    print(f"⚡ Intent fast path: {total} labelled phrases, threshold {threshold}")
+    print("-" * 60)
+    print(f"Resolved locally        : {local_hits}/{total} ({100 * local_hits / total:.0f}%)")
+    print(f"Local accuracy          : {local_correct}/{local_hits}")
+    print(f"Escalated to service    : {total - local_hits} ({url})")
+    print(f"Local classify          : {1e6 * local_time / total:8.1f} µs/phrase")
+    print(f"Remote classify (median): {1000 * statistics.median(remote.values()):8.2f} ms/phrase")
+    print(f"Latency saved           : {1000 * saved:8.1f} ms total, {1000 * saved / total:.2f} ms/phrase")
+    return local_hits, local_correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local intent fast-path benchmark")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--url", help="intent service to compare against (default: in-process mock)")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.url:
+        run(args.url.rstrip("/"), args.threshold, args.repeats)
+    else:
+        with mock_server() as url:
+            run(url, args.threshold, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark: intent server rule engine cost and requests per second by worker count.
+
+Part one times classify_mock_intent() against the previous implementation,
+which rebuilt its keyword lists, ran a substring scan per family and compiled
+regexes per call. Part two starts mock_phi2_server.py with one worker and
+with N workers (batching off, no simulated model cost). Client processes then
+drive it and the script reports requests per second.
+
+Usage:
+    python3 bench_intent_server.py [--workers N] [--clients 32] [--seconds 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from bench_intent_batching import percentile
+from bench_intent_fastpath import LABELLED_PHRASES
+from mock_phi2_server import IntentResponse, classify_mock_intent
+from stub_server import free_port
+
+PHRASES = [p for p, _, _ in LABELLED_PHRASES]
+
+
+def classify_previous(text):
+    """The rule engine before precompilation (without its per-request prints)."""
+    text_lower = text.lower()
+    task_keywords = ["add", "create", "todo", "task", "remind", "remember"]
+    list_keywords = ["list", "show", "what", "tasks", "todos"]
+    weather_keywords = ["weather", "temperature", "rain", "sunny", "cloudy"]
+    if any(keyword in text_lower for keyword in task_keywords):
+        task_match = re.search(r'(?:add|create|todo|task|remind|remember)\s+(.+?)(?:\s+to\s+|$)', text_lower)
+        task = task_match.group(1).strip() if task_match else text.strip()
+        due_date = None
+        due_patterns = ["today", "tomorrow", "tonight", "this week", "next week",
+                        "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+        for pattern in due_patterns:
+            if pattern in text_lower:
+                due_date = pattern
+                task = re.sub(rf'\b{pattern}\b', '', task, flags=re.IGNORECASE).strip()
+                break
+        return IntentResponse(intent="add_task", task=task, due_date=due_date)
+    elif any(keyword in text_lower for keyword in list_keywords) and ("task" in text_lower or "todo" in text_lower):
+        return IntentResponse(intent="list_tasks")
+    elif any(keyword in text_lower for keyword in weather_keywords):
+        location_match = re.search(r'(?:in|for)\s+([A-Za-z\s]+?)(?:\?|$)', text)
+        location = location_match.group(1).strip() if location_match else None
+        return IntentResponse(intent="get_weather", location=location)
+    else:
+        return IntentResponse(intent="conversation")
+
+
+def time_rules(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for phrase in PHRASES:
+            fn(phrase)
+        best = min(best, time.perf_counter() - start)
+    return best / len(PHRASES)
+
+
+def start_server(port, workers):
+    process = subprocess.Popen(
+        [sys.executable, "mock_phi2_server.py", "--host", "127.0.0.1", "--port", str(port),
+         "--batch-wait-ms", "0", "--workers", str(workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            time.sleep(0.5 if workers > 1 else 0)  # let every worker finish starting
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("mock server did not start")
+
+
+def client_process(url, threads, seconds):
+    """Closed-loop clients in one process; returns the latencies of completed requests."""
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client(offset):
+        session = requests.Session()
+        mine = []
+        i = offset
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            session.post(f"{url}/api/convert", json={"text": PHRASES[i % len(PHRASES)]}, timeout=30)
+            mine.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            latencies.extend(mine)
+
+    pool = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies
+
+
+def measure(url, clients, processes, seconds):
+    per_process = max(1, clients // processes)
+    with multiprocessing.Pool(processes) as pool:
+        started = time.perf_counter()
+        results = pool.starmap(client_process, [(url, per_process, seconds)] * processes)
+        elapsed = time.perf_counter() - started
+    latencies = [lat for result in results for lat in result]
+    return len(latencies) / elapsed, latencies
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Intent server rules and worker-scaling benchmark")
+    parser.add_argument("--workers", type=int, default=max(2, cores), help="N for the multi-worker run")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--client-processes", type=int, default=max(2, cores // 2))
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    old = time_rules(classify_previous, args.repeats)
+    new = time_rules(classify_mock_intent, args.repeats)
+    print(f"🧮 Rule engine: {len(PHRASES)} phrases")
+    print("-" * 60)
+    print(f"previous (runtime regexes) : {old * 1e6:8.1f} µs/request")
+    print(f"precompiled, single scan   : {new * 1e6:8.1f} µs/request")
+    print(f"Speed-up                   : {old / new:8.1f}x")
+
+    print(f"\n🚀 Server throughput: {args.clients} clients over {args.client_processes} process(es), "
+          f"{cores} CPU core(s) available")
+    print("-" * 60)
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for workers in [1, args.workers]:
+        process, url = start_server(free_port(), workers)
+        try:
+            rps, latencies = measure(url, args.clients, args.client_processes, args.seconds)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{workers:>8}{rps:>10.0f}{1000 * percentile(latencies, 50):>10.1f}"
+              f"{1000 * percentile(latencies, 99):>10.1f}")
+    if cores < 2:
+        print("\n(only one core here: extra workers cannot add throughput on this machine)")
+
+
+if __name__ == "__main__":
+    main()
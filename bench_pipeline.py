@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-of-speech to first-audio latency for one turn, with mocked backends.
+
+"serial" replays the previous main() loop (classify, then handler, then a
+fresh event loop for TTS); "pipeline" is pipeline.handle_turn, which overlaps
+intent classification with a speculative conversation reply.
+
+Usage:
+    python3 bench_pipeline.py [--turns 5] [--intent-ms 150] [--llm-ms 600] [--tts-ms 200]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+import pipeline
+
+
+class MockServices:
+    def __init__(self, intent, intent_ms, llm_ms, handler_ms, tts_ms):
+        self.intent = intent
+        self.intent_s = intent_ms / 1000
+        self.llm_s = llm_ms / 1000
+        self.handler_s = handler_ms / 1000
+        self.tts_s = tts_ms / 1000
+        self.first_audio = None
+
+    def classify(self, text):
+        time.sleep(self.intent_s)
+        if self.intent == "add_task":
+            return {"intent": "add_task", "task": "buy milk", "due": None, "location": None}
+        return {"intent": "conversation", "task": None, "due": None, "location": None}
+
+    def respond(self, text):
+        time.sleep(self.llm_s)
+        return "A fine question, traveller."
+
+    def add_task(self, task, due):
+        time.sleep(self.handler_s)
+        return f"Task added: {task}"
+
+    def get_weather(self, location):
+        time.sleep(self.handler_s)
+        return f"The weather in {location} is fair."
+
+    async def speak(self, text):
+        # Synthesis until the first audio chunk is playable
+        await asyncio.sleep(self.tts_s)
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+
+    def backends(self):
+        return pipeline.Backends(self.classify, self.respond, self.add_task, self.get_weather, self.speak)
+
+
+def serial_turn(services, transcription):
+    """The previous main() body, stage by stage."""
+    intent_data = services.classify(transcription)
+    if intent_data["intent"] == "add_task" and intent_data["task"]:
+        result = services.add_task(intent_data["task"], intent_data["due"])
+    else:
+        result = services.respond(transcription)
+    asyncio.run(services.speak(result))
+
+
+def measure(run_turn, make_services, turns):
+    latencies = []
+    for _ in range(turns):
+        services = make_services()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_turn(services)
+        latencies.append(services.first_audio - start)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn latency benchmark with mocked backends")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--intent-ms", type=float, default=150)
+    parser.add_argument("--llm-ms", type=float, default=600)
+    parser.add_argument("--handler-ms", type=float, default=250)
+    parser.add_argument("--tts-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    print("⏱️  End of speech → first audio (median of {} turns)".format(args.turns))
+    print("-" * 60)
+    for intent in ("conversation", "add_task"):
+        def make_services():
+            return MockServices(intent, args.intent_ms, args.llm_ms, args.handler_ms, args.tts_ms)
+
+        before = measure(lambda s: serial_turn(s, "hello"), make_services, args.turns)
+        after = measure(lambda s: asyncio.run(pipeline.handle_turn("hello", s.backends())),
+                        make_services, args.turns)
+        print(f"{intent:<13} serial: {before * 1000:6.0f} ms   pipeline: {after * 1000:6.0f} ms"
+              f"   saved: {(before - after) * 1000:5.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
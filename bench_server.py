@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Load generator for the multi-session server (elven_server.py).
+
+Virtual users each open a session and loop: send a turn, read the streamed
+reply to the end, think, repeat. The number of users doubles (1, 2, 4, ...)
+up to --max-sessions, each level running for --seconds. For each level the
+script reports turns per second, p50/p95 latency to the first reply
+sentence and to the end of the turn, the share of turns refused by load
+shedding (429/503), and errors.
+
+The capacity is the largest number of concurrent sessions that keeps the
+p95 first-sentence latency within --slo-ms with at most 1% of turns refused
+or failed (every smaller level having done so too). One unmeasured turn
+warms the server up first.
+
+By default the server runs in this process against the local stand-ins
+from bench_e2e.py (Phi-2, OpenRouter, Todoist, OpenWeatherMap, Edge TTS),
+with Whisper simulated: it returns the command's transcript after decoding
+for --oracle-rtf x the audio length. Point --url at a running server to
+measure that instead; load generator and server then don't share a CPU.
+
+Usage:
+    python3 bench_server.py [--max-sessions 32] [--seconds 5] [--think-ms 500] [--slo-ms 1500]
+                            [--audio] [--voice] [--whisper-workers 1] [--whisper-queue 16] [--whisper-batch 8]
+    python3 bench_server.py --url http://127.0.0.1:8080 [--audio]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+
+import numpy as np
+
+import bench_e2e
+import logs
+
+COMMANDS = [entry["transcript"] for entry in bench_e2e.load_manifest()]
+REFUSED = (429, 503)
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+class PhraseOracle:
+    """Whisper stand-in: knows which command each payload carries, and decodes for rtf x its length."""
+
+    def __init__(self, rtf=0.1):
+        self.rtf = rtf
+        self.phrases = {}
+
+    def add(self, audio, text):
+        self.phrases[audio.tobytes()] = text
+
+    def transcribe(self, audio, language=None, **options):
+        time.sleep(self.rtf * len(audio) / bench_e2e.CORPUS_RATE)
+        return {"text": " " + self.phrases.get(audio.tobytes(), "")}
+
+
+def command_audio(oracle=None):
+    """16 kHz 16-bit PCM for each command, registered with the oracle when there is one."""
+    import transcriber
+
+    rng = np.random.default_rng(0)
+    payloads = []
+    for text in COMMANDS:
+        pcm = np.clip(bench_e2e.synthetic_speech(text, rng), -32768, 32767).astype(np.int16).tobytes()
+        if oracle is not None:
+            oracle.add(transcriber.pcm_to_float32(pcm), text)
+        payloads.append(pcm)
+    return payloads
+
+
+async def virtual_user(client, user, deadline, args, audio, results):
+    response = await client.post("/v1/sessions")
+    if response.status_code != 200:
+        results["errors"] += 1
+        return
+    session = response.json()["session_id"]
+    turn = user
+    try:
+        # Every user sends at least one turn, so a zero-length level still warms the server up
+        while turn == user or time.perf_counter() < deadline:
+            index = turn % len(COMMANDS)
+            turn += 1
+            if audio:
+                request = dict(content=audio[index], headers={"Content-Type": "audio/l16"})
+            else:
+                request = dict(json={"text": COMMANDS[index]})
+            start = time.perf_counter()
+            first_sentence = None
+            outcome = "error"
+            try:
+                async with client.stream("POST", f"/v1/sessions/{session}/turns",
+                                         params={"voice": "1"} if args.voice else None, **request) as response:
+                    if response.status_code in REFUSED:
+                        outcome = "shed"
+                    elif response.status_code == 200:
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            event = json.loads(line)["event"]
+                            if event == "sentence" and first_sentence is None:
+                                first_sentence = time.perf_counter() - start
+                            elif event in ("done", "error"):
+                                outcome = event
+            except Exception:
+                outcome = "error"
+            total = time.perf_counter() - start
+            if outcome == "done":
+                results["turns"] += 1
+                results["total_ms"].append(total * 1000)
+                if first_sentence is not None:
+                    results["first_sentence_ms"].append(first_sentence * 1000)
+            else:
+                results["shed" if outcome == "shed" else "errors"] += 1
+                if outcome == "shed":
+                    await asyncio.sleep(1.0)  # Retry-After
+            await asyncio.sleep(args.think_ms / 1000)
+    finally:
+        await client.delete(f"/v1/sessions/{session}")
+
+
+async def run_level(url, users, args, audio, seconds=None):
+    import httpx
+
+    results = {"users": users, "turns": 0, "shed": 0, "errors": 0, "first_sentence_ms": [], "total_ms": []}
+    limits = httpx.Limits(max_connections=users + 4, max_keepalive_connections=users + 4)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + (args.seconds if seconds is None else seconds)
+        await asyncio.gather(*(virtual_user(client, user, deadline, args, audio, results)
+                               for user in range(users)))
+        elapsed = time.perf_counter() - start
+    attempts = results["turns"] + results["shed"] + results["errors"]
+    return {
+        "users": users,
+        "turns": results["turns"],
+        "turns_per_s": round(results["turns"] / elapsed, 2),
+        "first_sentence_p50_ms": percentile(results["first_sentence_ms"], 50),
+        "first_sentence_p95_ms": percentile(results["first_sentence_ms"], 95),
+        "total_p50_ms": percentile(results["total_ms"], 50),
+        "total_p95_ms": percentile(results["total_ms"], 95),
+        "shed_rate": results["shed"] / attempts if attempts else 0.0,
+        "error_rate": results["errors"] / attempts if attempts else 0.0,
+    }
+
+
+def within_slo(level, slo_ms, max_failed=0.01):
+    p95 = level["first_sentence_p95_ms"]
+    return (level["turns"] > 0 and p95 is not None and p95 <= slo_ms
+            and level["shed_rate"] + level["error_rate"] <= max_failed)
+
+
+def levels(max_sessions):
+    users = 1
+    while users < max_sessions:
+        yield users
+        users *= 2
+    yield max_sessions
+
+
+@contextlib.contextmanager
+def local_server(args):
+    """Start the stand-ins and an in-process server on them. Yields its base URL."""
+    import transcriber
+    from elven_server import AssistantServer, create_app
+    from stub_server import serve
+
+    oracle = PhraseOracle(rtf=args.oracle_rtf)
+    transcriber._engine = transcriber.TranscriptionEngine(loader=lambda name, device: oracle)
+    transcriber.preload()
+    args.audio_payloads = command_audio(oracle) if args.audio else None
+    with bench_e2e.local_services(args):
+        worker = transcriber.TranscriptionWorker(workers=args.whisper_workers, max_queued=args.whisper_queue,
+                                                 max_batch=args.whisper_batch)
+        server = AssistantServer(worker=worker, max_sessions=max(1000, args.max_sessions))
+        with serve(create_app(server)) as url:
+            yield url
+        server.pool.shutdown()
+
+
+def fmt(ms):
+    return "-" if ms is None else f"{ms:.0f}"
+
+
+def print_report(results, capacity, args):
+    print("-" * 88)
+    print(f"{'sessions':>8}{'turns/s':>10}{'first p50':>11}{'first p95':>11}{'total p50':>11}"
+          f"{'total p95':>11}{'shed':>8}{'errors':>8}")
+    for level in results:
+        print(f"{level['users']:>8}{level['turns_per_s']:>10.1f}{fmt(level['first_sentence_p50_ms']):>11}"
+              f"{fmt(level['first_sentence_p95_ms']):>11}{fmt(level['total_p50_ms']):>11}"
+              f"{fmt(level['total_p95_ms']):>11}{level['shed_rate']:>8.1%}{level['error_rate']:>8.1%}")
+    print("-" * 88)
+    if capacity:
+        print(f"✅ Capacity: {capacity} concurrent sessions within a p95 first-sentence latency of "
+              f"{args.slo_ms:g} ms")
+    else:
+        print(f"❌ No level met a p95 first-sentence latency of {args.slo_ms:g} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the multi-session assistant server")
+    parser.add_argument("--url", help="a running server; by default one is started here on local stand-ins")
+    parser.add_argument("--max-sessions", type=int, default=32, help="largest number of concurrent sessions")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each level")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="pause between a user's turns")
+    parser.add_argument("--slo-ms", type=float, default=1500.0, help="p95 first-sentence latency target")
+    parser.add_argument("--audio", action="store_true", help="send spoken turns instead of text")
+    parser.add_argument("--voice", action="store_true", help="ask for synthesised speech in replies")
+    parser.add_argument("--stop-early", action="store_true", help="stop at the first level over the target")
+    parser.add_argument("--output", help="results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the in-process server's own output")
+    # In-process server and stand-ins
+    parser.add_argument("--whisper-workers", type=int, default=1)
+    parser.add_argument("--whisper-queue", type=int, default=16)
+    parser.add_argument("--whisper-batch", type=int, default=8)
+    parser.add_argument("--oracle-rtf", type=float, default=0.1,
+                        help="simulated decode time as a fraction of the audio length")
+    parser.add_argument("--phi2-ms", type=float, default=150.0, help="simulated Phi-2 model time")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-token-ms", type=float, default=20.0)
+    parser.add_argument("--tts-first-chunk-ms", type=float, default=150.0)
+    args = parser.parse_args()
+    args.fast = True  # nothing is played on the server
+
+    with contextlib.ExitStack() as stack:
+        if args.url:
+            url = args.url.rstrip("/")
+            args.audio_payloads = command_audio() if args.audio else None
+        else:
+            url = stack.enter_context(local_server(args))
+        print(f"📦 Server load test: {url}, {'audio' if args.audio else 'text'} turns, "
+              f"{args.seconds:g} s per level, {args.think_ms:g} ms think time")
+        results = []
+        capacity = 0
+        missed = False
+        log = io.StringIO()
+        logs.configure()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            asyncio.run(run_level(url, 1, args, args.audio_payloads, seconds=0.001))  # first-use costs
+            logs.flush()
+        for users in levels(args.max_sessions):
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+                level = asyncio.run(run_level(url, users, args, args.audio_payloads))
+                logs.flush()
+            results.append(level)
+            print(f"  {users} sessions: {level['turns_per_s']:.1f} turns/s, "
+                  f"p95 first sentence {fmt(level['first_sentence_p95_ms'])} ms")
+            # Capacity is the last level before the first that misses the target
+            if within_slo(level, args.slo_ms) and not missed:
+                capacity = users
+            else:
+                missed = True
+                if args.stop_early:
+                    break
+
+    print_report(results, capacity, args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"capacity": capacity, "slo_ms": args.slo_ms, "levels": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: how long importing each entry point takes, from
+`python -X importtime` in a fresh interpreter, with budgets to catch an
+eager heavy import creeping back in.
+
+Entry points:
+    intents  - text-only intent classification (no audio, no HTTP client yet)
+    elven    - the full assistant module, before main() runs
+
+Usage:
+    python3 bench_startup.py [--runs 5] [--top 8] [--entry intents]
+Exits with status 1 if a median import time is over its budget.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Milliseconds, median over runs. Generous enough for a slow laptop; a
+# regression like importing whisper or requests at module level blows them.
+BUDGETS = {
+    "intents": 80,
+    "elven": 600,
+}
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module):
+    """
+    Import module in a fresh interpreter under -X importtime.
+
+    Returns:
+        tuple: (cumulative milliseconds for module,
+                [(milliseconds, name)] for the imports it made directly)
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=HERE, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+    # Children are printed before their parent, so the lines since the last
+    # top-level import are this module's own subtree (interpreter startup
+    # imports like site come earlier and are left out).
+    children = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        cumulative_ms = int(match.group(2)) / 1000
+        if depth == 0:
+            if match.group(4) == module:
+                return cumulative_ms, sorted(children, reverse=True)
+            children = []
+        elif depth == 1:
+            children.append((cumulative_ms, match.group(4)))
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def measure(module, runs=5):
+    """
+    Returns:
+        tuple: (median milliseconds, direct imports of the median run)
+    """
+    samples = sorted(import_times(module) for _ in range(runs))
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark with budgets")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level imports to list")
+    parser.add_argument("--entry", choices=sorted(BUDGETS), action="append",
+                        help="entry point to measure (default: all)")
+    args = parser.parse_args()
+
+    over = []
+    for module in args.entry or BUDGETS:
+        ms, children = measure(module, args.runs)
+        budget = BUDGETS[module]
+        status = "✅" if ms <= budget else "❌"
+        print(f"{status} import {module}: {ms:.1f} ms (budget {budget} ms, median of {args.runs})")
+        for child_ms, name in children[:args.top]:
+            print(f"     {child_ms:7.1f} ms  {name}")
+        if ms > budget:
+            over.append(module)
+
+    if over:
+        print(f"[ERROR] Over budget: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
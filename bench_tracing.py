@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: what a tracing span costs, switched off and switched on.
+
+A turn has about a dozen spans and takes hundreds of milliseconds, so the
+number to look at is the per-span cost with tracing off.
+
+Usage:
+    python3 bench_tracing.py [--spans 200000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import tracing
+
+
+def per_span(n, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(n):
+            with tracing.span("stage"):
+                pass
+        best = min(best, time.perf_counter() - start)
+    return best / n
+
+
+def baseline(n, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(n):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing span overhead benchmark")
+    parser.add_argument("--spans", type=int, default=200000)
+    args = parser.parse_args()
+
+    empty = baseline(args.spans)
+    tracing.configure(stats=False)
+    off = per_span(args.spans) - empty
+    tracing.configure(stats=True)
+    histograms = per_span(args.spans) - empty
+    with tempfile.TemporaryDirectory() as tmp:
+        tracing.configure(export="jsonl", path=os.path.join(tmp, "traces.jsonl"))
+        with tracing.turn():
+            in_turn = per_span(args.spans // 10) - empty
+    tracing.configure(stats=False)
+
+    print(f"⏱️  Span overhead over {args.spans} spans")
+    print("-" * 50)
+    print(f"tracing off            : {off * 1e9:8.0f} ns/span")
+    print(f"histograms only        : {histograms * 1e9:8.0f} ns/span")
+    print(f"inside a traced turn   : {in_turn * 1e9:8.0f} ns/span")
+
+
+if __name__ == "__main__":
+    main()
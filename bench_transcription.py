@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Transcription throughput: one clip at a time on the calling thread versus the
+batching TranscriptionWorker (transcriber.py).
+
+Clips arrive at --rate clips per second (Poisson arrivals; 0 sends them all
+at once, like replayed recordings or many sessions speaking together). The
+"serial" mode decodes each clip in arrival order with engine.transcribe, as
+transcribe_audio did; the "worker" mode submits them to a TranscriptionWorker
+and waits on the futures, batching either in arrival order or by length
+(the default). Reports clips per second and p50/p95 latency from
+a clip's arrival to its transcript.
+
+Clips are the bench_e2e corpus recordings (synthetic speech where the WAVs
+have not been generated), with --long-share of them made into long
+dictations of several commands back to back.
+
+With Whisper installed (--model tiny, base, small, ...) the real model is
+used, on the CPU unless WHISPER_DEVICE says otherwise. Otherwise a
+simulated model stands in: every decode pass costs --pass-ms, plus
+--clip-ms per clip in the batch, plus --audio-ms per second of the
+longest clip (the decoder runs until the longest transcript ends).
+
+Usage:
+    python3 bench_transcription.py [--model sim|tiny|base|small] [--clips 48] [--rate 0]
+                                   [--workers 1] [--max-batch 8] [--batch-wait-ms 10]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import bench_e2e
+import transcriber
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+
+class SimulatedWhisper:
+    """Stand-in with a batched decode cost model; sleeps, so it releases the GIL like torch does."""
+
+    def __init__(self, pass_ms=120.0, clip_ms=15.0, audio_ms=25.0):
+        self.pass_ms = pass_ms
+        self.clip_ms = clip_ms
+        self.audio_ms = audio_ms
+
+    def _decode(self, clips):
+        longest = max(len(clip) for clip in clips) / transcriber.SAMPLE_RATE
+        time.sleep((self.pass_ms + self.clip_ms * len(clips) + self.audio_ms * longest) / 1000)
+        return [{"text": f"{len(clip)} samples"} for clip in clips]
+
+    def transcribe(self, audio, language=None, **options):
+        return self._decode([audio])[0]
+
+    def transcribe_batch(self, clips, language=None):
+        return self._decode(clips)
+
+
+def corpus_clips(count, long_share, seed=0):
+    rng = np.random.default_rng(seed)
+    commands = []
+    for entry in bench_e2e.load_manifest():
+        if os.path.exists(entry["path"]):
+            commands.append(transcriber.load_wav(entry["path"]))
+        else:
+            speech = bench_e2e._pad(bench_e2e.synthetic_speech(entry["transcript"], rng), rng, tail=0.5)
+            commands.append((np.clip(speech, -32768, 32767) / 32768).astype(np.float32))
+    clips = []
+    for i in range(count):
+        if rng.random() < long_share:
+            picks = rng.choice(len(commands), size=4)
+            clips.append(np.concatenate([commands[p] for p in picks]))
+        else:
+            clips.append(commands[i % len(commands)])
+    return clips
+
+
+def arrivals(count, rate, seed=1):
+    if not rate:
+        return [0.0] * count
+    rng = np.random.default_rng(seed)
+    return list(np.cumsum(rng.exponential(1 / rate, count)))
+
+
+def run_serial(engine, clips, offsets):
+    """Each clip decoded in arrival order on one thread, one at a time."""
+    latencies = []
+    start = time.perf_counter()
+    for clip, offset in zip(clips, offsets):
+        wait = start + offset - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        engine.transcribe(clip, language="en")
+        latencies.append(time.perf_counter() - (start + offset))
+    return latencies, time.perf_counter() - start
+
+
+def run_worker(worker, clips, offsets):
+    latencies = [None] * len(clips)
+    done = threading.Semaphore(0)
+    start = time.perf_counter()
+
+    def finished(i, arrived):
+        def callback(future):
+            latencies[i] = time.perf_counter() - arrived
+            done.release()
+        return callback
+
+    for i, (clip, offset) in enumerate(zip(clips, offsets)):
+        wait = start + offset - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        worker.submit(clip).add_done_callback(finished(i, start + offset))
+    for _ in clips:
+        done.acquire()
+    return latencies, time.perf_counter() - start
+
+
+def make_engine(model):
+    if model == "auto":
+        model = "small" if importlib.util.find_spec("whisper") else "sim"
+    if model == "sim":
+        return None, model
+    engine = transcriber.TranscriptionEngine(model_name=model, device=os.getenv("WHISPER_DEVICE") or "cpu")
+    engine.load()
+    engine.warm_up()
+    return engine, model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs batched Whisper transcription throughput")
+    parser.add_argument("--model", default="auto", help="sim, or a Whisper model name (default: small if installed)")
+    parser.add_argument("--clips", type=int, default=48)
+    parser.add_argument("--rate", type=float, default=0.0, help="clip arrivals per second (0: all at once)")
+    parser.add_argument("--long-share", type=float, default=0.25, help="share of long dictation clips")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--batch-wait-ms", type=float, default=10.0)
+    parser.add_argument("--torch-threads", type=int, default=None, help="per worker (default: cores / workers)")
+    parser.add_argument("--pass-ms", type=float, default=120.0, help="simulated cost of a decode pass")
+    parser.add_argument("--clip-ms", type=float, default=15.0, help="simulated cost per clip in a batch")
+    parser.add_argument("--audio-ms", type=float, default=25.0, help="simulated cost per second of the longest clip")
+    args = parser.parse_args()
+
+    engine, model = make_engine(args.model)
+    if engine is None:
+        sim = SimulatedWhisper(args.pass_ms, args.clip_ms, args.audio_ms)
+        engine = transcriber.TranscriptionEngine(loader=lambda name, device: sim)
+    clips = corpus_clips(args.clips, args.long_share)
+    offsets = arrivals(args.clips, args.rate)
+    seconds = sum(len(clip) for clip in clips) / transcriber.SAMPLE_RATE
+
+    print(f"🎧 Transcription load test: {len(clips)} clips ({seconds:.0f} s of audio), model {model}, "
+          f"{os.cpu_count()} cores, arrivals {'all at once' if not args.rate else f'{args.rate:g}/s'}")
+    print("-" * 72)
+    print(f"{'mode':<28}{'clips/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'mean batch':>12}")
+
+    transcriber.pin_torch_threads(args.torch_threads or os.cpu_count())
+    modes = [("serial (one at a time)", None, True), ("worker, no batching", 1, True),
+             (f"worker, {args.max_batch} in arrival order", args.max_batch, False),
+             (f"worker, {args.max_batch} by length", args.max_batch, True)]
+    for name, max_batch, by_length in modes:
+        worker = None
+        if max_batch is None:
+            latencies, elapsed = run_serial(engine, clips, offsets)
+        else:
+            worker = transcriber.TranscriptionWorker(engine, workers=args.workers, max_batch=max_batch,
+                                                     batch_wait_ms=args.batch_wait_ms, max_queued=0,
+                                                     torch_threads=args.torch_threads,
+                                                     by_length=by_length)
+            latencies, elapsed = run_worker(worker, clips, offsets)
+            worker.shutdown()
+        mean_batch = f"{worker.stats()['mean_batch']:.1f}" if worker else "1.0"
+        print(f"{name:<28}{len(clips) / elapsed:>10.2f}{percentile(latencies, 50) * 1000:>10.0f}"
+              f"{percentile(latencies, 95) * 1000:>10.0f}{mean_batch:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-chunk cost of voice-activity detection.
+
+Compares the original pure-Python loop (struct.unpack + max over a generator)
+with vad.EnergyVAD on synthetic audio: background noise with speech-like bursts.
+
+Usage:
+    python3 bench_vad.py [--seconds 30] [--chunk 1024]
+"""
+
+import argparse
+import struct
+import time
+
+import numpy as np
+
+from vad import EnergyVAD
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_audio(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    n = int(SAMPLE_RATE * seconds)
+    samples = rng.normal(0, 200, n)
+    t = np.arange(n) / SAMPLE_RATE
+    # One second of "speech" (a few harmonics) out of every three.
+    speaking = (t % 3.0) < 1.0
+    samples += speaking * 4000 * (np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t))
+    return np.clip(samples, -32768, 32767).astype(np.int16)
+
+
+def peak_energy_loop(chunks, silence_threshold=500):
+    """The previous per-chunk check from record_audio."""
+    speech = 0
+    for data in chunks:
+        audio_data = struct.unpack(str(len(data)//2) + 'h', data)
+        energy = max(abs(sample) for sample in audio_data)
+        if energy > silence_threshold:
+            speech += 1
+    return speech
+
+
+def energy_vad_loop(chunks, vad):
+    speech = 0
+    for data in chunks:
+        if vad.process(data):
+            speech += 1
+    return speech
+
+
+def time_per_chunk(fn, chunks, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best / len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VAD per-chunk cost benchmark")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--chunk", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = synthetic_audio(args.seconds)
+    chunks = [samples[i:i + args.chunk].tobytes()
+              for i in range(0, len(samples) - args.chunk + 1, args.chunk)]
+    vad = EnergyVAD(sample_rate=SAMPLE_RATE, chunk_size=args.chunk)
+
+    old = time_per_chunk(lambda: peak_energy_loop(chunks), chunks, args.repeats)
+    new = time_per_chunk(lambda: (vad.reset(), energy_vad_loop(chunks, vad)), chunks, args.repeats)
+    chunk_ms = 1000.0 * args.chunk / SAMPLE_RATE
+
+    print(f"🎚️  VAD benchmark: {len(chunks)} chunks of {args.chunk} samples ({chunk_ms:.0f} ms audio each)")
+    print("-" * 60)
+    print(f"struct.unpack + max(abs()) : {old * 1e6:8.1f} µs/chunk ({100 * old * 1000 / chunk_ms:.3f}% of real time)")
+    print(f"EnergyVAD (NumPy RMS)      : {new * 1e6:8.1f} µs/chunk ({100 * new * 1000 / chunk_ms:.3f}% of real time)")
+    print(f"Speed-up                   : {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures: a hand-wound clock, the local service stubs and the mock
+Phi-2 intent server.
+
+A test module that talks to a stub names its module in STUB (e.g. STUB = todoist_stub);
+the server fixture serves that stub's app once per module, stub resets its state for
+each test and client is a pooled ServiceClient pointed at it.
+"""
+
+import os
+
+import pytest
+
+import http_pool
+from stub_server import serve
+
+
+class FakeClock:
+    """A monotonic clock that only moves when a test advances `now`."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope="module")
+def server(request):
+    with serve(request.module.STUB.app) as url:
+        yield url
+
+
+@pytest.fixture
+def stub(server, request):
+    stub = request.module.STUB.stub
+    stub.reset()
+    return stub
+
+
+@pytest.fixture
+def client(server):
+    client = http_pool.ServiceClient(server, timeout=5)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def phi2_server():
+    """Run mock_phi2_server in-process, point intents at it through intents.configure() and yield its URL."""
+    import intents
+    import mock_phi2_server
+
+    previous = os.environ.get("PHI2_API_URL")
+    with serve(mock_phi2_server.app) as url:
+        os.environ["PHI2_API_URL"] = url
+        intents.configure()
+        try:
+            yield url
+        finally:
+            if previous is None:
+                del os.environ["PHI2_API_URL"]
+            else:
+                os.environ["PHI2_API_URL"] = previous
+            intents.configure()
@@ -0,0 +1,205 @@
+"""
+Per-session conversation context for the general-conversation LLM.
+
+Each reply used to be generated from a two-message prompt (system prompt and
+the user's words), so "and what about tomorrow?" had nothing to refer to.
+Sending the whole history instead would grow the prompt with every turn.
+
+A Conversation keeps the recent turns verbatim within a token budget. When
+they outgrow it, the oldest ones are folded into a running summary by a
+background thread, so no spoken reply waits for the summariser. Until the
+summary lands those turns are still sent, newest first, as far as the budget
+allows; the prompt never exceeds the budget whatever the summariser does.
+
+Prompts are laid out for provider-side prompt caching: the system prompt is
+always the first message, byte for byte, followed by the summary and then
+the turns, oldest first. Between summaries a prompt only ever grows at the
+end, so the prefix a provider cached for the last turn is reused.
+
+Token counts are estimated at about four characters per token; the budget is
+a bound on prompt size, not an exact model count.
+
+Configuration (read by get_conversation):
+    CONVERSATION               "0" for stateless single-turn prompts (default "1")
+    CONVERSATION_BUDGET_TOKENS recent turns kept verbatim (default 600)
+    CONVERSATION_SUMMARY_TOKENS longest summary of older turns (default 120)
+    CONVERSATION_MAX_SESSIONS  sessions kept in memory, least recently used dropped first (default 100)
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token, at least one per message."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def truncate_tokens(text, max_tokens, keep="end"):
+    """Cut text to about max_tokens, on a word boundary, keeping its start or its end."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    if keep == "end":
+        cut = text[-max_chars:]
+        return cut[cut.find(" ") + 1:] if " " in cut else cut
+    cut = text[:max_chars]
+    return cut[:cut.rfind(" ")] if " " in cut else cut
+
+
+def extractive_summary(previous, turns, max_tokens=120):
+    """
+    Summarise without a model: the previous summary followed by what was
+    said in each turn, keeping the most recent part when it is too long.
+
+    Args:
+        previous (str): summary of the turns before these
+        turns (list): [(user text, assistant text)], oldest first
+        max_tokens (int): longest summary returned
+    """
+    parts = [previous] if previous else []
+    for user, assistant in turns:
+        parts.append(f"User: {user} Elven: {assistant}")
+    return truncate_tokens(" ".join(parts), max_tokens)
+
+
+class Conversation:
+    """Rolling, token-budgeted history for one session, with a background summary of older turns."""
+
+    def __init__(self, system_prompt, budget_tokens=600, summary_tokens=120, summarise=None):
+        """
+        Args:
+            system_prompt (str): first message of every prompt, never changed
+            budget_tokens (int): most tokens of past turns sent with a prompt
+            summary_tokens (int): most tokens of summary sent with a prompt
+            summarise (callable|None): summarise(previous summary, [(user, assistant)]) -> text,
+                                       run in a background thread; defaults to extractive_summary
+        """
+        self.system_prompt = system_prompt
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.summarise = summarise or (lambda previous, turns: extractive_summary(previous, turns, summary_tokens))
+        self.summary = ""
+        self.turns = []  # [(user, assistant, tokens)] not yet folded into the summary, oldest first
+        self.summaries = 0
+        self._lock = threading.Lock()
+        self._summariser = None
+
+    def messages(self, user_text):
+        """
+        Build the chat messages for the next reply.
+
+        Returns:
+            list: [system prompt, summary (if any), recent turns..., the new user message]
+        """
+        with self._lock:
+            summary = self.summary
+            turns = list(self.turns)
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation: {summary}"})
+        # Newest turns first until the budget is spent, then back into speaking order
+        recent = []
+        budget = self.budget_tokens
+        for user, assistant, tokens in reversed(turns):
+            if tokens > budget:
+                break
+            budget -= tokens
+            recent.append((user, assistant))
+        for user, assistant in reversed(recent):
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": assistant})
+        messages.append({"role": "user", "content": user_text})
+        return messages
+
+    def add_turn(self, user_text, reply):
+        """Record a finished exchange; summarises older turns in the background when over budget."""
+        if not user_text or not reply:
+            return
+        tokens = estimate_tokens(user_text) + estimate_tokens(reply)
+        with self._lock:
+            self.turns.append((user_text, reply, tokens))
+            if sum(t for _, _, t in self.turns) <= self.budget_tokens:
+                return
+            if self._summariser is not None and self._summariser.is_alive():
+                return  # the next summary picks these up
+            # Fold the oldest turns until half the budget is left, so the
+            # prompt prefix then stays put for a good many turns.
+            kept = sum(t for _, _, t in self.turns)
+            count = 0
+            while count < len(self.turns) - 1 and kept > self.budget_tokens // 2:
+                kept -= self.turns[count][2]
+                count += 1
+            folded = [(user, assistant) for user, assistant, _ in self.turns[:count]]
+            previous = self.summary
+            self._summariser = threading.Thread(target=self._fold, args=(previous, folded),
+                                                name="conversation-summary", daemon=True)
+            self._summariser.start()
+
+    def _fold(self, previous, folded):
+        try:
+            with tracing.span("conversation.summarise", turns=len(folded)):
+                summary = self.summarise(previous, folded)
+        except Exception as e:
+            logger.error("Conversation summary failed, older turns dropped: %s", e)
+            summary = previous
+        summary = truncate_tokens((summary or "").strip(), self.summary_tokens)
+        with self._lock:
+            self.summary = summary
+            del self.turns[:len(folded)]
+            self.summaries += 1
+
+    def wait(self, timeout=None):
+        """Wait for a background summary in progress (for tests and shutdown)."""
+        summariser = self._summariser
+        if summariser is not None:
+            summariser.join(timeout)
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self.turns = []
+
+
+def enabled():
+    return os.getenv("CONVERSATION", "1") == "1"
+
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def get_conversation(session_id="default", system_prompt="", summarise=None):
+    """
+    Return the conversation for a session, creating it on first use.
+
+    Returns:
+        Conversation|None: None when CONVERSATION=0
+    """
+    if not enabled():
+        return None
+    with _sessions_lock:
+        conversation = _sessions.get(session_id)
+        if conversation is None:
+            conversation = Conversation(system_prompt,
+                                        budget_tokens=int(os.getenv("CONVERSATION_BUDGET_TOKENS", "600")),
+                                        summary_tokens=int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "120")),
+                                        summarise=summarise)
+            _sessions[session_id] = conversation
+            while len(_sessions) > int(os.getenv("CONVERSATION_MAX_SESSIONS", "100")):
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(session_id)
+    return conversation
+
+
+def end_session(session_id):
+    """Forget a session's history."""
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
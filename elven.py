@@ -1,23 +1,46 @@
+"""
+Elven voice assistant: wake word / Enter -> record -> transcribe -> intent -> reply -> speech.
+
+Importing this module has no side effects beyond reading the environment:
+.env.local is loaded by main(), and the heavy dependencies (Whisper and
+torch, Porcupine, PyAudio, the OpenAI client, Edge TTS) are imported by the
+component that needs them, when it is first used. Code that only classifies
+text should import intents.py instead.
+"""
+
+import argparse
+import logging
 import os
-from dotenv import load_dotenv
-import pvporcupine
-import pyaudio
 import struct
 import wave
-import whisper
 import time
+import shutil
 import subprocess
 import requests
-from openai import OpenAI
 import warnings
-import re
-import edge_tts
 import asyncio
+import audio_capture
+import barge_in
+import conversation
+import http_pool
+import intent_rules
+import intents
+import logs
+import pipeline
+import playback
+import todoist_mirror
+import todoist_queue
+import tracing
+import tts
+import tts_cache
+import transcriber
+import weather_service
+from intents import classify_intent_and_entities
+from vad import EnergyVAD
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
-# Load environment variables from .env.local
-load_dotenv('.env.local')
+logger = logging.getLogger(__name__)
 
 # Placeholder imports for each module (to be implemented)
 # import porcupine
@@ -26,107 +49,148 @@ load_dotenv('.env.local')
 # import requests
 # import smtplib
 
-# Load API keys and tokens
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-TODOIST_API_TOKEN = os.getenv('TODOIST_API_TOKEN')
-ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
-GMAIL_USER = os.getenv('GMAIL_USER')
-GMAIL_PASSWORD = os.getenv('GMAIL_PASSWORD')
-SMTP_SERVER = os.getenv('SMTP_SERVER')
-SMTP_PORT = os.getenv('SMTP_PORT')
-GOOGLE_CALENDAR_API_KEY = os.getenv('GOOGLE_CALENDAR_API_KEY')
-NOTION_API_KEY = os.getenv('NOTION_API_KEY')
-OPENWEATHERMAP_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY')
-GOOGLE_SEARCH_API_KEY = os.getenv('GOOGLE_SEARCH_API_KEY')
-PORCUPINE_ACCESS_KEY = os.getenv('PORCUPINE_ACCESS_KEY')
-PHI2_API_URL = os.getenv('PHI2_API_URL', 'http://localhost:8000')
-
 STOP_PHRASES = ["goodbye"]
 
 INTENT_MODEL = "google/gemini-2.5-flash-preview"
 RESPONSE_MODEL = "google/gemini-2.5-flash-preview"
+TTS_VOICE = tts.VOICE
 
-def record_audio(filename="command.wav", sample_rate=16000, silence_threshold=500, silence_duration=2.0):
-    print("Recording... Speak now!")
-    pa = pyaudio.PyAudio()
-    stream = pa.open(format=pyaudio.paInt16,
-                    channels=1,
-                    rate=sample_rate,
-                    input=True,
-                    frames_per_buffer=1024)
-    frames = []
-    print("(Waiting for you to start speaking...)")
-    # Wait for user to start speaking
-    while True:
-        data = stream.read(1024, exception_on_overflow=False)
-        audio_data = struct.unpack(str(len(data)//2) + 'h', data)
-        energy = max(abs(sample) for sample in audio_data)
-        if energy > silence_threshold:
-            frames.append(data)
-            print("Speech detected. Recording...")
-            break
-    # Now record until 2 seconds of silence
-    silent_chunks = 0
-    required_silent_chunks = int((sample_rate / 1024) * silence_duration)
-    while True:
-        data = stream.read(1024, exception_on_overflow=False)
-        frames.append(data)
-        audio_data = struct.unpack(str(len(data)//2) + 'h', data)
-        energy = max(abs(sample) for sample in audio_data)
-        if energy < silence_threshold:
-            silent_chunks += 1
-        else:
-            silent_chunks = 0
-        if silent_chunks > required_silent_chunks:
-            print("Silence detected. Stopping recording.")
-            break
-    stream.stop_stream()
-    stream.close()
-    pa.terminate()
+def load_settings(env_file=None):
+    """
+    Read API keys and options from the environment, after loading env_file
+    (e.g. ".env.local") into it if given. Runs once at import without a file,
+    and again from main() with .env.local.
+    """
+    global OPENROUTER_API_KEY, OPENAI_API_KEY, TODOIST_API_TOKEN, ELEVENLABS_API_KEY, GMAIL_USER, \
+        GMAIL_PASSWORD, SMTP_SERVER, SMTP_PORT, GOOGLE_CALENDAR_API_KEY, NOTION_API_KEY, \
+        OPENWEATHERMAP_API_KEY, GOOGLE_SEARCH_API_KEY, PORCUPINE_ACCESS_KEY, OPENWEATHERMAP_API_URL, \
+        TODOIST_API_URL, TRANSCRIBE_MODE, SPECULATIVE_LLM, OPENROUTER_BASE_URL, BARGE_IN
+    if env_file:
+        from dotenv import load_dotenv
+        load_dotenv(env_file)
+
+    # Load API keys and tokens
+    OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
+    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    TODOIST_API_TOKEN = os.getenv('TODOIST_API_TOKEN')
+    ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
+    GMAIL_USER = os.getenv('GMAIL_USER')
+    GMAIL_PASSWORD = os.getenv('GMAIL_PASSWORD')
+    SMTP_SERVER = os.getenv('SMTP_SERVER')
+    SMTP_PORT = os.getenv('SMTP_PORT')
+    GOOGLE_CALENDAR_API_KEY = os.getenv('GOOGLE_CALENDAR_API_KEY')
+    NOTION_API_KEY = os.getenv('NOTION_API_KEY')
+    OPENWEATHERMAP_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY')
+    GOOGLE_SEARCH_API_KEY = os.getenv('GOOGLE_SEARCH_API_KEY')
+    PORCUPINE_ACCESS_KEY = os.getenv('PORCUPINE_ACCESS_KEY')
+    OPENWEATHERMAP_API_URL = os.getenv('OPENWEATHERMAP_API_URL', 'https://api.openweathermap.org')
+    TODOIST_API_URL = os.getenv('TODOIST_API_URL', 'https://api.todoist.com')
+    # "stream" transcribes while recording; "file" records command.wav first
+    TRANSCRIBE_MODE = os.getenv('TRANSCRIBE_MODE', 'stream')
+    # Start the general-conversation reply while the intent is still being classified
+    SPECULATIVE_LLM = os.getenv('SPECULATIVE_LLM', '1') == '1'
+    # Keep listening while the reply plays, and stop it when the user talks (see barge_in.py)
+    BARGE_IN = barge_in.enabled()
+    OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', "https://openrouter.ai/api/v1")
+
+    # One pooled, retrying HTTP client per service (see http_pool.py)
+    intents.configure()
+    http_pool.configure("todoist", TODOIST_API_URL, timeout=10)
+    http_pool.configure("openweathermap", OPENWEATHERMAP_API_URL, timeout=10)
+
+load_settings()
+
+def capture_utterance(sample_rate=16000, silence_threshold=None, silence_duration=2.0, vad=None,
+                      capture=None, start_position=None):
+    """
+    Yield raw 16-bit PCM chunks for one spoken command from the shared capture service.
+
+    Args:
+        silence_threshold (float|None): fixed RMS threshold; None uses the
+                                        adaptive noise floor of the VAD
+        silence_duration (float): seconds of silence that end the command
+        vad: voice-activity detector, defaults to vad.EnergyVAD from the environment
+        capture (CaptureService|None): defaults to the process-wide microphone service
+        start_position (int|None): ring-buffer position to start from, e.g. the
+                                   point the wake word was heard; default is now
+    """
+    chunk_size = 1024
+    if vad is None:
+        vad = EnergyVAD.from_env(sample_rate, chunk_size, fixed_threshold=silence_threshold)
+    capture = capture or audio_capture.get_capture()
+    reader = capture.reader(position=start_position)
+    return audio_capture.utterance_chunks(reader, vad, sample_rate, silence_duration, chunk_size)
+
+def record_audio(filename="command.wav", sample_rate=16000, silence_threshold=None, silence_duration=2.0, vad=None,
+                 capture=None, start_position=None):
+    logger.info("Recording... Speak now!")
+    with tracing.span("record"):
+        frames = list(capture_utterance(sample_rate, silence_threshold, silence_duration, vad,
+                                        capture, start_position))
     wf = wave.open(filename, 'wb')
     wf.setnchannels(1)
-    wf.setsampwidth(pa.get_sample_size(pyaudio.paInt16))
+    wf.setsampwidth(2)  # 16-bit PCM
     wf.setframerate(sample_rate)
     wf.writeframes(b''.join(frames))
     wf.close()
-    print(f"Audio recorded to {filename}")
+    logger.info("Audio recorded to %s", filename)
     return filename
 
 def transcribe_audio(path):
-    print("Transcribing audio...")
-    model = whisper.load_model("small")
-    result = model.transcribe(path, language="en")
-    print("Transcription:", result["text"])
+    """Transcribe a recorded WAV file on the shared transcription worker (see transcriber.get_worker)."""
+    logger.info("Transcribing audio...")
+    with tracing.span("whisper"):
+        result = transcriber.get_worker().transcribe(transcriber.load_wav(path), language="en")
+    logger.info("Transcription: %s", result["text"])
     return result["text"]
 
-def listen_for_wake_word():
-    print("Listening for wake word ('terminator')...")
+def record_and_transcribe_stream(sample_rate=16000, silence_threshold=None, silence_duration=2.0, vad=None,
+                                 capture=None, start_position=None):
+    """Transcribe straight from the microphone while the user is speaking, without command.wav."""
+    def show_partial(text):
+        logger.info("  … %s", text)
+
+    stream = transcriber.StreamingTranscriber(sample_rate=sample_rate, on_partial=show_partial)
+    with tracing.span("record"):
+        for chunk in capture_utterance(sample_rate, silence_threshold, silence_duration, vad,
+                                       capture, start_position):
+            stream.feed(chunk)
+    # Only the decode left after the user stops talking adds to the turn's latency
+    with tracing.span("whisper"):
+        text = stream.finish()
+    logger.info("Transcription: %s", text)
+    return text
+
+def listen_for_wake_word(capture=None):
+    """
+    Block until the wake word is heard on the shared capture service.
+
+    Returns:
+        int: ring-buffer position right after the wake word, so recording can
+             pick up from there without reopening the device
+    """
+    import pvporcupine
+
+    logger.info("Listening for wake word ('terminator')...")
+    capture = capture or audio_capture.get_capture()
     porcupine = pvporcupine.create(access_key=PORCUPINE_ACCESS_KEY, keywords=["terminator"])
-    pa = pyaudio.PyAudio()
-    audio_stream = pa.open(
-        rate=porcupine.sample_rate,
-        channels=1,
-        format=pyaudio.paInt16,
-        input=True,
-        frames_per_buffer=porcupine.frame_length
-    )
+    reader = capture.reader()
     try:
         while True:
-            pcm = audio_stream.read(porcupine.frame_length, exception_on_overflow=False)
+            pcm = reader.read(porcupine.frame_length)
             pcm = struct.unpack_from("h" * porcupine.frame_length, pcm)
             result = porcupine.process(pcm)
             if result >= 0:
-                print("Wake word detected!")
-                break
+                logger.info("Wake word detected!")
+                return reader.position
     finally:
-        audio_stream.stop_stream()
-        audio_stream.close()
-        pa.terminate()
         porcupine.delete()
 
 def speak_mac(text):
     # Use macOS 'say' command for TTS
+    if not shutil.which("say"):
+        logger.warning("No local TTS available, cannot speak: %s", text)
+        return
     subprocess.run(["say", text])
 
 async def speak_edge_tts_async(text):
@@ -135,17 +199,43 @@ async def speak_edge_tts_async(text):
         # Other voices:
         # "en-GB-RyanNeural"
 
-        voice = "en-GB-ThomasNeural" 
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save("output.mp3")
-        
-        # Play the audio on macOS
-        subprocess.run(["afplay", "output.mp3"])
+        # Decode and play the audio chunks as they arrive, no output.mp3 or player process.
+        # Phrases said before come straight from the on-disk cache.
+        cache = tts_cache.get_cache()
+        if cache is not None:
+            chunks = cache.stream(text, TTS_VOICE, tts.stream_edge)
+        else:
+            chunks = tts.stream_edge(text, TTS_VOICE)
+        with tracing.span("tts.stream"):
+            await playback.get_player().play_stream(chunks)
         
     except Exception as e:
-        print(f"[ERROR] Edge TTS error: {e}")
-        print("[INFO] Falling back to macOS say command")
-        speak_mac(text)
+        logger.error("Edge TTS error: %s", e)
+        logger.info("Falling back to macOS say command")
+        await asyncio.to_thread(speak_mac, text)
+
+async def play_mp3(audio, sentence):
+    """Play one synthesised sentence; fall back to macOS say if synthesis failed."""
+    if audio is None:
+        await asyncio.to_thread(speak_mac, sentence)
+        return
+    with tracing.span("playback"):
+        await playback.get_player().play(audio)
+
+async def synthesize_sentence(sentence):
+    try:
+        with tracing.span("tts.synthesis"):
+            cache = tts_cache.get_cache()
+            if cache is not None:
+                return await cache.synthesize(sentence, TTS_VOICE, tts.synthesize_edge)
+            return await tts.synthesize_edge(sentence, TTS_VOICE)
+    except Exception as e:
+        logger.error("Edge TTS error: %s", e)
+        return None
+
+async def speak_sentences(sentences):
+    """Speak an async stream of sentences, synthesising ahead while earlier ones play."""
+    return await tts.speak_stream(sentences, synthesize_sentence, play_mp3)
 
 def speak_edge_tts(text):
     """Synchronous wrapper for Edge TTS"""
@@ -153,245 +243,300 @@ def speak_edge_tts(text):
         # Run the async function
         asyncio.run(speak_edge_tts_async(text))
     except Exception as e:
-        print(f"[ERROR] Edge TTS wrapper error: {e}")
+        logger.error("Edge TTS wrapper error: %s", e)
         speak_mac(text)
 
 def speak_elevenlabs(text, voice_id=None):
     """DEPRECATED: ElevenLabs TTS - now uses Edge TTS by default"""
-    print("[INFO] Using Edge TTS instead of ElevenLabs")
+    logger.info("Using Edge TTS instead of ElevenLabs")
     speak_edge_tts(text)
 
-def ask_gpt_openrouter(prompt):
-    api_key = OPENROUTER_API_KEY
-    if not api_key:
-        print("[ERROR] OPENROUTER_API_KEY not set.")
-        return "I'm sorry, I can't process your request right now."
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key,
-    )
-    system_prompt = (
-        "You are Elven, a wise, helpful, and friendly AI assistant with a touch of fantasy. "
-        "You speak concisely, with a gentle and encouraging tone, as if you are a trusted magical guide. "
-        "Keep your answers short and to the point within 25 words. "
-        "Do not include any Markdown, asterisks, or model names in your response. "
-        "Do not mention you are an AI or language model. Speak as Elven only."
-    )
-    print(f"[Main Response] Using model: {RESPONSE_MODEL}")
+ELVEN_SYSTEM_PROMPT = (
+    "You are Elven, a wise, helpful, and friendly AI assistant with a touch of fantasy. "
+    "You speak concisely, with a gentle and encouraging tone, as if you are a trusted magical guide. "
+    "Keep your answers short and to the point within 25 words. "
+    "Do not include any Markdown, asterisks, or model names in your response. "
+    "Do not mention you are an AI or language model. Speak as Elven only."
+)
+
+SUMMARY_PROMPT = (
+    "Summarise this conversation between a user and Elven, their assistant, in at most 60 words. "
+    "Keep names, places, dates, tasks and anything still unanswered. Plain text only."
+)
+
+def summarise_conversation(previous, turns):
+    """Fold older turns into the running summary (runs in conversation.py's background thread)."""
+    if not OPENROUTER_API_KEY:
+        return conversation.extractive_summary(previous, turns)
+    transcript = "\n".join(f"User: {user}\nElven: {reply}" for user, reply in turns)
+    if previous:
+        transcript = f"Summary so far: {previous}\n\n{transcript}"
+    client = http_pool.get_openai_client(OPENROUTER_BASE_URL, OPENROUTER_API_KEY)
     completion = client.chat.completions.create(
         model=RESPONSE_MODEL,
-        max_tokens=40,
+        max_tokens=120,
         messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt}
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript}
         ]
     )
     return completion.choices[0].message.content
 
-def add_todoist_task(task, token=TODOIST_API_TOKEN):
-    # Extract due date if present
-    due_phrases = ["today", "tomorrow", "tonight", "this week", "next week", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    due_string = None
-    for phrase in due_phrases:
-        if phrase in task.lower():
-            due_string = phrase
-            # Remove the due phrase from the task content
-            task = re.sub(rf"\b{phrase}\b", "", task, flags=re.IGNORECASE).strip()
-            break
-    headers = {"Authorization": f"Bearer {token}"}
-    data = {"content": task}
-    if due_string:
-        data["due_string"] = due_string
-    response = requests.post(
-        "https://api.todoist.com/rest/v2/tasks", headers=headers, json=data
-    )
-    if response.status_code == 200 or response.status_code == 204:
+def get_conversation(session_id="default"):
+    """The session's conversation history, or None when CONVERSATION=0."""
+    return conversation.get_conversation(session_id, ELVEN_SYSTEM_PROMPT, summarise_conversation)
+
+def chat_messages(prompt, session_id="default"):
+    """The system prompt (always first, so the provider can cache it), recent history and the prompt."""
+    history = get_conversation(session_id)
+    if history is not None:
+        return history.messages(prompt)
+    return [
+        {"role": "system", "content": ELVEN_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def ask_gpt_openrouter(prompt, session_id="default"):
+    api_key = OPENROUTER_API_KEY
+    if not api_key:
+        logger.error("OPENROUTER_API_KEY not set.")
+        return "I'm sorry, I can't process your request right now."
+    client = http_pool.get_openai_client(OPENROUTER_BASE_URL, api_key)
+    logger.debug("Main response from model %s", RESPONSE_MODEL)
+    with tracing.span("openrouter"):
+        completion = client.chat.completions.create(
+            model=RESPONSE_MODEL,
+            max_tokens=40,
+            messages=chat_messages(prompt, session_id)
+        )
+    return completion.choices[0].message.content
+
+async def ask_gpt_openrouter_stream(prompt, session_id="default"):
+    """Yield the reply text as the model generates it."""
+    api_key = OPENROUTER_API_KEY
+    if not api_key:
+        logger.error("OPENROUTER_API_KEY not set.")
+        yield "I'm sorry, I can't process your request right now."
+        return
+    client = http_pool.get_async_openai_client(OPENROUTER_BASE_URL, api_key)
+    logger.debug("Main response streaming from model %s", RESPONSE_MODEL)
+    with tracing.span("openrouter.connect"):
+        stream = await client.chat.completions.create(
+            model=RESPONSE_MODEL,
+            max_tokens=40,
+            messages=chat_messages(prompt, session_id),
+            stream=True,
+        )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def add_todoist_task(task, token=None, due=None):
+    """
+    Add a task to Todoist (through the write-behind queue unless TODOIST_QUEUE=0).
+
+    Args:
+        task (str): task text; without due, a due phrase in it is taken out and used
+        token (str|None): Todoist API token, default TODOIST_API_TOKEN
+        due (str|None): due date as classified, passed to Todoist as its due_string
+    """
+    token = token or TODOIST_API_TOKEN
+    if not token:
+        logger.error("TODOIST_API_TOKEN not set.")
+        return "Failed to add task: TODOIST_API_TOKEN not set."
+    due_string = due
+    if due_string is None:
+        task, due_string = intent_rules.split_due(task)
+    queue = todoist_queue.get_queue(token)
+    if queue is not None:
+        # Confirm as soon as the task is on disk; the queue syncs it in the background
+        queue.enqueue(task, due_string)
+    else:
+        headers = {"Authorization": f"Bearer {token}"}
+        data = {"content": task}
         if due_string:
-            return f"Task added: {task} (due {due_string})"
-        else:
-            return f"Task added: {task}"
+            data["due_string"] = due_string
+        response = http_pool.get_client("todoist").post(
+            "/rest/v2/tasks", headers=headers, json=data
+        )
+        if response.status_code not in (200, 204):
+            return f"Failed to add task: {response.text}"
+        todoist_mirror.get_mirror(token).invalidate()
+    if due_string:
+        return f"Task added: {task} (due {due_string})"
     else:
-        return f"Failed to add task: {response.text}"
+        return f"Task added: {task}"
 
-def list_todoist_tasks(token=TODOIST_API_TOKEN):
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(
-        "https://api.todoist.com/rest/v2/tasks", headers=headers
-    )
-    if response.status_code == 200:
-        tasks = response.json()
-        if not tasks:
-            return "You have no tasks."
-        return "Your tasks are: " + ", ".join(task["content"] for task in tasks)
-    else:
-        return f"Failed to fetch tasks: {response.text}"
+def list_todoist_tasks(token=None, due=None, project=None, more=False):
+    """
+    Read out the user's tasks from the local mirror, one page at a time.
+
+    Args:
+        due (str|None): only tasks due then, e.g. "today" or "this week"
+        project (str|None): only tasks in this project
+        more (bool): continue the previous list with its next page
+    """
+    token = token or TODOIST_API_TOKEN
+    # Tasks still waiting in the write-behind queue are included too
+    queue = todoist_queue.get_queue(token)
+    pending = [{"content": task["content"], "due": {"string": task["due_string"]} if task["due_string"] else None}
+               for task in (queue.pending() if queue is not None else [])]
+    try:
+        return todoist_mirror.get_mirror(token).speak(due=due, project=project, more=more, extra=pending)
+    except requests.RequestException as e:
+        return f"Failed to fetch tasks: {e}"
 
-def get_weather(city, api_key=OPENWEATHERMAP_API_KEY):
+def get_weather(city, api_key=None):
+    api_key = api_key or OPENWEATHERMAP_API_KEY
     if not api_key:
         return "Weather API key not set."
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        temp = data['main']['temp']
-        desc = data['weather'][0]['description']
-        return f"The weather in {city} is {desc} with a temperature of {temp}°C."
-    else:
-        return f"Could not fetch weather for {city}."
+    return weather_service.get_service(api_key).describe(city)
+
+def build_backends(session_id="default"):
+    """The real services used by the turn pipeline; replies use the session's conversation history."""
+    def add_task(task, due):
+        return add_todoist_task(task, token=TODOIST_API_TOKEN, due=due)
 
-def classify_intent_and_entities(transcription):
+    return pipeline.Backends(
+        classify=classify_intent_and_entities,
+        respond=lambda text: ask_gpt_openrouter(text, session_id),
+        add_task=add_task,
+        get_weather=get_weather,
+        speak=speak_edge_tts_async,
+        list_tasks=lambda due, project, more: list_todoist_tasks(TODOIST_API_TOKEN, due, project, more),
+        respond_stream=lambda text: ask_gpt_openrouter_stream(text, session_id),
+        speak_stream=speak_sentences,
+        # The reply is side-effect free, so start it alongside intent classification
+        speculate=SPECULATIVE_LLM and bool(OPENROUTER_API_KEY),
+    )
+
+async def run_command(backends, capture=None, silence_duration=2.0, start_position=None, interruptible=None):
     """
-    Classify intent and extract entities using local FastAPI endpoint with Phi-2 model.
-    
+    Record, transcribe and answer one spoken command.
+
     Args:
-        transcription (str): The transcribed user speech
-        
+        backends (pipeline.Backends): the services the turn talks to
+        capture (CaptureService|None): audio source, defaults to the microphone
+        silence_duration (float): seconds of silence that end the command
+        start_position (int|None): ring-buffer position to record from (default: now)
+        interruptible (bool|None): stop answering when the user speaks; default BARGE_IN
+
     Returns:
-        dict: Intent classification with format:
-              {"intent": str, "task": str|None, "due": str|None, "location": str|None}
+        dict: {"transcription", "intent", "response", "end_conversation", "resume_position"};
+              intent is "exit" when the user asked to quit and "interrupted" when they
+              talked over the reply. resume_position, if set, is where the next command
+              started and should be recorded from.
     """
-    api_url = PHI2_API_URL
-    if not api_url:
-        print("[ERROR] PHI2_API_URL not set. Falling back to null intent.")
-        return {"intent": "null", "task": None, "due": None, "location": None}
-    
-    # Prepare the request
-    endpoint = f"{api_url.rstrip('/')}/api/convert"
-    payload = {"text": transcription}
-    
-    try:
-        print(f"[Intent Extraction] Calling local API: {endpoint}")
-        response = requests.post(
-            endpoint,
-            json=payload,
-            timeout=30,  # 30-second timeout
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code != 200:
-            print(f"[ERROR] API returned status {response.status_code}: {response.text}")
-            return {"intent": "null", "task": None, "due": None, "location": None}
-        
-        # Parse the response
-        try:
-            api_response = response.json()
-            print(f"[DEBUG] Raw API Response: {api_response}")
-        except ValueError as e:
-            print(f"[ERROR] Failed to parse JSON response: {e}")
-            return {"intent": "null", "task": None, "due": None, "location": None}
-        
-        # Handle different response formats
-        if "structured_data" in api_response:
-            # Format from actual Phi-2 API
-            structured_data = api_response["structured_data"]
-            api_intent = structured_data.get("intent", "").lower()
-            task = structured_data.get("task")
-            location = structured_data.get("location")
-            schedule = structured_data.get("schedule") or structured_data.get("datetime")
+    # One trace record and one request ID per command, from recording to the end of the reply;
+    # the ID goes with the command to the intent server, so its log lines can be matched up
+    with logs.request() as request_id, tracing.turn(request_id=request_id):
+        logger.info("🎙️  Recording... Speak now!")
+        if TRANSCRIBE_MODE == "file":
+            audio_path = await asyncio.to_thread(record_audio, silence_duration=silence_duration,
+                                                 capture=capture, start_position=start_position)
+            logger.info("🔄 Transcribing audio...")
+            transcription = await asyncio.to_thread(transcribe_audio, audio_path)
         else:
-            # Format from mock API
-            api_intent = api_response.get("intent", "").lower()
-            task = api_response.get("task")
-            location = api_response.get("location") 
-            schedule = api_response.get("due_date")
-        
-        # Use model's intent directly (no mapping needed)
-        result = {
-            "intent": api_intent,  # Use your model's intent directly
-            "task": None,
-            "due": None,
-            "location": None
-        }
-        
-        if api_intent == "add_task":
-            # Extract task and due date
-            result["task"] = task
-            result["due"] = schedule
-            
-        elif api_intent == "get_weather":
-            # Extract location
-            result["location"] = location
-            
-        elif api_intent == "send_email":
-            # Could extract recipient, subject, body in the future
-            pass
-        
-        print(f"[Intent Extraction] Result: {result}")
-        return result
-        
-    except requests.exceptions.Timeout:
-        print("[ERROR] API request timed out (30 seconds)")
-        return {"intent": "null", "task": None, "due": None, "location": None}
-    
-    except requests.exceptions.ConnectionError:
-        print(f"[ERROR] Could not connect to API at {endpoint}")
-        return {"intent": "null", "task": None, "due": None, "location": None}
-    
-    except Exception as e:
-        print(f"[ERROR] Unexpected error calling API: {e}")
-        return {"intent": "null", "task": None, "due": None, "location": None}
+            transcription = await asyncio.to_thread(record_and_transcribe_stream, silence_duration=silence_duration,
+                                                    capture=capture, start_position=start_position)
 
-def main():
-    print("🎤 Elven Personal Assistant starting up...")
-    print("🔊 Using Microsoft Edge TTS for high-quality speech synthesis")
-    print("📝 No wake word needed - press Enter to record each command")
-    print("💬 Say 'goodbye' or 'quit' to exit")
-    print("=" * 50)
-    
-    while True:
-        # Wait for user to press Enter
-        try:
-            input("\n🔴 Press Enter to start recording (or Ctrl+C to quit)...")
-        except KeyboardInterrupt:
-            print("\n👋 Goodbye!")
-            break
-            
-        print("🎙️  Recording... Speak now!")
-        audio_path = record_audio()
-        
-        print("🔄 Transcribing audio...")
-        transcription = transcribe_audio(audio_path)
-        
         # Check for exit commands
         if any(phrase in transcription.lower() for phrase in STOP_PHRASES + ["quit", "exit"]):
-            print("Conversation ended by user.")
-            speak_edge_tts("Goodbye.")
-            break
-            
-        print(f"📝 You said: '{transcription}'")
-        
-        # LLM-based intent and entity extraction
-        print("🧠 Processing with Phi-2...")
-        intent_data = classify_intent_and_entities(transcription)
-        intent = intent_data.get("intent")
-        task = intent_data.get("task")
-        due = intent_data.get("due")
-        location = intent_data.get("location")
-        
-        # Change this part in main():
-        if intent == "add_task" and task:  # ← Changed from "todoist_add" 
-            result = add_todoist_task(task if not due else f"{task} {due}", token=TODOIST_API_TOKEN)
-            print(f"✅ {result}")
-            speak_edge_tts(result)
-            
-        elif intent == "get_weather" and location:  # ← Changed from "weather"
-            result = get_weather(location)
-            print(f"🌤️  {result}")
-            speak_edge_tts(result)
-            
-        elif intent == "send_email":  # ← Handle this appropriately
-            print("📧 Email functionality not implemented yet")
-            speak_edge_tts("Email functionality is not available yet.")
-            
+            logger.info("Conversation ended by user.")
+            await speak_edge_tts_async("Goodbye.")
+            return {"transcription": transcription, "intent": "exit", "response": "Goodbye.",
+                    "end_conversation": True, "resume_position": None}
+
+        logger.info("📝 You said: '%s'", transcription)
+
+        # Intent extraction (Phi-2) runs concurrently with a speculative reply
+        logger.info("🧠 Processing with Phi-2...")
+        turn_task = asyncio.create_task(pipeline.handle_turn(transcription, backends, stop_phrases=STOP_PHRASES))
+        if BARGE_IN if interruptible is None else interruptible:
+            monitor = barge_in.BargeInMonitor.from_env(capture or audio_capture.get_capture(), playback.get_player())
+            turn, resume_position = await monitor.guard(turn_task)
         else:
-            # General conversation
-            gpt_response = ask_gpt_openrouter(transcription)
-            print(f"🤖 AI Response: {gpt_response}")
-            speak_edge_tts(gpt_response)
-            
-            if any(phrase in gpt_response.lower() for phrase in STOP_PHRASES):
-                print("Conversation ended by assistant.")
+            turn, resume_position = await turn_task, None
+        if turn is None:
+            tracing.annotate(barge_in=True)
+            return {"transcription": transcription, "intent": "interrupted", "response": "",
+                    "end_conversation": False, "resume_position": resume_position}
+    # Commands are remembered too, so "and in Paris?" can follow a weather answer
+    history = get_conversation()
+    if history is not None:
+        history.add_turn(transcription, turn["response"])
+    return dict(turn, transcription=transcription, resume_position=resume_position)
+
+async def main_async():
+    logger.info("🎤 Elven Personal Assistant starting up...")
+    logger.info("🔊 Using Microsoft Edge TTS for high-quality speech synthesis")
+    logger.info("📝 No wake word needed - press Enter to record each command")
+    if BARGE_IN:
+        logger.info("✋ Talk over a reply to interrupt it")
+    logger.info("💬 Say 'goodbye' or 'quit' to exit")
+    logger.info("=" * 50)
+
+    engine = transcriber.get_engine()
+    logger.info("🧠 Loading Whisper model '%s'...", engine.model_name)
+    transcriber.preload()
+    if engine.loaded:
+        logger.info("✅ Whisper model ready (%.1fs)", engine.load_seconds)
+    # Open the microphone and speaker once; every turn reuses them
+    audio_capture.get_capture()
+    playback.get_player()
+    if TODOIST_API_TOKEN:
+        # Mirror the task list now so "list my tasks" is answered locally
+        todoist_mirror.get_mirror(TODOIST_API_TOKEN).refresh_in_background()
+    if OPENWEATHERMAP_API_KEY:
+        weather_service.get_service(OPENWEATHERMAP_API_KEY).start_prefetch()
+    backends = build_backends()
+    resume_position = None
+    
+    while True:
+        # Wait for user to press Enter, unless they already started talking over the last reply
+        if resume_position is None:
+            logs.flush()  # so the prompt comes after the last turn's output
+            try:
+                input("\n🔴 Press Enter to start recording (or Ctrl+C to quit)...")
+            except KeyboardInterrupt:
+                logger.info("\n👋 Goodbye!")
                 break
+            
+        turn = await run_command(backends, start_position=resume_position)
+        resume_position = turn["resume_position"]
+        if turn["intent"] == "exit":
+            break
+        if turn["end_conversation"]:
+            logger.info("Conversation ended by assistant.")
+            break
+
+def main():
+    parser = argparse.ArgumentParser(description="Elven personal assistant")
+    parser.add_argument("--stats", action="store_true",
+                        help="print p50/p95/p99 latency per stage on exit")
+    parser.add_argument("--trace", choices=["jsonl", "chrome"], default=None,
+                        help="write a per-turn trace (default ELVEN_TRACE)")
+    parser.add_argument("--trace-file", default=None, help="trace output file (default ELVEN_TRACE_FILE)")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("ELVEN_METRICS_PORT", "0")),
+                        help="serve GET /metrics with the latency histograms on this local port")
+    args = parser.parse_args()
+
+    # Load environment variables from .env.local
+    load_settings('.env.local')
+    logs.configure_from_env()
+    tracing.configure_from_env(stats=args.stats or bool(args.metrics_port), export=args.trace,
+                               path=args.trace_file)
+    if args.metrics_port:
+        tracing.serve_metrics(args.metrics_port)
+        logger.info("📈 Latency metrics on http://127.0.0.1:%d/metrics", args.metrics_port)
+    try:
+        # One event loop for the whole session instead of one per spoken reply
+        asyncio.run(main_async())
+    finally:
+        if args.stats:
+            # Straight to stdout, so the report shows whatever ELVEN_LOG_LEVEL filters out
+            logs.flush()
+            print(tracing.format_stats())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Headless multi-session server: many assistants on one host.
+
+Clients send turns as text or audio over HTTP and read the reply as a stream
+of newline-delimited JSON events, so the first sentence reaches them while
+the rest is still being generated. Every session shares the one resident
+Whisper model, the pooled HTTP clients (http_pool.py) and the TTS cache;
+each session has its own conversation history (conversation.py).
+
+Endpoints:
+    POST   /v1/sessions                   -> {"session_id": ...}
+    POST   /v1/sessions/{id}/turns        a turn; body is JSON {"text": ...}, a 16 kHz mono
+                                          16-bit WAV (audio/wav) or raw PCM (audio/l16);
+                                          ?voice=1 adds synthesised speech to the reply
+    DELETE /v1/sessions/{id}
+    GET    /v1/status                     sessions and transcription queue
+    GET    /metrics                       per-stage latency histograms (tracing.py)
+
+A turn's response (application/x-ndjson), one event per line:
+    {"event": "transcription", "text": ...}             audio turns only
+    {"event": "sentence", "text": ...}                  each reply sentence as soon as it is complete
+    {"event": "audio", "format": "mp3", "data": ...}    base64 speech for the sentence (voice=1)
+    {"event": "done", "intent", "response", "end_conversation", "latency_ms"}
+    {"event": "error", "message": ...}
+
+Load is bounded in two places:
+    - Transcription jobs go to the shared transcription worker
+      (transcriber.TranscriptionWorker), which batches clips that arrive
+      together and has a bounded queue; when it is full the turn is refused
+      with 503 and Retry-After rather than queued without limit.
+    - A session runs one turn at a time (429 while one is in flight), and
+      its reply events go through a small buffer: a client that stops
+      reading stops having sentences synthesised for it, without holding
+      up anybody else. A client that disconnects cancels its turn.
+
+Each turn is logged and traced under its request ID: the X-Request-ID
+header the client sent, or a new one, returned in the response headers.
+
+Todoist and OpenWeatherMap credentials come from the environment and are
+shared by every session.
+
+Usage:
+    python3 elven_server.py [--port 8080] [--whisper-workers 1] [--whisper-queue 16]
+
+Configuration (and WHISPER_WORKERS, WHISPER_QUEUE, WHISPER_MAX_BATCH, ...
+for transcription, see transcriber.py):
+    SERVER_MAX_PENDING       turns a session may have in flight (default 1)
+    SERVER_STREAM_BUFFER     reply events buffered for a slow client (default 8)
+    SERVER_MAX_SESSIONS      sessions kept; idle ones are dropped oldest first (default 1000)
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import time
+import uuid
+import wave
+from collections import OrderedDict
+
+import logs
+import pipeline
+import tracing
+import transcriber
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(RuntimeError):
+    """The server is at capacity (transcription queue or sessions); the client should retry later."""
+
+
+class SessionBusy(RuntimeError):
+    """The session already has as many turns in flight as it may."""
+
+
+class Session:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.pending = 0
+        self.turns = 0
+        self.last_used = time.time()
+        self.lock = asyncio.Lock()
+
+
+def decode_audio(body, content_type):
+    """
+    Turn a request body into the float32 array Whisper takes.
+
+    Raises:
+        ValueError: not 16 kHz mono 16-bit audio
+    """
+    if content_type.startswith(("audio/wav", "audio/x-wav", "audio/wave")):
+        try:
+            with wave.open(io.BytesIO(body), "rb") as wf:
+                if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != transcriber.SAMPLE_RATE:
+                    raise ValueError(f"expected {transcriber.SAMPLE_RATE} Hz mono 16-bit audio")
+                body = wf.readframes(wf.getnframes())
+        except wave.Error as e:
+            raise ValueError(f"unreadable WAV: {e}")
+    elif not content_type.startswith(("audio/l16", "application/octet-stream")):
+        raise ValueError(f"unsupported content type '{content_type}'")
+    if len(body) < 2:
+        raise ValueError("no audio")
+    return transcriber.pcm_to_float32(body[:len(body) // 2 * 2])
+
+
+def _elven_backends(session_id):
+    import elven
+    return elven.build_backends(session_id)
+
+
+def _elven_history(session_id):
+    import elven
+    return elven.get_conversation(session_id)
+
+
+async def _elven_synthesize(sentence):
+    import elven
+    return await elven.synthesize_sentence(sentence)
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+class AssistantServer:
+    """Sessions, transcription and the turn logic, independent of the HTTP layer."""
+
+    def __init__(self, build_backends=None, get_history=None, synthesize=None, worker=None,
+                 max_pending=1, stream_buffer=8, max_sessions=1000):
+        """
+        Args:
+            build_backends (callable|None): build_backends(session_id) -> pipeline.Backends;
+                                            defaults to elven.build_backends
+            get_history (callable|None): get_history(session_id) -> Conversation|None;
+                                         defaults to elven.get_conversation
+            synthesize (coroutine function|None): synthesize(sentence) -> MP3 bytes for voice replies
+            worker (TranscriptionWorker|None): defaults to the shared transcription worker
+            max_pending (int): turns a session may have in flight
+            stream_buffer (int): reply events buffered per turn for a slow client
+            max_sessions (int): sessions kept before idle ones are dropped
+        """
+        self.build_backends = build_backends or _elven_backends
+        self.get_history = get_history or _elven_history
+        self.synthesize = synthesize or _elven_synthesize
+        self.pool = worker or transcriber.get_worker()
+        self.max_pending = max_pending
+        self.stream_buffer = stream_buffer
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    @classmethod
+    def from_env(cls, **overrides):
+        settings = dict(
+            max_pending=int(os.getenv("SERVER_MAX_PENDING", "1")),
+            stream_buffer=int(os.getenv("SERVER_STREAM_BUFFER", "8")),
+            max_sessions=int(os.getenv("SERVER_MAX_SESSIONS", "1000")),
+        )
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**settings)
+
+    def create_session(self):
+        """
+        Raises:
+            Overloaded: max_sessions reached and every session has a turn in flight
+        """
+        while len(self.sessions) >= self.max_sessions:
+            idle = next((s for s in self.sessions.values() if not s.pending), None)
+            if idle is None:
+                raise Overloaded(f"{len(self.sessions)} sessions are busy")
+            self.end_session(idle.id)
+        session = Session(uuid.uuid4().hex)
+        self.sessions[session.id] = session
+        return session
+
+    def end_session(self, session_id):
+        import conversation
+        self.sessions.pop(session_id, None)
+        conversation.end_session(session_id)
+
+    def start_turn(self, session_id, text=None, audio=None, voice=False):
+        """
+        Admit a turn and start it. Checks are made before anything is sent,
+        so the HTTP layer can still answer with an error status.
+
+        Args:
+            text (str|None): the user's words, for a text turn
+            audio (numpy.ndarray|None): 16 kHz float32 audio, for a spoken turn
+            voice (bool): synthesise speech for each reply sentence
+
+        Returns:
+            async iterator: the turn's events, ending with "done" or "error"
+
+        Raises:
+            KeyError: no such session
+            SessionBusy: the session already has max_pending turns in flight
+            Overloaded: the transcription queue is full
+        """
+        session = self.sessions[session_id]
+        if session.pending >= self.max_pending:
+            raise SessionBusy(f"session {session_id} already has a turn in progress")
+        try:
+            future = self.pool.submit(audio) if audio is not None else None
+        except transcriber.QueueFull as e:
+            raise Overloaded(str(e))
+        session.pending += 1
+        session.last_used = time.time()
+        self.sessions.move_to_end(session_id)
+        events = asyncio.Queue(maxsize=self.stream_buffer)
+        task = asyncio.create_task(self._run_turn(session, text, future, voice, events))
+        return self._events(task, events)
+
+    async def _events(self, task, events):
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            await task
+        finally:
+            # The client went away: stop generating a reply nobody will read
+            task.cancel()
+
+    async def _run_turn(self, session, text, future, voice, events):
+        start = time.perf_counter()
+        latency = {}
+        try:
+            async with session.lock:
+                with tracing.turn(session=session.id, request_id=logs.request_id()):
+                    if future is not None:
+                        with tracing.span("whisper"):
+                            text = (await asyncio.wrap_future(future))["text"].strip()
+                        latency["transcribe_ms"] = _ms(start)
+                        await events.put({"event": "transcription", "text": text})
+                    if not text:
+                        await events.put({"event": "error", "message": "no speech recognised"})
+                    else:
+                        backends = self._session_backends(session, voice, events, start, latency)
+                        turn = await pipeline.handle_turn(text, backends)
+                        history = self.get_history(session.id)
+                        if history is not None:
+                            history.add_turn(text, turn["response"])
+                        session.turns += 1
+                        latency["total_ms"] = _ms(start)
+                        logger.info("Session %s: %s in %.0f ms", session.id, turn["intent"], latency["total_ms"])
+                        await events.put(dict(turn, event="done", latency_ms=latency))
+        except asyncio.CancelledError:
+            if future is not None:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error("Turn failed in session %s: %s", session.id, e)
+            await events.put({"event": "error", "message": str(e)})
+        finally:
+            session.pending -= 1
+            session.last_used = time.time()
+        await events.put(None)
+
+    def _session_backends(self, session, voice, events, start, latency):
+        backends = self.build_backends(session.id)
+
+        async def emit(audio, sentence):
+            latency.setdefault("first_sentence_ms", _ms(start))
+            await events.put({"event": "sentence", "text": sentence})
+            if audio:
+                await events.put({"event": "audio", "format": "mp3", "data": base64.b64encode(audio).decode("ascii")})
+
+        async def speak(text):
+            await emit(await self.synthesize(text) if voice else None, text)
+
+        async def speak_stream(sentences):
+            if voice:
+                import tts
+                await tts.speak_stream(sentences, self.synthesize, emit)
+            else:
+                async for sentence in sentences:
+                    await emit(None, sentence)
+
+        backends.speak = speak
+        backends.speak_stream = speak_stream
+        return backends
+
+    def status(self):
+        return {"sessions": len(self.sessions),
+                "busy_sessions": sum(1 for s in self.sessions.values() if s.pending),
+                "transcription": self.pool.stats()}
+
+
+def create_app(server):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Elven assistant server")
+    app.add_middleware(logs.RequestIdMiddleware)
+
+    def refused(message, status):
+        return JSONResponse({"error": message}, status_code=status, headers={"Retry-After": "1"})
+
+    @app.post("/v1/sessions")
+    async def create_session():
+        try:
+            return {"session_id": server.create_session().id}
+        except Overloaded as e:
+            return refused(str(e), 503)
+
+    @app.delete("/v1/sessions/{session_id}")
+    async def end_session(session_id: str):
+        server.end_session(session_id)
+        return {"ok": True}
+
+    @app.post("/v1/sessions/{session_id}/turns")
+    async def turn(session_id: str, request: Request, voice: bool = False):
+        content_type = request.headers.get("content-type", "").lower()
+        text = audio = None
+        try:
+            if content_type.startswith("application/json"):
+                text = str((await request.json()).get("text") or "").strip()
+                if not text:
+                    raise ValueError("empty text")
+            else:
+                audio = decode_audio(await request.body(), content_type)
+            events = server.start_turn(session_id, text=text, audio=audio, voice=voice)
+        except KeyError:
+            return JSONResponse({"error": f"no session {session_id}"}, status_code=404)
+        except SessionBusy as e:
+            return refused(str(e), 429)
+        except Overloaded as e:
+            return refused(str(e), 503)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        async def lines():
+            async for event in events:
+                yield json.dumps(event) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/v1/status")
+    async def status():
+        return server.status()
+
+    @app.get("/metrics")
+    async def metrics():
+        return tracing.stats()
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    import elven
+
+    parser = argparse.ArgumentParser(description="Elven multi-session assistant server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--whisper-workers", type=int, default=None, help="default WHISPER_WORKERS")
+    parser.add_argument("--whisper-queue", type=int, default=None, help="default WHISPER_QUEUE")
+    parser.add_argument("--whisper-batch", type=int, default=None, help="default WHISPER_MAX_BATCH")
+    parser.add_argument("--max-sessions", type=int, default=None, help="default SERVER_MAX_SESSIONS")
+    args = parser.parse_args()
+
+    elven.load_settings(".env.local")
+    worker = transcriber.TranscriptionWorker.from_env(workers=args.whisper_workers, max_queued=args.whisper_queue,
+                                                      max_batch=args.whisper_batch)
+    server = AssistantServer.from_env(worker=worker, max_sessions=args.max_sessions)
+    # Keep a conversation for every session the server keeps
+    os.environ.setdefault("CONVERSATION_MAX_SESSIONS", str(server.max_sessions))
+    logs.configure_from_env()
+    tracing.configure_from_env(stats=True)
+    engine = transcriber.preload()
+    if engine.loaded:
+        logger.info("✅ Whisper model '%s' ready (%.1fs)", engine.model_name, engine.load_seconds)
+    logger.info("🧝 Elven server on http://%s:%d/v1 (%d transcription workers, batches of up to %d, queue %d)",
+                args.host, args.port, worker.workers, worker.max_batch, worker.max_queued)
+    uvicorn.run(create_app(server), host=args.host, port=args.port, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Shared HTTP client layer for outbound API calls.
+
+Each external service gets one long-lived requests.Session with keep-alive
+connection pooling, its own base URL, default headers and timeout, and retry
+with exponential backoff on transient failures (connection errors and
+429/5xx responses). Services are registered with configure() and their
+clients are created on first use with get_client().
+
+Non-idempotent requests (e.g. POST) are only retried when they never reached
+the server, unless the service lists the method in retry_methods.
+
+requests is imported when the first client is built, so registering
+services costs nothing at import time.
+"""
+
+import threading
+import weakref
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ServiceClient:
+    """A pooled, retrying HTTP client bound to one service's base URL."""
+
+    def __init__(self, base_url, headers=None, timeout=10, retries=2, backoff=0.3,
+                 retry_methods=("GET", "HEAD"), retry_reads=True, pool_size=4):
+        """
+        Args:
+            base_url (str): prefix for relative paths, e.g. "https://api.todoist.com"
+            headers (dict|None): headers sent with every request
+            timeout (float|tuple): default timeout for requests
+            retries (int): attempts after the first for transient failures
+            backoff (float): backoff factor; waits backoff * 2**(attempt-1) seconds
+            retry_methods (tuple): methods retried on 429/5xx and read errors
+            retry_reads (bool): retry read errors/timeouts for those methods; when
+                                False a timeout is raised as requests' Timeout
+            pool_size (int): max keep-alive connections kept per host
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = (base_url or "").rstrip("/")
+        self.timeout = timeout
+        retry = Retry(
+            total=None,
+            connect=retries,
+            read=retries if retry_reads else False,
+            status=retries,
+            other=0,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(m.upper() for m in retry_methods),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def url(self, path):
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_configs = {}
+_clients = {}
+_openai_clients = {}
+# event loop -> {(base_url, api_key): AsyncOpenAI}; dropped with the loop
+_async_openai_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def configure(name, base_url, **options):
+    """
+    Register (or re-register) a service. Any existing client for it is closed
+    and rebuilt with the new settings on next use.
+    """
+    with _lock:
+        _configs[name] = dict(base_url=base_url, **options)
+        client = _clients.pop(name, None)
+    if client is not None:
+        client.close()
+
+
+def get_client(name):
+    """Return the shared ServiceClient for a configured service."""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            if name not in _configs:
+                raise KeyError(f"HTTP service '{name}' is not configured")
+            _clients[name] = ServiceClient(**_configs[name])
+        return _clients[name]
+
+
+def get_openai_client(base_url, api_key):
+    """
+    Return a cached OpenAI-compatible client. The client keeps its own
+    connection pool, so reusing it avoids a new TLS handshake per request.
+    """
+    key = (base_url, api_key)
+    client = _openai_clients.get(key)
+    if client is None:
+        from openai import OpenAI
+        with _lock:
+            client = _openai_clients.get(key)
+            if client is None:
+                client = OpenAI(base_url=base_url, api_key=api_key, max_retries=2)
+                _openai_clients[key] = client
+    return client
+
+
+def get_async_openai_client(base_url, api_key):
+    """
+    Return a cached AsyncOpenAI client for the running event loop. Async
+    connection pools are tied to the loop they were created on, so the
+    clients are held by the loop object and released when it is collected.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    key = (base_url, api_key)
+    with _lock:
+        clients = _async_openai_clients.setdefault(loop, {})
+        client = clients.get(key)
+    if client is None:
+        from openai import AsyncOpenAI
+        with _lock:
+            client = clients.get(key)
+            if client is None:
+                client = AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=2)
+                clients[key] = client
+    return client
+
+
+def close_all():
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
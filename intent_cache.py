@@ -0,0 +1,166 @@
+"""
+Memoised intent classification.
+
+A bounded LRU cache in front of the Phi-2 intent service, keyed on
+normalised text: "What's the weather in London?" and "whats the weather in
+london" share one entry. Entries expire after a TTL and can optionally be
+persisted to a JSON file so the cache survives restarts; the file is
+rewritten once per batch of new entries and at exit, not on every miss.
+Failed classifications (intent "null") are never cached.
+
+Configuration:
+    INTENT_CACHE        "0" bypasses the cache (default "1")
+    INTENT_CACHE_SIZE   maximum number of entries (default 256)
+    INTENT_CACHE_TTL    seconds an entry stays valid (default 3600)
+    INTENT_CACHE_FILE   JSON file to persist entries to (default: memory only)
+"""
+
+import atexit
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalise(text):
+    """Fold case, punctuation and whitespace so trivially different transcriptions share a key."""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub("", text.lower())).strip()
+
+
+class IntentCache:
+    """LRU cache of intent results with per-entry expiry."""
+
+    def __init__(self, max_entries=256, ttl=3600, path=None, clock=time.time, save_every=32):
+        """
+        Args:
+            max_entries (int): entries kept before the least recently used is evicted
+            ttl (float): seconds an entry stays valid
+            path (str|None): JSON file to load from and save to; None keeps it in memory
+            clock (callable): wall-clock time source (wall time so expiry survives restarts)
+            save_every (int): new entries collected before the file is rewritten; call save()
+                to write the rest (the process-wide cache does so at exit)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self._unsaved = 0
+        self._entries = OrderedDict()  # key -> (stored_at, result), least recently used first
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = self.clock()
+        for key, stored_at, result in entries:
+            if now - stored_at < self.ttl:
+                self._entries[key] = (stored_at, result)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        """Write the entries to the cache file atomically."""
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[key, stored_at, result] for key, (stored_at, result) in self._entries.items()]
+            self._unsaved = 0
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+
+    def get(self, text):
+        """Return a copy of the cached result for text, or None on a miss."""
+        key = normalise(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] >= self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, text, result):
+        if not result or result.get("intent") in (None, "", "null"):
+            return
+        key = normalise(text)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self.clock(), dict(result))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._unsaved += 1
+            due = self.path and self._unsaved >= self.save_every
+        if due:
+            self.save()
+
+    def classify(self, text, classify):
+        """Return the cached result for text, or classify(text) on a miss."""
+        result = self.get(text)
+        if result is None:
+            result = classify(text)
+            self.put(text, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.save()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "entries": len(self._entries),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_intent_cache():
+    """Return the process-wide cache configured from the environment, or None if bypassed."""
+    global _cache
+    if os.getenv("INTENT_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = IntentCache(
+                max_entries=int(os.getenv("INTENT_CACHE_SIZE", "256")),
+                ttl=float(os.getenv("INTENT_CACHE_TTL", "3600")),
+                path=os.getenv("INTENT_CACHE_FILE") or None,
+            )
+            atexit.register(_cache.save)
+    return _cache
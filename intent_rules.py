@@ -0,0 +1,173 @@
+"""
+In-process first-stage intent classifier.
+
+Precompiled patterns and small gazetteers (due phrases, city names) recognise
+the common commands, such as "add buy milk tomorrow" and "what's the weather
+in London", without a round-trip to the Phi-2 service. Every result carries a
+confidence score; callers only trust high-confidence matches and send
+anything ambiguous to the remote model.
+
+Results use the same format as intents.classify_intent_and_entities:
+    {"intent": str, "task": str|None, "due": str|None, "location": str|None}
+list_tasks results may also carry "project" (a project name filter) and
+"more": True for "more tasks", which continues the previous list.
+"""
+
+import re
+
+DUE_PHRASES = [
+    "today", "tomorrow", "tonight", "this morning", "this afternoon", "this evening",
+    "this week", "next week", "this weekend", "next weekend",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+]
+
+CITIES = [
+    "amsterdam", "athens", "auckland", "austin", "bangkok", "barcelona", "beijing", "belfast",
+    "berlin", "birmingham", "boston", "brighton", "bristol", "brussels", "budapest",
+    "buenos aires", "cairo", "cambridge", "cape town", "cardiff", "chicago", "copenhagen",
+    "dallas", "delhi", "denver", "dubai", "dublin", "edinburgh", "glasgow", "hong kong",
+    "istanbul", "lagos", "leeds", "lisbon", "liverpool", "london", "los angeles", "madrid",
+    "manchester", "melbourne", "mexico city", "miami", "milan", "montreal", "moscow", "mumbai",
+    "munich", "nairobi", "new york", "newcastle", "oslo", "oxford", "paris", "prague", "rome",
+    "san francisco", "seattle", "seoul", "shanghai", "singapore", "stockholm", "sydney",
+    "tokyo", "toronto", "vancouver", "vienna", "warsaw", "washington", "york", "zurich",
+]
+
+CONFIDENT = 0.95
+LIKELY = 0.7
+UNSURE = 0.3
+
+
+def _alternation(phrases):
+    # Longest first so "next week" wins over "week"-like prefixes
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+
+_DUE = re.compile(rf"\b(?:on\s+|by\s+)?({_alternation(DUE_PHRASES)})\b", re.IGNORECASE)
+_CITY = re.compile(rf"^(?:{_alternation(CITIES)})$", re.IGNORECASE)
+
+_ADD_TASK = re.compile(
+    r"^(?:please\s+)?(?:can you\s+|could you\s+)?"
+    r"(?P<verb>add|create|put|remind me to|remember to|make a (?:task|todo|to-do|reminder) to)\s+"
+    r"(?P<marker>a\s+task\s+(?:to\s+)?)?(?P<task>.+?)"
+    r"(?P<list>\s+(?:(?:to|on|in)\s+(?:my\s+|the\s+)?(?:todo|to-do|to do|task|todoist)s?(?:\s+list)?"
+    r"|(?:to|on)\s+(?:my|the)\s+(?:\w+\s+)?list))?"
+    r"\s*[.!?]*$",
+    re.IGNORECASE,
+)
+_LIST_TASKS = re.compile(
+    r"^(?:please\s+)?(?:can you\s+)?(?:(?:list|show|read|tell me|what are|what's on)\b.*"
+    r"\b(?:tasks|todos|to-dos|to do list|todo list|to-do list)|(?:what|which) tasks|what(?:'s| is) (?:due|overdue))\b"
+    r"[^.!?]*[.!?]*$",
+    re.IGNORECASE,
+)
+_LIST_DUE = re.compile(r"\b(?:due\s+|for\s+)?(overdue|today|tonight|tomorrow|this week|next week|"
+                       r"monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.IGNORECASE)
+_LIST_PROJECT = re.compile(r"\b(?:in|for|from|on)\s+(?:my\s+|the\s+)?(?P<project>[a-z][\w ]*?)\s+project\b",
+                           re.IGNORECASE)
+_MORE_TASKS = re.compile(
+    r"^(?:(?:and\s+|ok(?:ay)?\s+)?(?:the\s+)?(?:more|next)\s+(?:tasks|ones|page|five|items)"
+    r"|(?:read|tell me|show me)\s+(?:me\s+)?(?:some\s+)?more(?:\s+tasks)?"
+    r"|continue(?:\s+the)?\s+(?:task\s+)?list)\s*(?:please)?\s*[.!?]*$",
+    re.IGNORECASE,
+)
+_WEATHER = re.compile(r"\b(?:weather|temperature|forecast|raining|rain|sunny|cloudy)\b", re.IGNORECASE)
+_LOCATION = re.compile(
+    r"\b(?:in|for|at)\s+(?P<location>[a-z][a-z .'-]*?)"
+    r"(?:\s+(?:today|tomorrow|tonight|now|right now|this week))?\s*[.!?]*$",
+    re.IGNORECASE,
+)
+_EMAIL = re.compile(r"\b(?:send|write|draft)\b.*\b(?:e-?mail)\b", re.IGNORECASE)
+_SMALL_TALK = re.compile(
+    r"^(?:hi|hello|hey|good (?:morning|afternoon|evening)|thanks|thank you|"
+    r"how are you(?: doing)?(?: today)?|who are you|what's your name)\b[\s,.!?a-z]*$",
+    re.IGNORECASE,
+)
+# Words that belong to another intent family; their presence makes a match ambiguous
+_TASK_WORDS = re.compile(r"\b(?:add|create|remind|remember|todo|to-do|task|tasks)\b", re.IGNORECASE)
+
+
+def _result(intent, task=None, due=None, location=None):
+    return {"intent": intent, "task": task, "due": due, "location": location}
+
+
+def _list_tasks(text, more=False):
+    result = _result("list_tasks")
+    due = _LIST_DUE.search(text)
+    if due:
+        result["due"] = due.group(1).lower()
+    project = _LIST_PROJECT.search(text)
+    if project:
+        result["project"] = project.group("project").strip().title()
+    if more:
+        result["more"] = True
+    return result
+
+
+def split_due(task):
+    """
+    Take the due phrase out of a task.
+
+    Returns:
+        tuple: (task without the phrase, the phrase in lower case or None)
+    """
+    match = _DUE.search(task)
+    if not match:
+        return task, None
+    due = match.group(1).lower()
+    task = (task[:match.start()] + task[match.end():])
+    return re.sub(r"\s{2,}", " ", task).strip(" ,."), due
+
+
+def classify(text):
+    """
+    Classify text locally.
+
+    Returns:
+        tuple: (result dict, confidence in [0, 1])
+    """
+    text = text.strip()
+    if not text:
+        return _result("conversation"), UNSURE
+
+    weather = _WEATHER.search(text)
+
+    # The due phrase goes first, so "... to my list today" still loses its list suffix
+    undated, due = split_due(text)
+    match = _ADD_TASK.match(undated)
+    if match:
+        task = match.group("task").strip(" ,.")
+        if not task:
+            return _result("add_task", None, due), UNSURE
+        if weather:
+            # "remind me to check the weather in London" is a task, but only probably
+            confidence = LIKELY
+        elif match.group("verb").lower() in ("put", "create") and not (match.group("marker") or match.group("list")):
+            # "put the kettle on", "create a poem": only a task when it says which list
+            confidence = LIKELY
+        else:
+            confidence = CONFIDENT
+        return _result("add_task", task, due), confidence
+
+    if _LIST_TASKS.match(text):
+        return _list_tasks(text), CONFIDENT
+
+    if _MORE_TASKS.match(text):
+        return _list_tasks(text, more=True), CONFIDENT
+
+    if weather:
+        location_match = _LOCATION.search(text)
+        location = location_match.group("location").strip() if location_match else None
+        if location and _CITY.match(location):
+            confidence = LIKELY if _TASK_WORDS.search(text) else CONFIDENT
+            return _result("get_weather", location=location.title()), confidence
+        # Unknown place or no place at all: let the model decide
+        return _result("get_weather", location=location), LIKELY if location else UNSURE
+
+    if _EMAIL.search(text):
+        return _result("send_email"), LIKELY if _TASK_WORDS.search(text) else CONFIDENT
+
+    if _SMALL_TALK.match(text) and not _TASK_WORDS.search(text):
+        return _result("conversation"), CONFIDENT
+
+    return _result("conversation"), UNSURE
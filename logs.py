@@ -0,0 +1,235 @@
+"""
+Logging for the assistant and its services.
+
+Modules log through the standard library, logging.getLogger(__name__), with
+%-style arguments, so a message below the configured level is never
+formatted. configure() puts every record on a queue that one background
+thread formats and writes out, so a turn never waits on the terminal or a
+log file. Records are formatted on that thread, after the call returns:
+don't log an object and then change it.
+
+Every record carries the request ID of the turn it belongs to. The assistant
+starts a new one for each command and sends it to the intent server in an
+X-Request-ID header; the intent server and the multi-session server log
+their requests under the ID they are given (RequestIdMiddleware), so one
+command can be followed across processes.
+
+Raw request and response bodies are logged only when payload logging is on
+(payloads_enabled()), at DEBUG level.
+
+Formats:
+    console   the message alone for INFO, "[WARNING] ..."/"[ERROR] ..." otherwise
+    detailed  time, level, logger and request ID before the message
+    json      one JSON object per line
+
+Configuration (read by configure_from_env):
+    ELVEN_LOG_LEVEL     DEBUG, INFO, WARNING or ERROR (default INFO)
+    ELVEN_LOG_FORMAT    console, detailed or json (default console)
+    ELVEN_LOG_FILE      append to this file instead of writing to stdout
+    ELVEN_LOG_PAYLOADS  "1" to log raw request and response bodies (default "0")
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import sys
+
+_request_id = contextvars.ContextVar("elven_request_id", default=None)
+_VALID_ID = re.compile(r"[\w.:-]{1,64}")
+# Libraries that log every HTTP request at INFO; only shown at DEBUG
+_CHATTY = ("httpx", "httpcore", "urllib3")
+_payloads = None
+_handler = None
+_listener = None
+_queue = None
+_exit_hook = False
+
+
+def new_request_id():
+    return os.urandom(8).hex()
+
+
+def request_id():
+    """The request ID of the turn in progress, or None."""
+    return _request_id.get()
+
+
+@contextlib.contextmanager
+def request(request_id=None):
+    """
+    Run a block as one request: its log records (and those of asyncio tasks
+    and asyncio.to_thread calls it starts) carry the ID.
+
+    Args:
+        request_id (str|None): an ID received from the caller; a new one is made if
+                               it is missing or not a plain token of up to 64 characters
+    Yields:
+        str: the request ID
+    """
+    if not request_id or not _VALID_ID.fullmatch(request_id):
+        request_id = new_request_id()
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+def payloads_enabled():
+    """Whether raw request and response bodies should be logged."""
+    if _payloads is None:
+        return os.getenv("ELVEN_LOG_PAYLOADS", "0") == "1"
+    return _payloads
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps each record with the current request ID, on the thread that logged it."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get() or "-"
+        return True
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The message alone for INFO, with a [LEVEL] prefix otherwise, like the assistant's old prints."""
+
+    def format(self, record):
+        text = super().format(record)
+        if record.levelno == logging.INFO:
+            return text
+        return f"[{record.levelname}] {text}"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        import json
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def _formatter(fmt):
+    if fmt == "console":
+        return ConsoleFormatter("%(message)s")
+    if fmt == "detailed":
+        return logging.Formatter("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+    if fmt == "json":
+        return JsonFormatter()
+    raise ValueError(f"Unknown log format '{fmt}' (expected 'console', 'detailed' or 'json')")
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at the time, so redirections and test capture see the output."""
+
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+def _queue_handler_class():
+    from logging.handlers import QueueHandler
+
+    class DeferredQueueHandler(QueueHandler):
+        """Queues the record as it is; the listener thread does the formatting."""
+
+        def prepare(self, record):
+            return record
+
+    return DeferredQueueHandler
+
+
+def configure(level="INFO", fmt="console", path=None, payloads=False):
+    """
+    Send log records from every module through the background writer,
+    replacing any earlier configuration.
+
+    Args:
+        level (str|int): lowest level written
+        fmt (str): "console", "detailed" or "json"
+        path (str|None): log file; None writes to stdout
+        payloads (bool): log raw request and response bodies at DEBUG
+    """
+    import atexit
+    import queue
+    from logging.handlers import QueueListener
+
+    global _handler, _listener, _queue, _payloads, _exit_hook
+    shutdown()
+    target = logging.FileHandler(path, encoding="utf-8") if path else _StdoutHandler()
+    target.setFormatter(_formatter(fmt))
+    _queue = queue.Queue()
+    _listener = QueueListener(_queue, target)
+    _handler = _queue_handler_class()(_queue)
+    _handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    for name in _CHATTY:
+        logging.getLogger(name).setLevel(logging.NOTSET if root.level <= logging.DEBUG else logging.WARNING)
+    _payloads = payloads
+    _listener.start()
+    if not _exit_hook:
+        atexit.register(shutdown)
+        _exit_hook = True
+
+
+def configure_from_env(level=None, fmt=None, path=None, payloads=None):
+    """configure() from ELVEN_LOG_*; arguments that are not None take precedence."""
+    configure(
+        level=level or os.getenv("ELVEN_LOG_LEVEL", "INFO"),
+        fmt=fmt or os.getenv("ELVEN_LOG_FORMAT", "console"),
+        path=path or os.getenv("ELVEN_LOG_FILE") or None,
+        payloads=payloads if payloads is not None else os.getenv("ELVEN_LOG_PAYLOADS", "0") == "1",
+    )
+
+
+def flush():
+    """Wait until every record logged so far has been written (e.g. before prompting for input)."""
+    queue = _queue
+    if queue is not None:
+        queue.join()
+
+
+def shutdown():
+    """Write out what is queued and stop the background writer."""
+    global _handler, _listener, _queue
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _handler = _listener = _queue = None
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware: handles each HTTP request under the X-Request-ID it
+    came with (or a new one) and returns the ID in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+        with request(incoming) as rid:
+            async def send_with_id(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers") or []) + [(b"x-request-id", rid.encode("latin-1"))]
+                    message = dict(message, headers=headers)
+                await send(message)
+
+            await self.app(scope, receive, send_with_id)
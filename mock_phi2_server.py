@@ -2,23 +2,73 @@
 """
 Mock FastAPI server for testing the Elven Voice Assistant integration.
 This simulates the expected responses from a Phi-2 intent classification API.
+
+Requests are handled under the X-Request-ID the assistant sends (see
+logs.py); with ELVEN_LOG_LEVEL=DEBUG and ELVEN_LOG_PAYLOADS=1 each request
+and its classification are logged.
 """
 
 from fastapi import FastAPI
 from pydantic import BaseModel
 import uvicorn
+import argparse
+import asyncio
+import logging
+import os
 import re
+import threading
+import time
+from typing import List, Optional
+
+import logs
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Mock Phi-2 Intent Classification API")
+app.add_middleware(logs.RequestIdMiddleware)
 
 class TextRequest(BaseModel):
     text: str
 
 class IntentResponse(BaseModel):
     intent: str
-    task: str = None
-    due_date: str = None
-    location: str = None
+    task: Optional[str] = None
+    due_date: Optional[str] = None
+    location: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    texts: List[str]
+
+class BatchResponse(BaseModel):
+    results: List[IntentResponse]
+
+# Simulated model cost, so batching can be load-tested without a GPU:
+# each forward pass costs a fixed overhead plus a small per-item amount.
+MODEL_LATENCY_MS = float(os.getenv("MOCK_MODEL_LATENCY_MS", "0"))
+MODEL_ITEM_MS = float(os.getenv("MOCK_MODEL_ITEM_MS", "0"))
+# Micro-batching: wait up to this long for concurrent requests to join a batch (0 disables)
+BATCH_WAIT_MS = float(os.getenv("PHI2_BATCH_WAIT_MS", "5"))
+MAX_BATCH_SIZE = int(os.getenv("PHI2_MAX_BATCH", "32"))
+
+DUE_PATTERNS = ["today", "tomorrow", "tonight", "this week", "next week",
+                "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Keyword -> family. One pass over the words with hash lookups finds every
+# family at once; in CPython this beats both a combined regex and per-family scans.
+KEYWORD_FAMILIES = {}
+for _family, _words in {
+    "add": ["add", "create", "remind", "remember"],
+    "task": ["todo", "todos", "to-do", "to-dos", "task", "tasks"],
+    "list": ["list", "show", "what"],
+    "weather": ["weather", "temperature", "rain", "raining", "rainy", "sunny", "cloudy"],
+}.items():
+    KEYWORD_FAMILIES.update(dict.fromkeys(_words, _family))
+# Punctuation (except the hyphen in "to-do") becomes a word break
+_WORD_BREAKS = str.maketrans({c: " " for c in "!\"#$%&'()*+,./:;<=>?@[\\]^_`{|}~"})
+_TASK = re.compile(r"\b(?:remind me to|remember to|add|create|todo|task)\s+(.+?)(?:\s+to\s+(?:my|the)\b|$)")
+_DUE = re.compile(r"\b(" + "|".join(DUE_PATTERNS) + r")\b")
+_LOCATION = re.compile(r"(?:in|for)\s+([A-Za-z\s]+?)(?:\?|$)")
+_SPACES = re.compile(r"\s{2,}")
 
 def classify_mock_intent(text: str) -> IntentResponse:
     """
@@ -26,85 +76,172 @@ def classify_mock_intent(text: str) -> IntentResponse:
     This simulates what a real Phi-2 model might return.
     """
     text_lower = text.lower()
+    found = {KEYWORD_FAMILIES[word] for word in text_lower.translate(_WORD_BREAKS).split()
+             if word in KEYWORD_FAMILIES}
     
-    # Task-related keywords
-    task_keywords = ["add", "create", "todo", "task", "remind", "remember"]
-    list_keywords = ["list", "show", "what", "tasks", "todos"]
-    weather_keywords = ["weather", "temperature", "rain", "sunny", "cloudy"]
+    # "show my tasks" lists; "add ..." or a bare "todo ..." adds
+    if "list" in found and "task" in found and "add" not in found:
+        return IntentResponse(intent="list_tasks")
     
-    # Check for task addition
-    if any(keyword in text_lower for keyword in task_keywords):
-        # Extract task content
-        task_match = re.search(r'(?:add|create|todo|task|remind|remember)\s+(.+?)(?:\s+to\s+|$)', text_lower)
+    if "add" in found or "task" in found:
+        task_match = _TASK.search(text_lower)
         task = task_match.group(1).strip() if task_match else text.strip()
         
-        # Extract due date
-        due_date = None
-        due_patterns = ["today", "tomorrow", "tonight", "this week", "next week", 
-                       "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-        for pattern in due_patterns:
-            if pattern in text_lower:
-                due_date = pattern
-                # Remove due date from task
-                task = re.sub(rf'\b{pattern}\b', '', task, flags=re.IGNORECASE).strip()
-                break
+        due_match = _DUE.search(text_lower)
+        due_date = due_match.group(1) if due_match else None
+        if due_date:
+            task = _SPACES.sub(" ", _DUE.sub("", task)).strip()
         
-        return IntentResponse(
-            intent="add_task",
-            task=task,
-            due_date=due_date
-        )
+        return IntentResponse(intent="add_task", task=task, due_date=due_date)
     
-    # Check for task listing
-    elif any(keyword in text_lower for keyword in list_keywords) and ("task" in text_lower or "todo" in text_lower):
-        return IntentResponse(intent="list_tasks")
-    
-    # Check for weather
-    elif any(keyword in text_lower for keyword in weather_keywords):
-        # Extract location
-        location_match = re.search(r'(?:in|for)\s+([A-Za-z\s]+?)(?:\?|$)', text)
+    if "weather" in found:
+        location_match = _LOCATION.search(text)
         location = location_match.group(1).strip() if location_match else None
-        
-        return IntentResponse(
-            intent="get_weather",
-            location=location
-        )
+        return IntentResponse(intent="get_weather", location=location)
     
-    # Default to conversation
-    else:
-        return IntentResponse(intent="conversation")
+    return IntentResponse(intent="conversation")
+
+_model_lock = threading.Lock()
+
+def run_model(texts):
+    """
+    One forward pass over a batch of texts. Like a single model instance on
+    one device, passes run one at a time.
+    """
+    with _model_lock:
+        cost_ms = MODEL_LATENCY_MS + MODEL_ITEM_MS * len(texts)
+        if cost_ms:
+            time.sleep(cost_ms / 1000.0)
+        return [classify_mock_intent(text) for text in texts]
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single requests for up to max_wait_ms and runs them
+    through the model as one batch.
+    """
+
+    def __init__(self, process, max_batch_size=32, max_wait_ms=5.0):
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+    async def submit(self, item):
+        # The worker lives on the server's event loop; start one per loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            items = [item for item, _ in batch]
+            try:
+                results = await asyncio.to_thread(self.process, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+batcher = MicroBatcher(run_model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=BATCH_WAIT_MS)
 
 @app.get("/")
 def root():
     return {"message": "Mock Phi-2 Intent Classification API", "status": "running"}
 
 @app.post("/api/convert", response_model=IntentResponse)
-def convert_text(request: TextRequest):
+async def convert_text(request: TextRequest):
     """
     Convert text to intent classification.
-    This endpoint simulates the expected Phi-2 API behavior.
+    This endpoint simulates the expected Phi-2 API behavior. Concurrent
+    requests are micro-batched into one model pass unless batching is off.
     """
-    print(f"📝 Processing: '{request.text}'")
-    
-    response = classify_mock_intent(request.text)
-    
-    print(f"🤖 Response: {response.dict()}")
-    
-    return response
+    if batcher.max_wait > 0:
+        result = await batcher.submit(request.text)
+    elif MODEL_LATENCY_MS or MODEL_ITEM_MS:
+        result = (await asyncio.to_thread(run_model, [request.text]))[0]
+    else:
+        # Rules only: a few microseconds of work, cheaper than a thread hop
+        result = classify_mock_intent(request.text)
+    if logger.isEnabledFor(logging.DEBUG) and logs.payloads_enabled():
+        logger.debug("Convert %r -> %s", request.text, result)
+    return result
+
+@app.post("/api/convert_batch", response_model=BatchResponse)
+async def convert_batch(request: BatchRequest):
+    """
+    Classify several texts in one call. Each result has the same format as
+    a /api/convert response, in the order of the request.
+    """
+    results = []
+    for start in range(0, len(request.texts), MAX_BATCH_SIZE):
+        results.extend(await asyncio.to_thread(run_model, request.texts[start:start + MAX_BATCH_SIZE]))
+    return BatchResponse(results=results)
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "mock-phi2-api"}
+    return {"status": "healthy", "service": "mock-phi2-api",
+            "batches": batcher.batches, "batched_items": batcher.items}
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Phi-2 intent classification server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT_MS,
+                        help="micro-batching window; 0 disables batching")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PHI2_WORKERS", "1")),
+                        help="worker processes; 0 uses one per CPU core")
+    parser.add_argument("--access-log", action="store_true", help="log every request (slow)")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    batcher.max_wait = args.batch_wait_ms / 1000.0
+    batcher.max_batch_size = MAX_BATCH_SIZE = args.max_batch
+    # Worker processes re-import this module, so hand the settings over via the environment
+    os.environ["PHI2_BATCH_WAIT_MS"] = str(args.batch_wait_ms)
+    os.environ["PHI2_MAX_BATCH"] = str(args.max_batch)
+    logs.configure_from_env()
+
     print("🚀 Starting Mock Phi-2 FastAPI Server")
-    print("📡 Server will run on: http://localhost:8000")
-    print("🔗 API endpoint: http://localhost:8000/api/convert")
-    print("📋 Test endpoint: http://localhost:8000/")
+    print(f"📡 Server will run on: http://localhost:{args.port} ({workers} worker(s))")
+    print(f"🔗 API endpoint: http://localhost:{args.port}/api/convert")
+    print(f"📦 Batch endpoint: http://localhost:{args.port}/api/convert_batch")
+    print(f"📋 Test endpoint: http://localhost:{args.port}/")
     print("\n💡 To test manually:")
-    print("curl -X POST http://localhost:8000/api/convert \\")
+    print(f"curl -X POST http://localhost:{args.port}/api/convert \\")
     print('  -H "Content-Type: application/json" \\')
     print('  -d \'{"text": "Add buy milk to my todo list"}\'')
     print("\nPress Ctrl+C to stop the server\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    if workers > 1:
+        uvicorn.run("mock_phi2_server:app", host=args.host, port=args.port,
+                    workers=workers, access_log=args.access_log)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, access_log=args.access_log) 
\ No newline at end of file
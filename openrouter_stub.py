@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for OpenRouter's OpenAI-compatible chat completions endpoint.
+
+Implements POST /api/v1/chat/completions, both the plain and the streamed
+(server-sent events) forms, with a canned reply and simulated model timing:
+a time to first token, then a fixed delay per token. Requests are counted.
+
+Usage:
+    python3 openrouter_stub.py [--port 8003] [--first-token-ms 300] [--token-ms 20]
+    # then point Elven at it with OPENROUTER_BASE_URL=http://localhost:8003/api/v1
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DEFAULT_REPLY = "Ah, a fine question, traveller. The answer lies in patience and a warm cup of tea."
+
+
+class OpenRouterStub:
+    """Canned replies with configurable latency."""
+
+    def __init__(self, reply=DEFAULT_REPLY, first_token_ms=300.0, token_ms=20.0):
+        self.reply = reply
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.requests = 0
+        self.prompts = []
+
+    def reset(self):
+        self.requests = 0
+        self.prompts = []
+
+    def tokens(self):
+        words = self.reply.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+
+def _chunk(model, content=None, finish_reason=None):
+    delta = {"role": "assistant", "content": content} if content is not None else {}
+    return {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+
+def create_app(stub):
+    app = FastAPI(title="OpenRouter stub")
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stub.requests += 1
+        stub.prompts.append(body.get("messages", []))
+        model = body.get("model", "stub")
+        tokens = stub.tokens()
+
+        if not body.get("stream"):
+            await asyncio.sleep((stub.first_token_ms + stub.token_ms * len(tokens)) / 1000)
+            return {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": stub.reply}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            }
+
+        async def events():
+            await asyncio.sleep(stub.first_token_ms / 1000)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(stub.token_ms / 1000)
+                yield f"data: {json.dumps(_chunk(model, token))}\n\n"
+            yield f"data: {json.dumps(_chunk(model, finish_reason='stop'))}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+stub = OpenRouterStub()
+app = create_app(stub)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenRouter stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8003)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    stub.first_token_ms = args.first_token_ms
+    stub.token_ms = args.token_ms
+    print(f"🤖 OpenRouter stub on http://{args.host}:{args.port}/api/v1")
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Asyncio pipeline for one assistant turn.
+
+A turn goes transcription -> intent -> handler -> speech. The blocking
+backends (HTTP calls) run in worker threads so the stages can overlap: while
+the intent classifier is working, a speculative general-conversation LLM
+request is already in flight. If the intent turns out to be a command, the
+speculative request is cancelled and its result discarded; if it is general
+conversation, the answer is already partly (or fully) computed.
+
+Only side-effect-free work is started speculatively. Commands such as adding
+a task run strictly after the intent is known.
+
+When the backends provide a streamed reply, it is cut into sentences as the
+tokens arrive and each sentence is spoken as soon as it is complete (see tts.py).
+
+Each stage is timed with a tracing span ("intent", "llm", "handler.<intent>",
+"tts"); see tracing.py.
+"""
+
+import asyncio
+import logging
+import time
+
+import tracing
+from tts import split_sentences
+
+logger = logging.getLogger(__name__)
+
+STOP_PHRASES = ["goodbye"]
+NULL_INTENT = {"intent": "null", "task": None, "due": None, "location": None}
+
+
+class Backends:
+    """The services a turn talks to. Blocking callables run in threads; speak is a coroutine."""
+
+    def __init__(self, classify, respond, add_task, get_weather, speak, speculate=True,
+                 respond_stream=None, speak_stream=None, list_tasks=None):
+        """
+        Args:
+            classify (callable): classify(text) -> intent dict
+            respond (callable): respond(text) -> general-conversation reply
+            add_task (callable): add_task(task, due) -> confirmation text
+            get_weather (callable): get_weather(location) -> weather text
+            speak (coroutine function): await speak(text) plays the reply
+            speculate (bool): start the conversation reply alongside intent classification
+            respond_stream (async generator function|None): streamed variant of respond,
+                yielding text deltas; used instead of respond when given
+            speak_stream (coroutine function|None): await speak_stream(sentences) plays an
+                async iterable of sentences as they arrive; used for conversation replies
+            list_tasks (callable|None): list_tasks(due, project, more) -> spoken task list
+        """
+        self.classify = classify
+        self.respond = respond
+        self.add_task = add_task
+        self.get_weather = get_weather
+        self.speak = speak
+        self.speculate = speculate
+        self.respond_stream = respond_stream
+        self.speak_stream = speak_stream
+        self.list_tasks = list_tasks
+
+
+class _Reply:
+    """A conversation reply being generated, possibly before the intent is known."""
+
+    def __init__(self, backends, transcription):
+        self.parts = []
+        self._queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._pump(backends, transcription))
+
+    async def _pump(self, backends, transcription):
+        try:
+            with tracing.span("llm") as span:
+                if backends.respond_stream is not None:
+                    start = time.perf_counter()
+                    first = True
+                    async for delta in backends.respond_stream(transcription):
+                        if first:
+                            span.set(first_token_ms=round((time.perf_counter() - start) * 1000, 3))
+                            first = False
+                        self._queue.put_nowait(delta)
+                else:
+                    self._queue.put_nowait(await asyncio.to_thread(backends.respond, transcription))
+        finally:
+            self._queue.put_nowait(None)
+
+    async def deltas(self):
+        """Yield the reply text as it arrives (including anything already buffered)."""
+        while True:
+            delta = await self._queue.get()
+            if delta is None:
+                break
+            self.parts.append(delta)
+            yield delta
+        await self.task  # surface generation errors
+
+    @property
+    def text(self):
+        return "".join(self.parts).strip()
+
+    def cancel(self):
+        _discard(self.task)
+
+
+def _discard(task):
+    """Cancel a task we no longer need and make sure its outcome is never reported."""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _classify(backends, transcription):
+    try:
+        with tracing.span("intent"):
+            return await asyncio.to_thread(backends.classify, transcription)
+    except Exception as e:
+        logger.error("Intent classification failed: %s", e)
+        return dict(NULL_INTENT)
+
+
+async def handle_turn(transcription, backends, stop_phrases=STOP_PHRASES):
+    """
+    Run one turn for an already-transcribed utterance and speak the reply.
+
+    Returns:
+        dict: {"intent": str, "response": str, "end_conversation": bool}
+    """
+    intent_task = asyncio.create_task(_classify(backends, transcription))
+    reply = _Reply(backends, transcription) if backends.speculate else None
+
+    try:
+        intent_data = await intent_task
+    except BaseException:
+        if reply is not None:
+            reply.cancel()
+        raise
+    intent = intent_data.get("intent")
+    task = intent_data.get("task")
+    due = intent_data.get("due")
+    location = intent_data.get("location")
+    tracing.annotate(intent=intent)
+
+    is_conversation = not (
+        (intent == "add_task" and task)
+        or (intent == "get_weather" and location)
+        or (intent == "list_tasks" and backends.list_tasks is not None)
+        or intent == "send_email"
+    )
+    if reply is not None and not is_conversation:
+        # The speculative answer lost the race; drop it.
+        reply.cancel()
+
+    end_conversation = False
+    spoken = False
+    if intent == "add_task" and task:
+        with tracing.span("handler.add_task"):
+            result = await asyncio.to_thread(backends.add_task, task, due)
+        logger.info("✅ %s", result)
+    elif intent == "get_weather" and location:
+        with tracing.span("handler.get_weather"):
+            result = await asyncio.to_thread(backends.get_weather, location)
+        logger.info("🌤️  %s", result)
+    elif intent == "list_tasks" and backends.list_tasks is not None:
+        with tracing.span("handler.list_tasks"):
+            result = await asyncio.to_thread(backends.list_tasks, due, intent_data.get("project"),
+                                             bool(intent_data.get("more")))
+        logger.info("📋 %s", result)
+    elif intent == "send_email":
+        logger.info("📧 Email functionality not implemented yet")
+        result = "Email functionality is not available yet."
+    else:
+        # General conversation
+        if reply is None:
+            reply = _Reply(backends, transcription)
+        try:
+            if backends.speak_stream is not None:
+                # Speak each sentence as soon as it is complete
+                with tracing.span("tts"):
+                    await backends.speak_stream(split_sentences(reply.deltas()))
+                spoken = True
+            else:
+                async for _ in reply.deltas():
+                    pass
+        except asyncio.CancelledError:
+            # The turn was abandoned (the user talked over it): stop generating the reply too
+            reply.cancel()
+            raise
+        result = reply.text
+        logger.info("🤖 AI Response: %s", result)
+        end_conversation = any(phrase in result.lower() for phrase in stop_phrases)
+
+    if not spoken:
+        with tracing.span("tts"):
+            await backends.speak(result)
+    return {"intent": intent, "response": result, "end_conversation": end_conversation}
@@ -0,0 +1,263 @@
+"""
+In-memory audio playback.
+
+Synthesised speech is decoded as its chunks arrive and the PCM is written
+straight to an output sink, instead of saving output.mp3 and spawning a
+player process for every reply. Decoding uses miniaudio, so it works the
+same on macOS, Linux and Windows.
+
+Sinks:
+    PyAudioSink  the default output device (cross-platform, via PortAudio)
+    NullSink     discards audio; for headless nodes and tests
+    FileSink     writes each utterance to a WAV file; for headless debugging
+
+Playback can be interrupted at any time with Player.stop(), e.g. when the
+user starts speaking again (see barge_in.py); cancelling the task that is
+playing has the same effect.
+
+Configuration:
+    PLAYBACK_BACKEND  "pyaudio", "null" or "file" (default "pyaudio")
+    PLAYBACK_FILE     output path for the file backend (default "output.wav")
+"""
+
+import asyncio
+import os
+import threading
+import wave
+
+SAMPLE_RATE = 24000  # Edge TTS audio is 24 kHz mono
+DECODE_FRAMES = 1024  # ~43 ms per block at 24 kHz: the granularity of stop()
+
+
+class NullSink:
+    """Accepts PCM and throws it away, keeping count of what was 'played'."""
+
+    def __init__(self):
+        self.frames = 0
+
+    def open(self, sample_rate):
+        self.sample_rate = sample_rate
+
+    def write(self, pcm):
+        self.frames += len(pcm) // 2
+
+    def drain(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class FileSink:
+    """Writes each utterance to a WAV file (overwritten per utterance)."""
+
+    def __init__(self, path="output.wav"):
+        self.path = path
+        self._wf = None
+
+    def open(self, sample_rate):
+        self._wf = wave.open(self.path, "wb")
+        self._wf.setnchannels(1)
+        self._wf.setsampwidth(2)
+        self._wf.setframerate(sample_rate)
+
+    def write(self, pcm):
+        self._wf.writeframes(pcm)
+
+    def drain(self):
+        if self._wf is not None:
+            self._wf.close()
+            self._wf = None
+
+    abort = drain
+
+
+class PyAudioSink:
+    """Writes PCM to the default output device. The stream stays open between utterances."""
+
+    def __init__(self):
+        import pyaudio
+        self._pyaudio = pyaudio
+        self._pa = pyaudio.PyAudio()
+        self._stream = None
+        self._rate = None
+
+    def open(self, sample_rate):
+        if self._stream is not None and self._rate == sample_rate:
+            if self._stream.is_stopped():
+                self._stream.start_stream()
+            return
+        if self._stream is not None:
+            self._stream.close()
+        self._stream = self._pa.open(format=self._pyaudio.paInt16, channels=1,
+                                     rate=sample_rate, output=True)
+        self._rate = sample_rate
+
+    def write(self, pcm):
+        self._stream.write(pcm)
+
+    def drain(self):
+        # write() blocks until the device has accepted the data, so nothing to flush.
+        pass
+
+    def abort(self):
+        if self._stream is not None and not self._stream.is_stopped():
+            self._stream.stop_stream()
+
+
+class _ChunkSource:
+    """Byte source fed from the event loop and read by the decoder thread."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._ended = False
+        self._cond = threading.Condition()
+
+    def push(self, data):
+        with self._cond:
+            self._buffer.extend(data)
+            self._cond.notify()
+
+    def finish(self):
+        with self._cond:
+            self._ended = True
+            self._cond.notify()
+
+    def read(self, num_bytes):
+        # Return whatever is available (at least one byte) rather than waiting
+        # for num_bytes, so decoding can start on the first chunk.
+        with self._cond:
+            self._cond.wait_for(lambda: self._buffer or self._ended)
+            data = bytes(self._buffer[:num_bytes])
+            del self._buffer[:num_bytes]
+            return data
+
+
+class Player:
+    """Decodes compressed audio chunks as they arrive and plays them on a sink."""
+
+    def __init__(self, sink=None, sample_rate=SAMPLE_RATE, source_format="mp3"):
+        self.sink = sink if sink is not None else NullSink()
+        self.sample_rate = sample_rate
+        self.source_format = source_format
+        self._stopped = threading.Event()
+        self._source = None
+        self._lock = threading.Lock()
+        # Held by the decoder thread while it writes, so an utterance that was
+        # just stopped finishes its last block before the next one starts.
+        self._sink_lock = threading.Lock()
+        self.playing = False
+        self.interrupted = False
+
+    def _decode_to_sink(self, source, stopped):
+        with self._sink_lock:
+            self._decode_locked(source, stopped)
+
+    def _decode_locked(self, source, stopped):
+        import miniaudio
+
+        class _Source(miniaudio.StreamableSource):
+            def read(self, num_bytes):
+                return source.read(num_bytes)
+
+        fmt = getattr(miniaudio.FileFormat, self.source_format.upper())
+        blocks = miniaudio.stream_any(
+            _Source(),
+            source_format=fmt,
+            output_format=miniaudio.SampleFormat.SIGNED16,
+            nchannels=1,
+            sample_rate=self.sample_rate,
+            frames_to_read=DECODE_FRAMES,
+        )
+        self.sink.open(self.sample_rate)
+        try:
+            for block in blocks:
+                if stopped.is_set():
+                    break
+                self.sink.write(block.tobytes())
+        except miniaudio.DecodeError:
+            # Stopped before any audio arrived: the decoder saw an empty stream.
+            if not stopped.is_set():
+                raise
+        finally:
+            if stopped.is_set():
+                self.sink.abort()
+            else:
+                self.sink.drain()
+
+    async def play_stream(self, chunks):
+        """
+        Play an async iterable of encoded audio chunks, starting on the first chunk.
+
+        Returns:
+            bool: True if played to the end, False if interrupted by stop()
+        """
+        source = _ChunkSource()
+        # A fresh event per utterance: the previous one may still be winding down
+        stopped = threading.Event()
+        with self._lock:
+            self._stopped = stopped
+            self._source = source
+            self.playing = True
+            self.interrupted = False
+        decoder = asyncio.create_task(asyncio.to_thread(self._decode_to_sink, source, stopped))
+        try:
+            async for chunk in chunks:
+                if stopped.is_set():
+                    break
+                source.push(chunk)
+        except asyncio.CancelledError:
+            # Cancelled mid-utterance (e.g. barge-in): cut the audio rather than play out the buffer
+            self.stop()
+            raise
+        finally:
+            source.finish()
+            try:
+                await decoder
+            except asyncio.CancelledError:
+                self.stop()
+                raise
+            finally:
+                self.playing = False
+        return not self.interrupted
+
+    async def play(self, audio):
+        """Play one complete encoded clip."""
+        async def single():
+            yield audio
+        return await self.play_stream(single())
+
+    def stop(self):
+        """Interrupt playback now. Safe to call from any thread, and when idle."""
+        with self._lock:
+            if not self.playing:
+                return
+            self.interrupted = True
+            self._stopped.set()
+            if self._source is not None:
+                self._source.finish()
+        # The decoder thread notices within one block and aborts the sink itself.
+
+
+def make_sink(backend=None):
+    backend = (backend or os.getenv("PLAYBACK_BACKEND", "pyaudio")).lower()
+    if backend == "null":
+        return NullSink()
+    if backend == "file":
+        return FileSink(os.getenv("PLAYBACK_FILE", "output.wav"))
+    if backend == "pyaudio":
+        return PyAudioSink()
+    raise ValueError(f"Unknown PLAYBACK_BACKEND '{backend}'")
+
+
+_player = None
+_player_lock = threading.Lock()
+
+
+def get_player():
+    """Return the process-wide player, creating its sink from the environment."""
+    global _player
+    with _player_lock:
+        if _player is None:
+            _player = Player(make_sink())
+    return _player
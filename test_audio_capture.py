@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared capture service, using file and generator sources
+instead of a microphone.
+"""
+
+import threading
+import wave
+
+import numpy as np
+import pytest
+
+from audio_capture import CaptureService, RingBuffer, WavFileSource, utterance_chunks
+from vad import EnergyVAD
+
+SAMPLE_RATE = 16000
+
+
+def ramp(n, start=0):
+    return (np.arange(start, start + n) % 30000).astype(np.int16)
+
+
+def frames(samples, size=512):
+    for i in range(0, len(samples), size):
+        yield samples[i:i + size].tobytes()
+
+
+def test_ring_buffer_wraps_and_rejects_overwritten_reads():
+    ring = RingBuffer(1000)
+    ring.write(ramp(700))
+    ring.write(ramp(700, 700))
+    assert ring.oldest() == 400
+    assert np.array_equal(ring.read(900, 300), ramp(300, 900))
+    assert ring.read(100, 10) is None  # already overwritten
+    assert ring.read(1300, 200) is None  # not written yet
+
+
+def test_readers_with_different_frame_sizes_see_the_same_stream():
+    samples = ramp(20000)
+    service = CaptureService(source=frames(samples), buffer_seconds=2.0)
+    wake = service.reader()
+    record = service.reader()
+    service.start()
+    wake_audio = b"".join(wake.chunks(512))
+    record_audio = b"".join(record.chunks(1024))
+    assert wake_audio == samples[:len(wake_audio) // 2].tobytes()
+    assert record_audio == samples[:len(record_audio) // 2].tobytes()
+    assert len(wake_audio) // 2 == 20000 - 20000 % 512
+
+
+def test_reader_can_start_from_earlier_audio():
+    samples = ramp(8000)
+    service = CaptureService(source=frames(samples)).start()
+    service.join()
+    reader = service.reader(rewind_seconds=0.25)
+    assert reader.position == 8000 - 4000
+    assert reader.read(4000) == samples[4000:].tobytes()
+    with pytest.raises(EOFError):
+        reader.read(1)
+
+
+def test_slow_reader_skips_ahead_instead_of_blocking_capture():
+    service = CaptureService(source=frames(ramp(SAMPLE_RATE * 3)), buffer_seconds=1.0)
+    reader = service.reader()
+    service.start()
+    service.join()
+    data = reader.read(1000)
+    assert reader.dropped == SAMPLE_RATE * 2
+    assert data == ramp(1000, SAMPLE_RATE * 2).tobytes()
+
+
+def test_reader_waits_for_live_data():
+    release = threading.Event()
+
+    def slow_source():
+        yield ramp(512).tobytes()
+        release.wait()
+        yield ramp(512, 512).tobytes()
+
+    service = CaptureService(source=slow_source()).start()
+    reader = service.reader(position=0)
+    with pytest.raises(TimeoutError):
+        reader.read(1024, timeout=0.05)
+    release.set()
+    assert reader.read(1024, timeout=2.0) == ramp(1024).tobytes()
+
+
+def test_wav_file_source_records_an_utterance(tmp_path):
+    rng = np.random.default_rng(0)
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    speech = (4000 * np.sin(2 * np.pi * 200 * t)).astype(np.int16)
+    quiet = rng.normal(0, 30, SAMPLE_RATE * 3).astype(np.int16)
+    samples = np.concatenate([quiet[:SAMPLE_RATE], speech, quiet])
+    path = tmp_path / "command.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+
+    service = CaptureService(source=WavFileSource(str(path)))
+    reader = service.reader(position=0)
+    service.start()
+    vad = EnergyVAD(pre_roll_ms=200)
+    chunks = list(utterance_chunks(reader, vad, silence_duration=1.0))
+    recorded = np.frombuffer(b"".join(chunks), dtype=np.int16)
+    # Starts shortly before the speech (pre-roll) and stops about a second after it.
+    assert 1.5 < len(recorded) / SAMPLE_RATE < 3.0
+    assert np.abs(recorded[:SAMPLE_RATE // 10]).max() < 1000
+    assert np.abs(recorded).max() >= 3900
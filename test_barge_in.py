@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Tests for barge-in, with generator capture sources standing in for the
+microphone and a paced null sink standing in for the speaker.
+"""
+
+import asyncio
+import io
+import threading
+import time
+import wave
+
+import numpy as np
+
+import barge_in
+import pipeline
+import playback
+from audio_capture import CaptureService
+
+SAMPLE_RATE = 16000
+
+
+def silence(seconds):
+    return np.zeros(int(SAMPLE_RATE * seconds), dtype=np.int16)
+
+
+def speech(seconds):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (6000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def frames(*parts, size=512):
+    """Yield the parts as PCM frames; a threading.Event in the parts blocks until it is set."""
+    for part in parts:
+        if isinstance(part, threading.Event):
+            part.wait(5)
+            continue
+        for i in range(0, len(part), size):
+            yield part[i:i + size].tobytes()
+
+
+def reply_wav(seconds):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(playback.SAMPLE_RATE)
+        wf.writeframes(np.zeros(int(playback.SAMPLE_RATE * seconds), dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+class SpeakerSink(playback.NullSink):
+    """Paces writes like a real output device; sets `audible` once audio is playing."""
+
+    def __init__(self, audible=None):
+        super().__init__()
+        self.aborted = False
+        self.audible = audible
+
+    def write(self, pcm):
+        if self.audible is not None:
+            self.audible.set()
+        super().write(pcm)
+        time.sleep(len(pcm) / 2 / playback.SAMPLE_RATE)
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_speech_during_reply_stops_playback_and_cancels_generation():
+    speaking = threading.Event()
+    capture = CaptureService(frames(silence(0.5), speaking, speech(1.0), silence(1.0))).start()
+    # The user starts talking once the reply is audible
+    player = playback.Player(SpeakerSink(audible=speaking), source_format="wav")
+    llm = {"cancelled": False}
+
+    async def respond_stream(text):
+        try:
+            yield "Once upon a time, a dragon slept under the hill. "
+            await asyncio.sleep(5)
+            yield "Then it woke."
+        except asyncio.CancelledError:
+            llm["cancelled"] = True
+            raise
+
+    async def synthesize(sentence):
+        return reply_wav(3.0)
+
+    async def play(audio, sentence):
+        await player.play(audio)
+
+    async def speak_stream(sentences):
+        import tts
+        await tts.speak_stream(sentences, synthesize, play)
+
+    backends = pipeline.Backends(classify=lambda text: dict(pipeline.NULL_INTENT), respond=None, add_task=None,
+                                 get_weather=None, speak=None, respond_stream=respond_stream,
+                                 speak_stream=speak_stream)
+    monitor = barge_in.BargeInMonitor(capture, player, rewind_ms=100)
+
+    async def scenario():
+        task = asyncio.create_task(pipeline.handle_turn("tell me a story", backends))
+        result = await monitor.guard(task)
+        # The decoder thread aborts the sink at its next block
+        for _ in range(100):
+            if player.sink.aborted:
+                break
+            await asyncio.sleep(0.01)
+        return result, task
+
+    start = time.perf_counter()
+    (turn, resume), task = asyncio.run(scenario())
+    capture.stop()
+
+    assert turn is None and task.cancelled()
+    assert time.perf_counter() - start < 2.0
+    assert player.interrupted and player.sink.aborted
+    assert player.sink.frames < playback.SAMPLE_RATE * 1.5
+    assert llm["cancelled"]
+    # Recording resumes just before the speech onset at 0.5 s
+    assert abs(resume - (8000 - 1600)) <= 1024
+
+
+def test_reply_that_finishes_first_is_left_alone():
+    done = threading.Event()
+    capture = CaptureService(frames(silence(0.5), done)).start()
+    monitor = barge_in.BargeInMonitor(capture)
+
+    async def reply():
+        await asyncio.sleep(0.2)
+        return "answered"
+
+    async def scenario():
+        return await monitor.guard(asyncio.create_task(reply()))
+
+    start = time.perf_counter()
+    assert asyncio.run(scenario()) == ("answered", None)
+    assert time.perf_counter() - start < 1.0
+    done.set()
+    capture.stop()
+
+
+def test_short_noise_does_not_interrupt():
+    capture = CaptureService(frames(silence(0.5), speech(0.1), silence(0.5))).start()
+    monitor = barge_in.BargeInMonitor(capture, min_speech_ms=250)
+
+    async def reply():
+        await asyncio.sleep(0.3)
+        return "answered"
+
+    async def scenario():
+        return await monitor.guard(asyncio.create_task(reply()), position=0)
+
+    assert asyncio.run(scenario()) == ("answered", None)
+    capture.stop()
+
+
+def test_run_command_records_the_interruption_as_the_next_command(monkeypatch):
+    import elven
+
+    speaking = threading.Event()
+    capture = CaptureService(frames(silence(0.3), speech(0.8), silence(1.0), speaking,
+                                    silence(0.6), speech(0.8), silence(0.6))).start()
+    player = playback.Player(SpeakerSink(), source_format="wav")
+    monkeypatch.setattr(playback, "_player", player)
+    monkeypatch.setattr(elven, "TRANSCRIBE_MODE", "stream")
+    recorded = []
+    texts = ["tell me a story", "actually, what's the weather"]
+
+    def transcribe(silence_duration, capture, start_position):
+        chunks = list(elven.capture_utterance(silence_duration=silence_duration, capture=capture,
+                                              start_position=start_position))
+        recorded.append(len(chunks))
+        return texts[len(recorded) - 1]
+
+    monkeypatch.setattr(elven, "record_and_transcribe_stream", transcribe)
+
+    durations = [3.0, 0.1]
+    finished = []
+
+    async def speak(text):
+        speaking.set()
+        finished.append(await player.play(reply_wav(durations.pop(0))))
+
+    backends = pipeline.Backends(classify=lambda text: dict(pipeline.NULL_INTENT),
+                                 respond=lambda text: "Once upon a time.", add_task=None, get_weather=None,
+                                 speak=speak, speculate=False)
+
+    async def scenario():
+        first = await elven.run_command(backends, capture=capture, silence_duration=0.3, start_position=0,
+                                        interruptible=True)
+        second = await elven.run_command(backends, capture=capture, silence_duration=0.3,
+                                         start_position=first["resume_position"], interruptible=False)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    capture.stop()
+
+    assert first["intent"] == "interrupted"
+    # The first reply was cut off (its play() was cancelled); the second played in full
+    assert finished == [True] and not durations
+    assert player.sink.frames < playback.SAMPLE_RATE * 1.5
+    assert first["resume_position"] is not None
+    assert second["transcription"] == "actually, what's the weather"
+    assert second["intent"] == "null" and second["resume_position"] is None
+    # The second recording picked up the whole interruption (about 0.8 s of speech)
+    assert recorded[1] * 1024 >= SAMPLE_RATE * 0.8
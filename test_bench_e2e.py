@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline end-to-end benchmark: scoring, baseline comparison and
+a short run of the real pipeline against the local stand-ins.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import bench_e2e
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_word_error_rate():
+    assert bench_e2e.word_error_rate([("Buy milk tomorrow.", "buy milk tomorrow")]) == 0.0
+    assert bench_e2e.word_error_rate([("buy milk tomorrow", "buy the milk today")]) == 2 / 3
+    # Corpus WER weights by reference length
+    assert bench_e2e.word_error_rate([("a b c d", "a b c d"), ("e f", "")]) == 2 / 6
+
+
+def test_entity_matches():
+    entry = {"intent": "add_task", "task": "buy milk", "due": "tomorrow"}
+    assert bench_e2e.entity_matches(entry, {"task": "Buy milk", "due": "tomorrow"}) == (2, 2)
+    assert bench_e2e.entity_matches(entry, {"task": "a task to buy milk", "due": None}) == (0, 2)
+    assert bench_e2e.entity_matches({"intent": "list_tasks"}, {}) == (0, 0)
+
+
+def summary(p50, p95, intent_accuracy=1.0, wer=None):
+    return {"intent_accuracy": intent_accuracy, "entity_accuracy": 1.0, "wer": wer,
+            "latency": {"turn": {"p50_ms": p50, "p95_ms": p95}}}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = summary(500.0, 800.0, wer=0.05)
+    assert bench_e2e.compare(summary(560.0, 900.0, wer=0.055), baseline) == []
+    regressions = bench_e2e.compare(summary(700.0, 800.0, intent_accuracy=0.9, wer=0.08), baseline)
+    assert len(regressions) == 3
+    assert any("intent_accuracy" in line for line in regressions)
+    assert any("turn p50" in line for line in regressions)
+    assert any("WER" in line for line in regressions)
+
+
+def test_compare_ignores_noise_on_fast_stages():
+    baseline = {"intent_accuracy": 1.0, "entity_accuracy": 1.0, "wer": None,
+                "latency": {"record": {"p50_ms": 1.0, "p95_ms": 2.0}}}
+    current = dict(baseline, latency={"record": {"p50_ms": 3.0, "p95_ms": 9.0}})
+    assert bench_e2e.compare(current, baseline) == []
+
+
+def run_bench(*args):
+    return subprocess.run([sys.executable, "bench_e2e.py", *args], cwd=HERE, capture_output=True,
+                          text=True, timeout=120)
+
+
+def test_short_run_and_baseline(tmp_path):
+    entries = {entry["id"]: entry for entry in bench_e2e.load_manifest()}
+    manifest = tmp_path / "manifest.jsonl"
+    with open(manifest, "w") as f:
+        for name in ("add_milk", "list_all", "weather_london"):
+            entry = dict(entries[name])
+            del entry["path"]
+            f.write(json.dumps(entry) + "\n")
+
+    made = run_bench("--make-corpus", "--voice", "synthetic", "--manifest", str(manifest))
+    assert made.returncode == 0, made.stderr
+    common = ["--manifest", str(manifest), "--fast", "--transcriber", "oracle", "--warmup", "0",
+              "--output", str(tmp_path / "results.json")]
+
+    first = run_bench(*common, "--save-baseline", str(tmp_path / "baseline.json"))
+    assert first.returncode == 0, first.stdout + first.stderr
+    results = json.loads((tmp_path / "results.json").read_text())
+    assert results["commands"] == 3
+    assert results["intent_accuracy"] == 1.0 and results["entity_accuracy"] == 1.0
+    assert [r["intent"] for r in results["commands_detail"]] == ["add_task", "list_tasks", "get_weather"]
+    assert "The weather in London" in results["commands_detail"][2]["response"]
+    assert {"turn", "response", "record", "whisper", "intent", "tts"} <= set(results["latency"])
+
+    slower = run_bench(*common, "--baseline", str(tmp_path / "baseline.json"), "--tts-first-chunk-ms", "800")
+    assert slower.returncode == 1, slower.stdout + slower.stderr
+    assert "response p50 rose" in slower.stdout
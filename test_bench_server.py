@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for the server load generator: level ramp, the capacity rule and a
+short run against the in-process server.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import bench_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_levels_double_up_to_the_maximum():
+    assert list(bench_server.levels(1)) == [1]
+    assert list(bench_server.levels(8)) == [1, 2, 4, 8]
+    assert list(bench_server.levels(12)) == [1, 2, 4, 8, 12]
+
+
+def test_within_slo():
+    level = {"turns": 50, "first_sentence_p95_ms": 900.0, "shed_rate": 0.0, "error_rate": 0.0}
+    assert bench_server.within_slo(level, 1000)
+    assert not bench_server.within_slo(level, 800)
+    assert not bench_server.within_slo(dict(level, shed_rate=0.05), 1000)
+    assert not bench_server.within_slo(dict(level, turns=0, first_sentence_p95_ms=None), 1000)
+
+
+def test_short_run(tmp_path):
+    output = tmp_path / "results.json"
+    run = subprocess.run([sys.executable, "bench_server.py", "--max-sessions", "2", "--seconds", "1",
+                          "--think-ms", "50", "--audio", "--oracle-rtf", "0.01", "--phi2-ms", "5",
+                          "--llm-first-token-ms", "20", "--llm-token-ms", "1", "--tts-first-chunk-ms", "5",
+                          "--slo-ms", "5000", "--output", str(output)],
+                         cwd=HERE, capture_output=True, text=True, timeout=120)
+    assert run.returncode == 0, run.stdout + run.stderr
+    assert "Capacity: 2 concurrent sessions" in run.stdout
+    results = json.loads(output.read_text())
+    assert [level["users"] for level in results["levels"]] == [1, 2]
+    for level in results["levels"]:
+        assert level["turns"] > 0 and level["error_rate"] == 0.0
+        assert level["first_sentence_p50_ms"] <= level["total_p95_ms"]
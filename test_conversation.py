@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-budgeted conversation store.
+"""
+
+import threading
+import time
+
+import conversation
+from conversation import Conversation, estimate_tokens
+
+SYSTEM = "You are Elven, a wise and friendly assistant. Keep answers short."
+
+
+def prompt_tokens(messages):
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def turn(i):
+    return f"Question number {i}: what should I pack for the trip to city {i}?", \
+        f"Answer {i}: a cloak, good boots and a map of city {i}, traveller."
+
+
+def test_prompt_stays_bounded_over_hundreds_of_turns():
+    history = Conversation(SYSTEM, budget_tokens=300, summary_tokens=80)
+    limit = estimate_tokens(SYSTEM) + 300 + estimate_tokens("Earlier in this conversation: ") + 80
+    sizes = []
+    for i in range(500):
+        messages = history.messages("and what next?")
+        sizes.append(prompt_tokens(messages))
+        assert sizes[-1] <= limit + estimate_tokens("and what next?")
+        history.add_turn(*turn(i))
+        history.wait()
+    assert history.summaries > 10
+    assert len(history.turns) < 20
+    # Later turns still see recent context verbatim and older context in the summary
+    messages = history.messages("and what next?")
+    assert messages[-3]["content"] == turn(499)[0]
+    oldest_kept = int(history.turns[0][0].split()[2].rstrip(":"))
+    assert f"city {oldest_kept - 1}?" in messages[1]["content"]
+    assert max(sizes[100:]) - min(sizes[100:]) < 300
+
+
+def test_system_prompt_is_a_stable_prefix():
+    history = Conversation(SYSTEM, budget_tokens=200)
+    previous = None
+    grew_in_place = 0
+    for i in range(60):
+        messages = history.messages("hello")
+        assert messages[0] == {"role": "system", "content": SYSTEM}
+        if previous is not None and messages[:len(previous) - 1] == previous[:-1]:
+            grew_in_place += 1
+        previous = messages
+        history.add_turn(*turn(i))
+        history.wait()
+    # Between summaries each prompt extends the last one, so a cached prefix is reused
+    assert grew_in_place >= 45
+
+
+def test_summarising_is_off_the_critical_path():
+    release = threading.Event()
+    calls = []
+
+    def slow_summary(previous, turns):
+        calls.append(len(turns))
+        release.wait(5)
+        return "They talked about packing."
+
+    history = Conversation(SYSTEM, budget_tokens=100, summarise=slow_summary)
+    start = time.perf_counter()
+    for i in range(20):
+        history.add_turn(*turn(i))
+        assert prompt_tokens(history.messages("next")) <= estimate_tokens(SYSTEM) + 100 + 5
+    assert time.perf_counter() - start < 0.5
+    assert calls == [calls[0]]  # one summary at a time
+    release.set()
+    history.wait()
+    assert history.summary == "They talked about packing."
+    assert "They talked about packing." in history.messages("next")[1]["content"]
+
+
+def test_failed_summary_drops_old_turns_and_keeps_the_prompt_bounded(caplog):
+    def broken(previous, turns):
+        raise RuntimeError("model unavailable")
+
+    history = Conversation(SYSTEM, budget_tokens=100, summarise=broken)
+    for i in range(30):
+        history.add_turn(*turn(i))
+        history.wait()
+    assert "Conversation summary failed" in caplog.text
+    assert sum(tokens for _, _, tokens in history.turns) <= 100 + 50
+    assert history.messages("next")[1]["role"] == "user"  # no summary message
+
+
+def test_sessions_are_separate_and_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(conversation, "_sessions", conversation.OrderedDict())
+    monkeypatch.setenv("CONVERSATION_MAX_SESSIONS", "2")
+    kitchen = conversation.get_conversation("kitchen", SYSTEM)
+    kitchen.add_turn("Set a timer", "Done.")
+    assert conversation.get_conversation("kitchen") is kitchen
+    assert len(conversation.get_conversation("study", SYSTEM).messages("hi")) == 2
+    conversation.get_conversation("garden", SYSTEM)
+    assert list(conversation._sessions) == ["study", "garden"]
+    monkeypatch.setenv("CONVERSATION", "0")
+    assert conversation.get_conversation("kitchen") is None
+
+
+def test_replies_are_sent_with_history(monkeypatch):
+    import elven
+    import openrouter_stub
+    from stub_server import serve
+
+    monkeypatch.setattr(conversation, "_sessions", conversation.OrderedDict())
+    stub = openrouter_stub.OpenRouterStub(reply="It will be sunny, traveller.", first_token_ms=0, token_ms=0)
+    with serve(openrouter_stub.create_app(stub)) as url:
+        monkeypatch.setattr(elven, "OPENROUTER_BASE_URL", f"{url}/api/v1")
+        monkeypatch.setattr(elven, "OPENROUTER_API_KEY", "test-key")
+        elven.get_conversation().add_turn("What's the weather in London?", "The weather in London is rain.")
+        assert elven.ask_gpt_openrouter("And tomorrow?") == "It will be sunny, traveller."
+    messages = stub.prompts[-1]
+    assert messages[0] == {"role": "system", "content": elven.ELVEN_SYSTEM_PROMPT}
+    assert [m["content"] for m in messages[1:]] == ["What's the weather in London?",
+                                                    "The weather in London is rain.", "And tomorrow?"]
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-session server, over HTTP, with in-memory backends and a
+stand-in Whisper model.
+"""
+
+import asyncio
+import io
+import json
+import threading
+import time
+import wave
+
+import httpx
+import numpy as np
+import pytest
+
+import pipeline
+from elven_server import AssistantServer, Overloaded, create_app
+from stub_server import serve
+from transcriber import TranscriptionEngine, TranscriptionWorker
+
+NULL = dict(pipeline.NULL_INTENT)
+
+
+class SlowWhisper:
+    """Whisper stand-in: 'hears' a fixed phrase after a fixed decode time."""
+
+    def __init__(self, seconds=0.0, text="what is the meaning of life"):
+        self.seconds = seconds
+        self.text = text
+        self.calls = 0
+
+    def transcribe(self, audio, language=None, **options):
+        self.calls += 1
+        time.sleep(self.seconds)
+        return {"text": " " + self.text}
+
+
+def fake_backends(classify_seconds=0.0, reply="Patience, traveller. And tea."):
+    def build(session_id):
+        def classify(text):
+            time.sleep(classify_seconds)
+            if "weather" in text:
+                return dict(NULL, intent="get_weather", location="Paris")
+            return dict(NULL)
+
+        async def respond_stream(text):
+            for word in reply.split(" "):
+                yield word + " "
+
+        return pipeline.Backends(classify=classify, respond=None, add_task=None,
+                                 get_weather=lambda location: f"Sunny in {location}.", speak=None,
+                                 respond_stream=respond_stream, speculate=False)
+    return build
+
+
+def make_server(whisper=None, workers=1, max_queued=16, max_batch=8, **kwargs):
+    engine = TranscriptionEngine(loader=lambda name, device: whisper or SlowWhisper())
+    worker = TranscriptionWorker(engine, workers=workers, max_queued=max_queued, max_batch=max_batch)
+    kwargs.setdefault("build_backends", fake_backends())
+    return AssistantServer(get_history=lambda session_id: None, worker=worker, **kwargs)
+
+
+def wav(seconds=1.0):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(np.zeros(int(16000 * seconds), dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def events(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def new_session(client):
+    return client.post("/v1/sessions").json()["session_id"]
+
+
+def test_text_turn_streams_sentences_then_done():
+    with serve(create_app(make_server())) as url, httpx.Client(base_url=url, timeout=10) as client:
+        session = new_session(client)
+        with client.stream("POST", f"/v1/sessions/{session}/turns", json={"text": "tell me a secret"}) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("application/x-ndjson")
+            received = events(response)
+        assert [e["event"] for e in received] == ["sentence", "sentence", "done"]
+        assert received[0]["text"] == "Patience, traveller."
+        done = received[-1]
+        assert done["intent"] == "null" and done["response"] == "Patience, traveller. And tea."
+        assert done["latency_ms"]["first_sentence_ms"] <= done["latency_ms"]["total_ms"]
+
+        with client.stream("POST", f"/v1/sessions/{session}/turns", json={"text": "weather in paris"}) as response:
+            assert [e.get("text") for e in events(response)][0] == "Sunny in Paris."
+
+
+def test_audio_turn_is_transcribed_by_the_shared_model():
+    whisper = SlowWhisper()
+    with serve(create_app(make_server(whisper))) as url, httpx.Client(base_url=url, timeout=10) as client:
+        sessions = [new_session(client) for _ in range(3)]
+        for session in sessions:
+            response = client.post(f"/v1/sessions/{session}/turns", content=wav(),
+                                   headers={"Content-Type": "audio/wav"})
+            received = [json.loads(line) for line in response.text.splitlines()]
+            assert received[0] == {"event": "transcription", "text": "what is the meaning of life"}
+            assert received[-1]["event"] == "done"
+        assert whisper.calls == 3
+        bad = client.post(f"/v1/sessions/{sessions[0]}/turns", content=b"RIFF....",
+                          headers={"Content-Type": "audio/wav"})
+        assert bad.status_code == 400
+        assert client.post("/v1/sessions/nope/turns", json={"text": "hi"}).status_code == 404
+
+
+def test_a_session_runs_one_turn_at_a_time():
+    server = make_server(build_backends=fake_backends(classify_seconds=0.5))
+    with serve(create_app(server)) as url, httpx.Client(base_url=url, timeout=10) as client:
+        session, other = new_session(client), new_session(client)
+        with client.stream("POST", f"/v1/sessions/{session}/turns", json={"text": "first"}) as first:
+            busy = client.post(f"/v1/sessions/{session}/turns", json={"text": "second"})
+            assert busy.status_code == 429 and busy.headers["retry-after"] == "1"
+            # Other sessions are not held up
+            start = time.perf_counter()
+            with client.stream("POST", f"/v1/sessions/{other}/turns", json={"text": "hello"}) as response:
+                assert events(response)[-1]["event"] == "done"
+            assert time.perf_counter() - start < 1.0
+            assert events(first)[-1]["event"] == "done"
+        assert client.post(f"/v1/sessions/{session}/turns", json={"text": "again"}).status_code == 200
+
+
+def test_transcription_queue_sheds_load():
+    server = make_server(SlowWhisper(seconds=0.5), workers=1, max_queued=1, max_batch=1)
+    with serve(create_app(server)) as url:
+        with httpx.Client(base_url=url, timeout=10) as client:
+            sessions = [new_session(client) for _ in range(4)]
+        statuses = []
+
+        def send(session):
+            with httpx.Client(base_url=url, timeout=10) as client:
+                response = client.post(f"/v1/sessions/{session}/turns", content=wav(),
+                                       headers={"Content-Type": "audio/wav"})
+                statuses.append(response.status_code)
+
+        threads = [threading.Thread(target=send, args=(session,)) for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # One decoding and one waiting; the rest are told to come back later
+        assert sorted(statuses) == [200, 200, 503, 503]
+        assert server.pool.stats()["rejected"] == 2
+        assert server.pool.stats()["active"] == 0
+
+
+def test_slow_reader_pauses_only_its_own_reply():
+    synthesised = []
+
+    def build(session_id):
+        async def respond_stream(text):
+            for i in range(100):
+                yield f"Sentence number {i}. "
+        return pipeline.Backends(classify=lambda text: dict(NULL), respond=None, add_task=None,
+                                 get_weather=None, speak=None, respond_stream=respond_stream, speculate=False)
+
+    async def synthesize(sentence):
+        synthesised.append(sentence)
+        return b"mp3"
+
+    server = make_server(build_backends=build, synthesize=synthesize, stream_buffer=2)
+
+    async def scenario():
+        session = server.create_session()
+        stream = server.start_turn(session.id, text="talk to me", voice=True)
+        first = await stream.__anext__()
+        await asyncio.sleep(0.2)
+        stalled_at = len(synthesised)
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        return first, stalled_at, session
+
+    first, stalled_at, session = asyncio.run(scenario())
+    assert first == {"event": "sentence", "text": "Sentence number 0."}
+    assert stalled_at < 10  # speech is synthesised as the client reads, not all up front
+    assert session.pending == 0  # the abandoned turn was cancelled
+
+
+def test_session_limit_drops_idle_sessions_first():
+    server = make_server(max_sessions=2)
+    first = server.create_session()
+    second = server.create_session()
+    second.pending = 1
+    third = server.create_session()
+    assert list(server.sessions) == [second.id, third.id] and first.id not in server.sessions
+    third.pending = 1
+    with pytest.raises(Overloaded):
+        server.create_session()
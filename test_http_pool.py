@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled HTTP client layer against a local stub server that
+counts TCP connections, so keep-alive reuse is visible.
+"""
+
+import asyncio
+import gc
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_pool
+from http_pool import ServiceClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            failures = self.server.fail_next
+            self.server.fail_next = max(0, failures - 1)
+        if failures:
+            self._reply(503, {"error": "busy"})
+        else:
+            self._reply(200, {"path": self.path})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+        self._reply(200, {"intent": "conversation", "echo": payload.get("text")})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    server.fail_next = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty service registry, so services registered by a test don't outlive it."""
+    monkeypatch.setattr(http_pool, "_configs", {})
+    monkeypatch.setattr(http_pool, "_clients", {})
+    yield
+    for client in http_pool._clients.values():
+        client.close()
+
+
+def test_connections_reused_across_commands(stub):
+    commands = 20
+    client = ServiceClient(stub.url, headers={"Content-Type": "application/json"})
+    for i in range(commands):
+        response = client.post("/api/convert", json={"text": f"command {i}"})
+        assert response.json()["echo"] == f"command {i}"
+    client.close()
+    assert stub.requests == commands
+    assert stub.connections == 1
+
+
+def test_module_level_requests_opens_a_connection_per_command(stub):
+    commands = 5
+    for i in range(commands):
+        requests.post(f"{stub.url}/api/convert", json={"text": f"command {i}"})
+    assert stub.requests == commands
+    assert stub.connections == commands
+
+
+def test_retries_transient_errors_with_backoff(stub):
+    stub.fail_next = 2
+    client = ServiceClient(stub.url, retries=2, backoff=0.01)
+    response = client.get("/data/2.5/weather", params={"q": "London"})
+    assert response.status_code == 200
+    assert stub.requests == 3
+    client.close()
+
+
+def test_gives_up_after_retries(stub):
+    stub.fail_next = 10
+    client = ServiceClient(stub.url, retries=1, backoff=0.01)
+    assert client.get("/").status_code == 503
+    assert stub.requests == 2
+    client.close()
+
+
+def test_registry_builds_one_client_per_service(stub, registry):
+    http_pool.configure("stub-service", stub.url, timeout=5)
+    client = http_pool.get_client("stub-service")
+    assert http_pool.get_client("stub-service") is client
+    assert client.url("/rest/v2/tasks") == f"{stub.url}/rest/v2/tasks"
+    assert client.get("/a").json() == {"path": "/a"}
+    assert client.get("/b").json() == {"path": "/b"}
+    assert stub.connections == 1
+
+    http_pool.configure("stub-service", stub.url, timeout=1)
+    assert http_pool.get_client("stub-service") is not client
+    with pytest.raises(KeyError):
+        http_pool.get_client("not-configured")
+
+
+def test_async_openai_clients_are_per_loop_and_released_with_it():
+    async def get_twice():
+        client = http_pool.get_async_openai_client("http://127.0.0.1:9/v1", "key")
+        assert http_pool.get_async_openai_client("http://127.0.0.1:9/v1", "key") is client
+        return client
+
+    first = asyncio.run(get_twice())
+    second = asyncio.run(get_twice())
+    assert first is not second
+    gc.collect()
+    assert len(http_pool._async_openai_clients) == 0
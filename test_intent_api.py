@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Test script for the intent classification API integration.
-Tests the classify_intent_and_entities function with various inputs.
+Tests the classify_intent_remote function (the Phi-2 path) with various inputs.
 """
 
 import sys
@@ -11,8 +11,8 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv('.env.local')
 
-# Import the function from elven.py
-from elven import classify_intent_and_entities, PHI2_API_URL
+# Only the classifier: no audio or speech dependencies needed
+from intents import classify_intent_remote, PHI2_API_URL
 
 def test_intent_classification():
     """Test the intent classification with sample phrases."""
@@ -38,7 +38,7 @@ def test_intent_classification():
         print("-" * 40)
         
         try:
-            result = classify_intent_and_entities(phrase)
+            result = classify_intent_remote(phrase)
             print(f"✅ Result: {result}")
             
             # Analyze result
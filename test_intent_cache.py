@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the memoised intent cache, including the full classification path against
+the mock Phi-2 server running in a background thread.
+"""
+
+import pytest
+
+import intents
+import intent_cache
+import mock_phi2_server
+
+
+@pytest.fixture
+def phi2(phi2_server, monkeypatch):
+    """Send every command to the mock Phi-2 server and count the requests it classifies."""
+    calls = []
+    original = mock_phi2_server.classify_mock_intent
+    monkeypatch.setattr(mock_phi2_server, "classify_mock_intent",
+                        lambda text: calls.append(text) or original(text))
+    monkeypatch.setattr(intents, "INTENT_FAST_PATH", False)
+    return calls
+
+
+def use_cache(monkeypatch, cache):
+    monkeypatch.setattr(intent_cache, "get_intent_cache", lambda: cache)
+
+
+def test_normalise_folds_case_punctuation_and_whitespace():
+    assert (intent_cache.normalise("What's the weather in London?")
+            == intent_cache.normalise("  whats the   WEATHER in london ")
+            == "whats the weather in london")
+
+
+def test_trivially_different_text_hits_the_cache(phi2, monkeypatch):
+    cache = intent_cache.IntentCache()
+    use_cache(monkeypatch, cache)
+    first = intents.classify_intent_and_entities("What's the weather in London?")
+    second = intents.classify_intent_and_entities("what's the weather in london")
+    assert first == second
+    assert first["intent"] == "get_weather"
+    assert len(phi2) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(phi2, monkeypatch):
+    cache = intent_cache.IntentCache(max_entries=2)
+    use_cache(monkeypatch, cache)
+    for text in ["List my tasks", "Add buy milk", "list my tasks", "What's the weather in Paris?"]:
+        intents.classify_intent_and_entities(text)
+    # "Add buy milk" was least recently used when Paris arrived
+    assert len(phi2) == 3
+    assert cache.stats()["evictions"] == 1
+    intents.classify_intent_and_entities("List my tasks.")
+    assert len(phi2) == 3
+    intents.classify_intent_and_entities("Add buy milk")
+    assert phi2[-1] == "Add buy milk" and len(phi2) == 4
+
+
+def test_bypass_switch_always_calls_the_service(phi2, monkeypatch):
+    monkeypatch.setenv("INTENT_CACHE", "0")
+    assert intent_cache.get_intent_cache() is None
+    intents.classify_intent_and_entities("List my tasks")
+    intents.classify_intent_and_entities("List my tasks")
+    assert len(phi2) == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = intent_cache.IntentCache(ttl=60, clock=clock)
+    cache.put("list my tasks", {"intent": "list_tasks"})
+    clock.now += 59
+    assert cache.get("List my tasks!") == {"intent": "list_tasks"}
+    clock.now += 1
+    assert cache.get("List my tasks!") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_failures_are_not_cached():
+    cache = intent_cache.IntentCache()
+    calls = []
+    fallback = {"intent": "null", "task": None, "due": None, "location": None}
+    for _ in range(2):
+        cache.classify("hello", lambda text: calls.append(text) or fallback)
+    assert len(calls) == 2 and len(cache) == 0
+
+
+def test_persists_across_restarts(tmp_path, clock):
+    path = str(tmp_path / "intents.json")
+    cache = intent_cache.IntentCache(ttl=60, path=path, clock=clock)
+    cache.put("old", {"intent": "conversation"})
+    clock.now += 30
+    cache.put("add buy milk", {"intent": "add_task", "task": "buy milk"})
+
+    cache.save()
+
+    clock.now += 40
+    reloaded = intent_cache.IntentCache(ttl=60, path=path, clock=clock)
+    assert reloaded.get("Add buy milk.") == {"intent": "add_task", "task": "buy milk"}
+    assert reloaded.get("old") is None
+    assert len(reloaded) == 1
+
+
+def test_new_entries_are_saved_in_batches(tmp_path):
+    path = tmp_path / "intents.json"
+    cache = intent_cache.IntentCache(path=str(path), save_every=3)
+    cache.put("one", {"intent": "conversation"})
+    cache.put("two", {"intent": "conversation"})
+    assert not path.exists()
+    cache.put("three", {"intent": "conversation"})
+    assert len(intent_cache.IntentCache(path=str(path))) == 3
+    cache.put("four", {"intent": "conversation"})
+    cache.save()
+    assert len(intent_cache.IntentCache(path=str(path))) == 4
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the local intent fast path against the labelled phrase set used by
+bench_intent_fastpath.py.
+"""
+
+import intent_rules
+from bench_intent_fastpath import LABELLED_PHRASES, matches
+
+THRESHOLD = 0.9
+
+
+def test_confident_matches_are_correct():
+    confident = 0
+    for phrase, intent, entities in LABELLED_PHRASES:
+        result, confidence = intent_rules.classify(phrase)
+        if confidence >= THRESHOLD:
+            confident += 1
+            assert matches(result, intent, entities), (phrase, result)
+    # Most of the everyday commands never need the remote model
+    assert confident >= len(LABELLED_PHRASES) // 2
+
+
+def test_due_phrase_is_removed_from_task():
+    result, confidence = intent_rules.classify("Add call mom tomorrow to my tasks")
+    assert result == {"intent": "add_task", "task": "call mom", "due": "tomorrow", "location": None}
+    assert confidence >= THRESHOLD
+
+
+def test_known_city_is_confident_unknown_place_is_escalated():
+    result, confidence = intent_rules.classify("what's the weather like in san francisco")
+    assert result["location"] == "San Francisco"
+    assert confidence >= THRESHOLD
+
+    result, confidence = intent_rules.classify("What's the weather in Little Snoring?")
+    assert result["location"] == "Little Snoring"
+    assert confidence < THRESHOLD
+
+
+def test_mixed_signals_are_escalated():
+    for phrase in ["Remind me to check the weather in London",
+                   "Is it sunny outside?",
+                   "I need to sort out the garage at some point",
+                   ""]:
+        _, confidence = intent_rules.classify(phrase)
+        assert confidence < THRESHOLD, phrase
+
+
+def test_fast_path_skips_remote(monkeypatch):
+    import intents
+
+    calls = []
+    monkeypatch.setattr(intents, "classify_intent_remote", lambda text: calls.append(text) or {"intent": "conversation"})
+    assert intents.classify_intent_and_entities("List my tasks")["intent"] == "list_tasks"
+    assert calls == []
+    intents.classify_intent_and_entities("Explain how rainbows form")
+    assert calls == ["Explain how rainbows form"]
+
+    monkeypatch.setattr(intents, "INTENT_FAST_PATH", False)
+    intents.classify_intent_and_entities("List my tasks")
+    assert calls[-1] == "List my tasks"
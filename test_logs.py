@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the logging layer: request IDs across threads and processes,
+payload gating, lazy formatting and the background writer.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import httpx
+import pytest
+
+import intents
+import logs
+
+logger = logging.getLogger("test_logs")
+
+
+@pytest.fixture(autouse=True)
+def restore_logging(monkeypatch):
+    monkeypatch.delenv("ELVEN_LOG_PAYLOADS", raising=False)
+    monkeypatch.setattr(logs, "_payloads", None)
+    level = logging.getLogger().level
+    yield
+    logs.shutdown()
+    logging.getLogger().setLevel(level)
+
+
+def records(path):
+    logs.flush()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_request_id_follows_tasks_and_threads(tmp_path):
+    path = tmp_path / "elven.log"
+    logs.configure(fmt="json", path=str(path))
+
+    async def turn(name):
+        with logs.request(f"turn-{name}") as request_id:
+            await asyncio.gather(asyncio.to_thread(logger.info, "thread %s", name),
+                                 asyncio.create_task(asyncio.sleep(0, logger.info("task %s", name))))
+            return request_id
+
+    async def both():
+        return await asyncio.gather(turn("a"), turn("b"))
+
+    assert asyncio.run(both()) == ["turn-a", "turn-b"]
+    logger.info("outside")
+    ids = {entry["message"]: entry["request_id"] for entry in records(path)}
+    assert ids == {"thread a": "turn-a", "task a": "turn-a", "thread b": "turn-b", "task b": "turn-b",
+                   "outside": "-"}
+    # Anything that is not a plain short token is replaced
+    with logs.request("bad id\r\nX-Injected: 1") as request_id:
+        assert request_id != "bad id\r\nX-Injected: 1" and len(request_id) == 16
+
+
+def test_intent_server_logs_under_the_assistants_request_id(tmp_path, monkeypatch, phi2_server):
+    path = tmp_path / "elven.log"
+    logs.configure(level="DEBUG", fmt="json", path=str(path), payloads=True)
+    monkeypatch.setattr(intents, "INTENT_FAST_PATH", False)
+    with logs.request("turn-42"):
+        result = intents.classify_intent_remote("what's the weather in Paris")
+    # The ID comes back in the response, and a new one is made when none is sent
+    response = httpx.post(f"{phi2_server}/api/convert", json={"text": "hello"}, headers={"X-Request-ID": "abc"})
+    assert response.headers["x-request-id"] == "abc"
+    assert len(httpx.get(f"{phi2_server}/health").headers["x-request-id"]) == 16
+    assert result["intent"] == "get_weather"
+    by_logger = {entry["logger"]: entry["request_id"] for entry in records(path)
+                 if entry["logger"] in ("intents", "mock_phi2_server") and "Paris" in entry["message"]}
+    assert by_logger == {"intents": "turn-42", "mock_phi2_server": "turn-42"}
+
+
+def test_payloads_are_off_by_default(tmp_path, monkeypatch):
+    assert not logs.payloads_enabled()
+    monkeypatch.setenv("ELVEN_LOG_PAYLOADS", "1")
+    assert logs.payloads_enabled()
+    logs.configure_from_env(path=str(tmp_path / "elven.log"), payloads=False)
+    assert not logs.payloads_enabled()
+
+
+def test_disabled_levels_are_not_formatted(tmp_path):
+    formatted = []
+
+    class Expensive:
+        def __init__(self, name):
+            self.name = name
+
+        def __str__(self):
+            formatted.append(self.name)
+            return "expensive"
+
+    path = tmp_path / "elven.log"
+    logs.configure(level="INFO", path=str(path))
+    logger.debug("state: %s", Expensive("debug"))
+    logger.warning("state: %s", Expensive("warning"))
+    logs.flush()
+    assert "warning" in formatted and "debug" not in formatted
+    assert path.read_text() == "[WARNING] state: expensive\n"
+
+
+def test_a_slow_sink_does_not_hold_up_the_caller(tmp_path):
+    written = []
+
+    class SlowHandler(logging.Handler):
+        def emit(self, record):
+            time.sleep(0.05)
+            written.append((record.getMessage(), threading.current_thread().name))
+
+    logs.configure(path=str(tmp_path / "elven.log"))
+    logs._listener.handlers = (SlowHandler(),)
+    start = time.perf_counter()
+    for i in range(10):
+        logger.info("line %d", i)
+    assert time.perf_counter() - start < 0.05
+    logs.flush()
+    assert [message for message, _ in written] == [f"line {i}" for i in range(10)]
+    assert threading.current_thread().name not in {thread for _, thread in written}
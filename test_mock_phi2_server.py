@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the mock Phi-2 server's batch endpoint and request micro-batcher.
+"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import mock_phi2_server
+from mock_phi2_server import MicroBatcher, app
+
+PHRASES = ["Add buy milk to my todo list", "What's the weather in London?", "Is it sunny in Paris?", "Hello"]
+
+
+def test_batch_results_match_single_requests_in_order():
+    client = TestClient(app)
+    singles = [client.post("/api/convert", json={"text": text}).json() for text in PHRASES]
+    batch = client.post("/api/convert_batch", json={"texts": PHRASES}).json()
+    assert batch["results"] == singles
+    assert [r["intent"] for r in singles] == ["add_task", "get_weather", "get_weather", "conversation"]
+
+
+def test_batch_larger_than_max_batch_is_split(monkeypatch):
+    sizes = []
+    original = mock_phi2_server.run_model
+    monkeypatch.setattr(mock_phi2_server, "MAX_BATCH_SIZE", 3)
+    monkeypatch.setattr(mock_phi2_server, "run_model", lambda texts: sizes.append(len(texts)) or original(texts))
+    results = TestClient(app).post("/api/convert_batch", json={"texts": PHRASES * 2}).json()["results"]
+    assert len(results) == 8 and sizes == [3, 3, 2]
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    sizes = []
+
+    def process(items):
+        sizes.append(len(items))
+        return [item.upper() for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.submit(f"t{i}") for i in range(10)))
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+    assert results == [f"T{i}" for i in range(10)]
+    assert sizes == [8, 2]
+    assert (batcher.batches, batcher.items) == (2, 10)
+
+
+def test_micro_batcher_fails_the_whole_batch_on_error():
+    def process(items):
+        raise RuntimeError("model crashed")
+
+    async def scenario():
+        batcher = MicroBatcher(process, max_wait_ms=5)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_rule_engine_intents_and_entities():
+    classify = mock_phi2_server.classify_mock_intent
+    assert classify("List my tasks").intent == "list_tasks"
+    assert classify("What's on my to-do list?").intent == "list_tasks"
+    added = classify("Add call mom tomorrow to my tasks")
+    assert (added.intent, added.task, added.due_date) == ("add_task", "call mom", "tomorrow")
+    assert classify("Remind me to water the plants").task == "water the plants"
+    weather = classify("Is it sunny in New York?")
+    assert (weather.intent, weather.location) == ("get_weather", "New York")
+    # Keywords are whole words: "address" is not "add", "showers" is not "show"
+    assert classify("What is your address?").intent == "conversation"
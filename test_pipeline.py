@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio turn pipeline, with in-memory fake backends.
+"""
+
+import asyncio
+import threading
+import time
+
+import pipeline
+
+
+class FakeBackends:
+    def __init__(self, intent_data, intent_delay=0.1, llm_delay=0.1, reply="Greetings, traveller."):
+        self.intent_data = intent_data
+        self.intent_delay = intent_delay
+        self.llm_delay = llm_delay
+        self.reply = reply
+        self.calls = []
+        self.spoken = []
+        self.lock = threading.Lock()
+
+    def _log(self, name, start):
+        with self.lock:
+            self.calls.append((name, start, time.perf_counter()))
+
+    def classify(self, text):
+        start = time.perf_counter()
+        time.sleep(self.intent_delay)
+        self._log("classify", start)
+        if isinstance(self.intent_data, Exception):
+            raise self.intent_data
+        return self.intent_data
+
+    def respond(self, text):
+        start = time.perf_counter()
+        time.sleep(self.llm_delay)
+        self._log("respond", start)
+        return self.reply
+
+    def add_task(self, task, due):
+        self._log("add_task", time.perf_counter())
+        return f"Task added: {task}" + (f" (due {due})" if due else "")
+
+    def get_weather(self, location):
+        self._log("get_weather", time.perf_counter())
+        return f"The weather in {location} is fair."
+
+    async def speak(self, text):
+        self.spoken.append(text)
+
+    def backends(self, speculate=True):
+        return pipeline.Backends(self.classify, self.respond, self.add_task, self.get_weather,
+                                 self.speak, speculate=speculate)
+
+    def names(self):
+        return [name for name, _, _ in self.calls]
+
+
+def run(transcription, fake, **kwargs):
+    return asyncio.run(pipeline.handle_turn(transcription, fake.backends(**kwargs)))
+
+
+def test_conversation_overlaps_intent_and_reply():
+    fake = FakeBackends({"intent": "conversation"}, intent_delay=0.2, llm_delay=0.2)
+    start = time.perf_counter()
+    turn = run("how are you", fake)
+    elapsed = time.perf_counter() - start
+    assert turn == {"intent": "conversation", "response": "Greetings, traveller.", "end_conversation": False}
+    assert fake.spoken == ["Greetings, traveller."]
+    assert fake.names().count("respond") == 1
+    assert elapsed < 0.35  # serial would be at least 0.4
+
+
+def test_command_discards_speculative_reply():
+    fake = FakeBackends({"intent": "add_task", "task": "buy milk", "due": "tomorrow"},
+                        intent_delay=0.05, llm_delay=0.3)
+    turn = run("add buy milk tomorrow", fake)
+    assert turn["response"] == "Task added: buy milk (due tomorrow)"
+    assert fake.spoken == ["Task added: buy milk (due tomorrow)"]
+    assert "add_task" in fake.names()
+
+
+def test_weather_and_email_intents():
+    fake = FakeBackends({"intent": "get_weather", "location": "London"})
+    assert run("weather in London", fake)["response"] == "The weather in London is fair."
+
+    fake = FakeBackends({"intent": "send_email"})
+    assert run("email John", fake)["response"] == "Email functionality is not available yet."
+
+
+def test_without_speculation_reply_starts_after_intent():
+    fake = FakeBackends({"intent": "conversation"}, intent_delay=0.05, llm_delay=0.05)
+    run("hello", fake, speculate=False)
+    (_, _, classified), (_, replied_start, _) = [c for c in fake.calls if c[0] in ("classify", "respond")]
+    assert replied_start >= classified
+
+
+def test_failed_classification_falls_back_to_conversation():
+    fake = FakeBackends(RuntimeError("server down"))
+    turn = run("hello", fake)
+    assert turn["intent"] == "null"
+    assert turn["response"] == "Greetings, traveller."
+
+
+def test_stop_phrase_in_reply_ends_conversation():
+    fake = FakeBackends({"intent": "conversation"}, reply="Goodbye, friend.")
+    assert run("bye", fake)["end_conversation"] is True
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for in-memory playback with the headless sinks.
+WAV input is used so no MP3 encoder is needed; MP3 is covered when lameenc is installed.
+"""
+
+import asyncio
+import io
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from playback import FileSink, NullSink, Player
+
+SAMPLE_RATE = 24000
+
+
+def wav_bytes(seconds, freq=300.0):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    samples = (8000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+async def chunked(data, size=700, delay=0.0):
+    for i in range(0, len(data), size):
+        if delay:
+            await asyncio.sleep(delay)
+        yield data[i:i + size]
+
+
+class RecordingSink(NullSink):
+    """Null sink that notes when the first PCM arrived and paces like a real device."""
+
+    def __init__(self, realtime=False):
+        super().__init__()
+        self.first_write = None
+        self.realtime = realtime
+        self.aborted = False
+
+    def write(self, pcm):
+        if self.first_write is None:
+            self.first_write = time.perf_counter()
+        super().write(pcm)
+        if self.realtime:
+            time.sleep(len(pcm) / 2 / SAMPLE_RATE)
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_null_sink_plays_whole_clip():
+    sink = NullSink()
+    player = Player(sink, source_format="wav")
+    assert asyncio.run(player.play(wav_bytes(1.0))) is True
+    assert sink.frames == SAMPLE_RATE
+
+
+def test_decoding_starts_before_the_last_chunk_arrives():
+    sink = RecordingSink()
+    player = Player(sink, source_format="wav")
+    data = wav_bytes(1.0)
+    delay = 0.01
+    start = time.perf_counter()
+    asyncio.run(player.play_stream(chunked(data, delay=delay)))
+    last_chunk_at = start + delay * (len(data) // 700 + 1)
+    assert sink.first_write < last_chunk_at - 0.2
+    assert sink.frames == SAMPLE_RATE
+
+
+def test_file_sink_writes_wav(tmp_path):
+    path = tmp_path / "output.wav"
+    player = Player(FileSink(str(path)), source_format="wav")
+    asyncio.run(player.play_stream(chunked(wav_bytes(0.5))))
+    with wave.open(str(path), "rb") as wf:
+        assert wf.getframerate() == SAMPLE_RATE
+        assert wf.getnframes() == SAMPLE_RATE // 2
+
+
+def test_stop_interrupts_playback():
+    sink = RecordingSink(realtime=True)
+    player = Player(sink, source_format="wav")
+
+    async def scenario():
+        playing = asyncio.create_task(player.play(wav_bytes(2.0)))
+        await asyncio.sleep(0.2)
+        assert player.playing
+        player.stop()
+        return await playing
+
+    start = time.perf_counter()
+    finished = asyncio.run(scenario())
+    assert finished is False
+    assert time.perf_counter() - start < 0.6
+    assert sink.aborted
+    assert sink.frames < SAMPLE_RATE
+    player.stop()  # idle stop is a no-op
+
+
+def test_cancelled_playback_is_cut_and_the_next_clip_plays():
+    sink = RecordingSink(realtime=True)
+    player = Player(sink, source_format="wav")
+
+    async def scenario():
+        playing = asyncio.create_task(player.play(wav_bytes(2.0)))
+        await asyncio.sleep(0.2)
+        playing.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await playing
+        # Straight away, while the cancelled clip's decoder may still be on its last block
+        return await player.play(wav_bytes(0.5))
+
+    start = time.perf_counter()
+    assert asyncio.run(scenario()) is True
+    assert time.perf_counter() - start < 1.2
+    assert sink.aborted
+    assert sink.frames < SAMPLE_RATE * 1.0
+
+
+def test_mp3_stream():
+    lameenc = pytest.importorskip("lameenc")
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(48)
+    encoder.set_in_sample_rate(SAMPLE_RATE)
+    encoder.set_channels(1)
+    pcm = (8000 * np.sin(2 * np.pi * 300 * np.arange(SAMPLE_RATE) / SAMPLE_RATE)).astype(np.int16)
+    mp3 = encoder.encode(pcm.tobytes()) + encoder.flush()
+    sink = NullSink()
+    asyncio.run(Player(sink).play_stream(chunked(mp3, size=500)))
+    assert abs(sink.frames - SAMPLE_RATE) < 2000
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests that importing the entry points stays cheap and free of side effects.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import bench_startup
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY = ["numpy", "requests", "pvporcupine", "dotenv", "openai", "edge_tts", "whisper", "torch", "pyaudio"]
+
+
+def loaded_after_import(module, cwd=HERE, code=""):
+    script = (f"import sys; sys.path.insert(0, {HERE!r}); import {module}; {code}\n"
+              f"import json; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, "-c", script], cwd=cwd, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()
+
+
+def test_intents_imports_nothing_heavy():
+    assert json.loads(loaded_after_import("intents")[-1]) == []
+
+
+def test_local_classification_stays_light():
+    # The rules fast path answers this without the Phi-2 client
+    code = "assert intents.classify_intent_and_entities('Show my tasks')['intent'] == 'list_tasks'"
+    assert json.loads(loaded_after_import("intents", code=code)[-1]) == []
+
+
+def test_elven_defers_optional_dependencies():
+    loaded = json.loads(loaded_after_import("elven")[-1])
+    assert set(loaded) <= {"numpy", "requests"}
+
+
+def test_elven_import_does_not_read_env_file(tmp_path):
+    (tmp_path / ".env.local").write_text("TODOIST_API_TOKEN=from-env-file\n")
+    env = dict(os.environ)
+    env.pop("TODOIST_API_TOKEN", None)
+    script = (f"import sys; sys.path.insert(0, {HERE!r}); import os, elven; "
+              f"print(os.getenv('TODOIST_API_TOKEN'), elven.TODOIST_API_TOKEN)")
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split()[-2:] == ["None", "None"]
+
+
+def test_import_times_within_budget():
+    for module, budget in bench_startup.BUDGETS.items():
+        ms, _ = bench_startup.measure(module, runs=3)
+        assert ms <= budget, f"import {module} took {ms:.0f} ms"
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming transcription, driven by WAV fixtures instead of a microphone.
+
+The fake model "hears" one word per second of audio: every second of the
+fixture is a constant level n * 100, which the model reads back as " w<n>".
+That way the final text shows whether any audio was lost or decoded twice
+as segments are committed and trimmed from the rolling window.
+"""
+
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from transcriber import (
+    SAMPLE_RATE,
+    StreamingTranscriber,
+    TranscriptionEngine,
+    pcm_chunks_from_wav,
+    transcribe_stream,
+)
+
+
+class OneWordPerSecondModel:
+    def __init__(self):
+        self.decoded_lengths = []
+
+    def transcribe(self, audio, language=None, **options):
+        if isinstance(audio, str):
+            with wave.open(audio, "rb") as wf:
+                audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16) / 32768.0
+        self.decoded_lengths.append(len(audio))
+        segments = []
+        for start in range(0, len(audio), SAMPLE_RATE):
+            piece = audio[start:start + SAMPLE_RATE]
+            word = f" w{round(float(piece[len(piece) // 2]) * 32768 / 100)}"
+            segments.append({
+                "start": start / SAMPLE_RATE,
+                "end": (start + len(piece)) / SAMPLE_RATE,
+                "text": word,
+            })
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+
+def make_engine():
+    model = OneWordPerSecondModel()
+    return TranscriptionEngine(loader=lambda name, device=None: model), model
+
+
+def write_fixture(path, seconds):
+    samples = np.concatenate([np.full(SAMPLE_RATE, n * 100, dtype=np.int16) for n in range(1, seconds + 1)])
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+    return str(path)
+
+
+def expected_text(seconds):
+    return " ".join(f"w{n}" for n in range(1, seconds + 1))
+
+
+def feed_in_real_time(stream, path, speedup=50.0):
+    chunk_seconds = 1024 / SAMPLE_RATE
+    for chunk in pcm_chunks_from_wav(path):
+        stream.feed(chunk)
+        time.sleep(chunk_seconds / speedup)
+
+
+def test_file_path_still_works(tmp_path):
+    engine, _ = make_engine()
+    path = write_fixture(tmp_path / "command.wav", 3)
+    assert engine.transcribe(path)["text"].strip() == expected_text(3)
+
+
+def test_stream_matches_file_transcription(tmp_path):
+    engine, _ = make_engine()
+    path = write_fixture(tmp_path / "command.wav", 12)
+    text = transcribe_stream(pcm_chunks_from_wav(path), engine=engine)
+    assert text == expected_text(12)
+
+
+def test_partials_arrive_while_speaking(tmp_path):
+    engine, _ = make_engine()
+    path = write_fixture(tmp_path / "command.wav", 6)
+    partials = []
+    stream = StreamingTranscriber(engine=engine, partial_interval=0.5, on_partial=partials.append)
+    feed_in_real_time(stream, path)
+    assert partials, "expected partial hypotheses before the utterance ended"
+    assert partials[-1].startswith("w1 w2")
+    assert stream.finish() == expected_text(6)
+
+
+def test_window_bounds_buffer_and_final_decode(tmp_path):
+    engine, model = make_engine()
+    path = write_fixture(tmp_path / "command.wav", 20)
+    stream = StreamingTranscriber(engine=engine, window_seconds=4.0, partial_interval=0.5,
+                                  commit_margin=1.0)
+    feed_in_real_time(stream, path)
+    # Without commits the whole 20 s clip would still be buffered.
+    assert stream.buffered_seconds < 8
+    assert stream.finish() == expected_text(20)
+    # The final decode only covers the uncommitted tail, not the full clip.
+    assert model.decoded_lengths[-1] < 8 * SAMPLE_RATE
+
+
+def test_window_holds_when_whisper_returns_one_long_segment(tmp_path):
+    class OneSegmentModel(OneWordPerSecondModel):
+        def transcribe(self, audio, language=None, **options):
+            result = super().transcribe(audio, language, **options)
+            return dict(result, segments=[{"start": 0.0, "end": len(audio) / SAMPLE_RATE, "text": result["text"]}])
+
+    model = OneSegmentModel()
+    engine = TranscriptionEngine(loader=lambda name, device=None: model)
+    path = write_fixture(tmp_path / "command.wav", 10)
+    stream = StreamingTranscriber(engine=engine, window_seconds=2.0, partial_interval=0.5, commit_margin=1.0)
+    feed_in_real_time(stream, path)
+    assert stream.buffered_seconds < 3
+    text = stream.finish()
+    assert max(model.decoded_lengths) < 4 * SAMPLE_RATE
+    assert text.startswith("w1") and text.endswith("w10")
+
+
+def test_wav_fixture_format_is_checked(tmp_path):
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(b"\x00" * 400)
+    with pytest.raises(ValueError):
+        list(pcm_chunks_from_wav(str(path)))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the local Todoist mirror against the Todoist stub.
+"""
+
+import asyncio
+import datetime
+import time
+
+import pytest
+
+import pipeline
+import todoist_stub
+from todoist_mirror import TaskMirror
+from todoist_queue import TodoistQueue
+
+TODAY = datetime.date(2026, 3, 11)  # a Wednesday
+STUB = todoist_stub
+
+
+@pytest.fixture
+def stub(stub):
+    stub.token = None  # the queue tests set one
+    return stub
+
+
+def make_mirror(client, clock, **kwargs):
+    kwargs.setdefault("today", lambda: TODAY)
+    return TaskMirror(token="t", client=client, clock=clock, **kwargs)
+
+
+def day(offset):
+    return (TODAY + datetime.timedelta(days=offset)).isoformat()
+
+
+def test_incremental_sync_after_full_sync(stub, client, clock):
+    first = stub.add_task("buy milk")
+    stub.add_task("call mom")
+    mirror = make_mirror(client, clock, max_age=60)
+    assert mirror.speak() == "Your tasks are: buy milk, call mom"
+    assert (stub.full_syncs, stub.incremental_syncs) == (1, 0)
+
+    stub.add_task("water plants")
+    stub.complete_task(first["id"])
+    assert mirror.speak() == "Your tasks are: buy milk, call mom"  # still fresh: no request
+    clock.now += 60
+    # Stale: answered from the mirror while a background refresh fetches the changes
+    assert mirror.speak() == "Your tasks are: buy milk, call mom"
+    mirror._refresher.join()
+    assert mirror.speak() == "Your tasks are: call mom, water plants"
+    assert (stub.full_syncs, stub.incremental_syncs) == (1, 1)
+
+
+def test_due_and_project_filters(stub, client, clock):
+    stub.add_task("pay rent", due_date=day(-2))
+    stub.add_task("buy milk", due_date=day(0))
+    stub.add_task("book dentist", due_date=day(1), project="Health")
+    stub.add_task("gym", due_date=day(3), project="Health")
+    stub.add_task("someday")
+    mirror = make_mirror(client, clock)
+    assert mirror.speak(due="today") == "Your tasks due today: buy milk."
+    assert mirror.speak(due="overdue") == "Your tasks overdue: pay rent."
+    assert mirror.speak(due="this week") == "Your tasks due this week: buy milk, book dentist, gym."
+    assert mirror.speak(project="health") == "Your tasks in health: book dentist, gym."
+    assert mirror.speak(due="tomorrow", project="Health") == "Your tasks due tomorrow in Health: book dentist."
+    assert mirror.speak(due="next week") == "You have no tasks due next week."
+
+
+def test_long_lists_are_paginated(stub, client, clock):
+    for i in range(12):
+        stub.add_task(f"task {i}", due_date=day(i))
+    mirror = make_mirror(client, clock, page_size=5)
+    assert mirror.speak() == ("You have 12 tasks. Here are the first 5: task 0, task 1, task 2, task 3, task 4. "
+                              "Say \"more tasks\" to hear the next 5.")
+    assert mirror.speak(more=True) == ("Tasks 6 to 10 of 12: task 5, task 6, task 7, task 8, task 9. "
+                                       "Say \"more tasks\" to hear the next 2.")
+    assert mirror.speak(more=True) == "Tasks 11 to 12 of 12: task 10, task 11."
+    assert mirror.speak(more=True) == "That's all of your tasks."
+
+
+def test_own_adds_show_at_once_and_refresh_the_mirror(tmp_path, stub, client, clock):
+    stub.add_task("call mom")
+    mirror = make_mirror(client, clock, today=datetime.date.today)  # the stub dates "today" by the real clock
+    queue = TodoistQueue(str(tmp_path / "queue.db"), token="t", client=client, on_synced=mirror.invalidate)
+    mirror.speak()
+
+    queue.enqueue("buy milk", "today")
+    pending = [{"content": t["content"], "due": {"string": t["due_string"]}} for t in queue.pending()]
+    assert mirror.speak(due="today", extra=pending) == "Your tasks due today: buy milk."
+
+    assert queue.flush() == 1
+    mirror._refresher.join()
+    assert queue.pending() == []
+    assert mirror.speak(due="today") == "Your tasks due today: buy milk."
+    assert stub.incremental_syncs == 1
+
+
+def test_invalidation_during_a_sync_is_not_lost(stub, client, clock):
+    mirror = make_mirror(client, clock)
+    mirror.sync()
+    post = client.post
+
+    def post_then_add(*args, **kwargs):
+        # The response is already built when the assistant adds a task and invalidates
+        response = post(*args, **kwargs)
+        client.post = post
+        stub.add_task("buy milk")
+        mirror.invalidate()
+        return response
+
+    client.post = post_then_add
+    mirror.refresh_in_background().join()
+    assert mirror.speak() == "Your tasks are: buy milk"
+    assert stub.full_syncs + stub.incremental_syncs == 3  # one more sync, not a wait for max_age
+
+
+def test_queries_are_answered_locally_in_milliseconds(stub, client, clock):
+    for i in range(500):
+        stub.add_task(f"task {i}", due_date=day(i % 30))
+    mirror = make_mirror(client, clock)
+    mirror.sync()
+    requests_before = stub.full_syncs + stub.incremental_syncs
+    start = time.perf_counter()
+    for _ in range(20):
+        mirror.speak(due="today")
+    assert (time.perf_counter() - start) / 20 < 0.005
+    assert stub.full_syncs + stub.incremental_syncs == requests_before
+
+
+def test_pipeline_dispatches_list_tasks():
+    calls = []
+
+    async def speak(text):
+        calls.append(("speak", text))
+
+    backends = pipeline.Backends(
+        classify=lambda text: {"intent": "list_tasks", "due": "today", "project": None, "more": False},
+        respond=lambda text: pytest.fail("conversation reply requested"),
+        add_task=None,
+        get_weather=None,
+        speak=speak,
+        speculate=False,
+        list_tasks=lambda due, project, more: calls.append((due, project, more)) or "Your tasks due today: x.",
+    )
+    turn = asyncio.run(pipeline.handle_turn("what's due today", backends))
+    assert turn["response"] == "Your tasks due today: x."
+    assert calls == [("today", None, False), ("speak", "Your tasks due today: x.")]
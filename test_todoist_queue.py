@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests for the write-behind Todoist queue against the local Todoist stub.
+"""
+
+import time
+
+import pytest
+
+import http_pool
+import todoist_stub
+from todoist_queue import TodoistQueue
+
+TOKEN = "test-token"
+STUB = todoist_stub
+
+
+@pytest.fixture
+def stub(stub):
+    stub.token = TOKEN
+    return stub
+
+
+def make_queue(tmp_path, client, **kwargs):
+    return TodoistQueue(str(tmp_path / "queue.db"), token=TOKEN, client=client, **kwargs)
+
+
+def contents(stub):
+    return [task["content"] for task in stub.active_tasks()]
+
+
+def test_tasks_are_sent_in_batches(tmp_path, stub, client):
+    queue = make_queue(tmp_path, client, batch_size=4)
+    for i in range(10):
+        queue.enqueue(f"task {i}", "tomorrow" if i == 0 else None)
+    assert contents(stub) == []
+    assert queue.flush() == 10
+    assert stub.sync_batches == [4, 4, 2]
+    assert contents(stub) == [f"task {i}" for i in range(10)]
+    assert stub.active_tasks()[0]["due"]["string"] == "tomorrow"
+    assert queue.stats() == {"pending": 0, "synced": 10, "failed": 0, "requests": 3}
+
+
+def test_transient_failure_is_retried_with_backoff(tmp_path, stub, client, clock):
+    queue = make_queue(tmp_path, client, retry_base=2.0, clock=clock)
+    queue.enqueue("buy milk")
+    stub.fail_next(2, status=503)
+
+    assert queue.flush() == 0
+    assert queue.flush() == 0  # still backing off: nothing sent
+    assert queue.requests == 1
+    clock.now += 2
+    assert queue.flush() == 0  # second injected failure; next delay is 4 s
+    clock.now += 3
+    assert queue.flush() == 0 and queue.requests == 2
+    clock.now += 1
+    assert queue.flush() == 1
+    assert contents(stub) == ["buy milk"]
+
+
+def test_lost_response_is_resent_without_duplicates(tmp_path, stub, client, clock):
+    queue = make_queue(tmp_path, client, clock=clock)
+    queue.enqueue("call mom")
+    queue.enqueue("water plants")
+    stub.lose_next_response()
+
+    assert queue.flush() == 0  # applied upstream, but we never heard back
+    assert contents(stub) == ["call mom", "water plants"]
+    clock.now += 60
+    assert queue.flush() == 2
+    assert contents(stub) == ["call mom", "water plants"]
+
+
+def test_queue_survives_a_crash(tmp_path, stub, client):
+    # Confirmed to the user, then the process dies before anything is sent
+    queue = make_queue(tmp_path, client)
+    queue.enqueue("book dentist", "friday")
+    queue.enqueue("renew passport")
+    queue._db.close()
+
+    # Crash after Todoist applied the batch but before it was marked synced
+    restarted = make_queue(tmp_path, client)
+    rows = restarted._ready_batch()
+    todoist_stub.stub.sync(restarted._commands(rows))
+    assert contents(stub) == ["book dentist", "renew passport"]
+
+    recovered = make_queue(tmp_path, client)
+    assert [t["content"] for t in recovered.pending()] == ["book dentist", "renew passport"]
+    assert recovered.flush() == 2
+    assert contents(stub) == ["book dentist", "renew passport"]
+    assert recovered.pending() == []
+
+
+def test_rejected_task_is_not_retried(tmp_path, stub, client):
+    queue = make_queue(tmp_path, client)
+    queue.enqueue("   ")
+    queue.enqueue("real task")
+    assert queue.flush() == 1
+    assert queue.stats()["failed"] == 1
+    assert queue.failures()[0][0] == "   "
+    assert queue.flush() == 0 and stub.sync_batches == [2]
+
+
+def test_refused_request_is_not_retried(tmp_path, stub, client):
+    queue = TodoistQueue(str(tmp_path / "queue.db"), token="wrong-token", client=client)
+    queue.enqueue("buy milk")
+    assert queue.flush_once() == 1
+    assert queue.stats() == {"pending": 0, "synced": 0, "failed": 1, "requests": 1}
+    assert queue.failures()[0][1].startswith("HTTP 401")
+    assert queue.flush_once() == 0 and queue.requests == 1
+
+
+def test_worker_flushes_in_the_background(tmp_path, stub, client):
+    queue = make_queue(tmp_path, client, batch_delay=0.05).start()
+    try:
+        for i in range(5):
+            queue.enqueue(f"task {i}")
+        deadline = time.time() + 5
+        while queue.stats()["synced"] < 5 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        queue.stop()
+    assert contents(stub) == [f"task {i}" for i in range(5)]
+    assert len(stub.sync_batches) <= 2
+
+
+def test_add_task_confirms_immediately_while_offline(tmp_path, monkeypatch):
+    import elven
+    import todoist_queue
+
+    queue = TodoistQueue(str(tmp_path / "queue.db"), token=TOKEN,
+                         client=http_pool.ServiceClient("http://127.0.0.1:9", timeout=0.2, retries=0))
+    monkeypatch.setattr(todoist_queue, "get_queue", lambda token=None: queue)
+    start = time.perf_counter()
+    assert elven.add_todoist_task("buy milk tomorrow", token=TOKEN) == "Task added: buy milk (due tomorrow)"
+    assert time.perf_counter() - start < 0.5
+    assert queue.flush() == 0
+    assert queue.pending() == [{"content": "buy milk", "due_string": "tomorrow"}]
+
+
+def test_add_task_without_a_token_fails(monkeypatch):
+    import elven
+    import todoist_queue
+
+    monkeypatch.setattr(elven, "TODOIST_API_TOKEN", None)
+    monkeypatch.setattr(todoist_queue, "get_queue", lambda token=None: pytest.fail("queued without a token"))
+    assert elven.add_todoist_task("buy milk") == "Failed to add task: TODOIST_API_TOKEN not set."
+
+
+@pytest.mark.parametrize("command, content, due", [
+    ("Add buy milk this weekend", "buy milk", "this weekend"),
+    ("Add pay rent next weekend", "pay rent", "next weekend"),
+    ("Remind me to call mom this morning", "call mom", "this morning"),
+    ("Add water the plants this evening", "water the plants", "this evening"),
+    ("Add finish the report by monday", "finish the report", "monday"),
+])
+def test_classified_due_date_reaches_todoist_unchanged(tmp_path, monkeypatch, command, content, due):
+    import elven
+    import intent_rules
+    import todoist_queue
+
+    queue = TodoistQueue(str(tmp_path / "queue.db"), token=TOKEN, client=None)
+    monkeypatch.setattr(todoist_queue, "get_queue", lambda token=None: queue)
+    monkeypatch.setattr(elven, "TODOIST_API_TOKEN", TOKEN)
+    result, _ = intent_rules.classify(command)
+    assert elven.build_backends().add_task(result["task"], result["due"]) == f"Task added: {content} (due {due})"
+    assert queue.pending() == [{"content": content, "due_string": due}]
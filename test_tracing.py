@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage latency tracing.
+"""
+
+import asyncio
+import json
+import random
+import time
+import urllib.request
+
+import pytest
+
+import pipeline
+import tracing
+from stub_server import free_port
+
+
+@pytest.fixture(autouse=True)
+def tracing_off():
+    tracing.configure(stats=False)
+    yield
+    tracing.configure(stats=False)
+
+
+def test_disabled_tracing_is_a_shared_noop():
+    assert not tracing.enabled()
+    with tracing.turn() as turn, tracing.span("whisper", model="small") as span:
+        span.set(tokens=3)
+        tracing.annotate(intent="get_weather")
+    assert span is turn is tracing._NOOP
+    assert tracing.stats() == {}
+
+
+def test_histogram_percentiles():
+    histogram = tracing.Histogram()
+    values = list(range(1, 1001))
+    random.Random(0).shuffle(values)
+    for ms in values:
+        histogram.add(float(ms))
+    for p in (50, 95, 99):
+        assert histogram.percentile(p) == pytest.approx(p * 10, rel=0.03)
+    assert histogram.summary()["count"] == 1000
+    assert histogram.summary()["max_ms"] == 1000
+
+
+def test_spans_from_threads_and_tasks_attach_to_the_turn(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(export="jsonl", path=str(path))
+
+    def blocking_stage():
+        with tracing.span("phi2", endpoint="/api/convert"):
+            time.sleep(0.01)
+
+    async def concurrent_stage():
+        with tracing.span("openrouter"):
+            await asyncio.sleep(0.01)
+
+    async def one_turn():
+        with tracing.turn(source="test"):
+            await asyncio.gather(asyncio.to_thread(blocking_stage), asyncio.create_task(concurrent_stage()))
+            tracing.annotate(intent="null")
+
+    asyncio.run(one_turn())
+    with tracing.span("outside"):
+        pass
+
+    record = json.loads(path.read_text())
+    assert record["turn"] == 1 and record["source"] == "test" and record["intent"] == "null"
+    spans = {span["name"]: span for span in record["spans"]}
+    assert set(spans) == {"phi2", "openrouter"}
+    assert spans["phi2"]["endpoint"] == "/api/convert"
+    assert spans["phi2"]["duration_ms"] >= 10
+    assert spans["phi2"]["lane"] != spans["openrouter"]["lane"]
+    assert set(tracing.stats()) == {"phi2", "openrouter", "outside", "turn"}
+
+
+def test_chrome_trace_is_loadable(tmp_path):
+    path = tmp_path / "trace.json"
+    tracing.configure(export="chrome", path=str(path))
+    for _ in range(2):
+        with tracing.turn():
+            with tracing.span("whisper"):
+                pass
+            with pytest.raises(ValueError), tracing.span("tts"):
+                raise ValueError("no audio")
+
+    text = path.read_text()
+    assert text.startswith("[\n")
+    events = json.loads(text.rstrip().rstrip(",") + "]")  # what the viewer does with an open array
+    assert [event["name"] for event in events] == ["turn 1", "whisper", "tts", "turn 2", "whisper", "tts"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert events[2]["args"] == {"error": "ValueError"}
+
+
+def test_pipeline_stages_are_traced(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(export="jsonl", path=str(path))
+    spoken = []
+
+    async def speak(text):
+        spoken.append(text)
+
+    backends = pipeline.Backends(
+        classify=lambda text: {"intent": "get_weather", "task": None, "due": None, "location": "Paris"},
+        respond=lambda text: "unused",
+        add_task=None,
+        get_weather=lambda location: f"Sunny in {location}.",
+        speak=speak,
+    )
+
+    async def one_turn():
+        with tracing.turn():
+            return await pipeline.handle_turn("weather in paris", backends)
+
+    assert asyncio.run(one_turn())["response"] == "Sunny in Paris."
+    record = json.loads(path.read_text())
+    assert record["intent"] == "get_weather"
+    names = [span["name"] for span in record["spans"]]
+    assert {"intent", "handler.get_weather", "tts"} <= set(names)
+    assert names.index("intent") < names.index("handler.get_weather") < names.index("tts")
+
+
+def test_metrics_endpoint():
+    tracing.configure(stats=True)
+    with tracing.span("whisper"):
+        pass
+    port = free_port()
+    server = tracing.serve_metrics(port)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            metrics = json.load(response)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert metrics["whisper"]["count"] == 1
+    assert set(metrics["whisper"]) == {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}
+    assert "whisper" in tracing.format_stats()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Tests for the resident Whisper transcription engine.
+Uses a fake model whose load step sleeps, so no weights or torch are needed.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from transcriber import QueueFull, TranscriptionEngine, TranscriptionWorker, pin_torch_threads
+
+LOAD_DELAY = 0.2
+DECODE_DELAY = 0.01
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, language=None, **options):
+        time.sleep(DECODE_DELAY)
+        self.calls.append((audio, language, options))
+        return {"text": " hello there", "segments": []}
+
+
+class CountingLoader:
+    def __init__(self):
+        self.loads = 0
+
+    def __call__(self, model_name, device=None):
+        self.loads += 1
+        time.sleep(LOAD_DELAY)
+        return FakeModel()
+
+
+def reload_per_call_transcribe(loader, path):
+    """The previous behaviour: load the model inside every call."""
+    model = loader("small")
+    return model.transcribe(path, language="en")
+
+
+def test_model_loaded_once():
+    loader = CountingLoader()
+    engine = TranscriptionEngine(loader=loader)
+    assert not engine.loaded
+    for _ in range(3):
+        assert engine.transcribe("command.wav")["text"] == " hello there"
+    assert loader.loads == 1
+    assert engine.loaded
+    assert engine.load_seconds >= LOAD_DELAY
+
+
+def test_concurrent_first_use_loads_once():
+    loader = CountingLoader()
+    engine = TranscriptionEngine(loader=loader)
+    threads = [threading.Thread(target=engine.transcribe, args=("command.wav",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loader.loads == 1
+
+
+def test_fp16_defaults_off_on_cpu_and_can_be_forced():
+    engine = TranscriptionEngine(loader=CountingLoader())
+    engine.transcribe("command.wav")
+    assert engine.model.calls[-1][2]["fp16"] is False
+
+    forced = TranscriptionEngine(fp16=True, loader=CountingLoader())
+    forced.transcribe("command.wav")
+    assert forced.model.calls[-1][2]["fp16"] is True
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("WHISPER_MODEL", "tiny")
+    monkeypatch.setenv("WHISPER_DEVICE", "cpu")
+    monkeypatch.setenv("WHISPER_FP16", "0")
+    engine = TranscriptionEngine.from_env(loader=CountingLoader())
+    assert (engine.model_name, engine.device, engine.fp16) == ("tiny", "cpu", False)
+
+
+def test_warm_up_moves_load_off_first_command():
+    loader = CountingLoader()
+    engine = TranscriptionEngine(loader=loader)
+    engine.load()
+    engine.warm_up(seconds=0.1)
+
+    start = time.perf_counter()
+    engine.transcribe("command.wav")
+    first_command = time.perf_counter() - start
+    assert first_command < LOAD_DELAY
+    assert loader.loads == 1
+
+
+def test_resident_engine_saves_load_time_on_later_calls():
+    calls = 5
+
+    loader = CountingLoader()
+    start = time.perf_counter()
+    for _ in range(calls):
+        reload_per_call_transcribe(loader, "command.wav")
+    reload_total = time.perf_counter() - start
+
+    engine = TranscriptionEngine(loader=CountingLoader())
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        engine.transcribe("command.wav")
+        timings.append(time.perf_counter() - start)
+    resident_total = sum(timings)
+
+    # Only the first call pays the load; every later call skips it entirely.
+    assert timings[0] >= LOAD_DELAY
+    assert max(timings[1:]) < LOAD_DELAY
+    assert reload_total - resident_total >= (calls - 1) * LOAD_DELAY * 0.9
+
+
+class BatchModel:
+    """Batched stand-in: each clip's text is its length; decoding can be held until released."""
+
+    def __init__(self, release=None):
+        self.batches = []
+        self.release = release
+
+    def transcribe_batch(self, clips, language=None):
+        if self.release is not None:
+            self.release.wait(5)
+        self.batches.append([len(clip) for clip in clips])
+        return [{"text": str(len(clip))} for clip in clips]
+
+
+def clip(samples):
+    return np.zeros(samples, dtype=np.float32)
+
+
+def worker_for(model, **kwargs):
+    return TranscriptionWorker(TranscriptionEngine(loader=lambda name, device: model), **kwargs)
+
+
+def test_worker_batches_clips_by_length():
+    release = threading.Event()
+    model = BatchModel(release)
+    worker = worker_for(model, max_batch=3, batch_wait_ms=50)
+    busy = worker.submit(clip(100))  # holds the worker while the rest queue up
+    time.sleep(0.1)
+    lengths = [16000, 160000, 20000, 150000, 18000, 170000]
+    futures = [worker.submit(clip(n)) for n in lengths]
+    release.set()
+    assert [future.result(5)["text"] for future in futures] == [str(n) for n in lengths]
+    assert busy.result(5)["text"] == "100"
+    # Short commands go together, then the long clips, rather than in arrival order
+    assert model.batches[1:] == [[16000, 18000, 20000], [160000, 150000, 170000]]
+    assert worker.stats()["batches"] == 3
+    worker.shutdown()
+
+
+def test_worker_sheds_load_when_the_queue_is_full():
+    release = threading.Event()
+    worker = worker_for(BatchModel(release), max_batch=1, max_queued=1, batch_wait_ms=0)
+    running = worker.submit(clip(100))
+    time.sleep(0.05)
+    queued = worker.submit(clip(200))
+    with pytest.raises(QueueFull):
+        worker.submit(clip(300))
+    release.set()
+    assert running.result(5)["text"] == "100" and queued.result(5)["text"] == "200"
+    assert worker.stats()["rejected"] == 1
+
+    release.clear()
+    newest_first = worker_for(BatchModel(release), max_batch=1, max_queued=1, batch_wait_ms=0, shed="oldest")
+    newest_first.submit(clip(100))
+    time.sleep(0.05)
+    stale = newest_first.submit(clip(200))
+    fresh = newest_first.submit(clip(300))
+    with pytest.raises(QueueFull):
+        stale.result(1)
+    release.set()
+    assert fresh.result(5)["text"] == "300"
+    assert newest_first.stats()["dropped"] == 1
+    worker.shutdown()
+    newest_first.shutdown()
+
+
+def test_engine_decodes_one_at_a_time_without_batched_decoding():
+    engine = TranscriptionEngine(loader=CountingLoader())
+    results = engine.transcribe_batch([clip(10), clip(20)])
+    assert [r["text"] for r in results] == [" hello there"] * 2
+    assert len(engine.model.calls) == 2
+    assert pin_torch_threads(None) is False
+
+
+class ExclusiveModel:
+    """Fails if two decodes overlap on it, as Whisper's kv-cache hooks would."""
+
+    def __init__(self):
+        self.in_use = threading.Lock()
+        self.decoded = 0
+
+    def transcribe(self, audio, language=None, **options):
+        if not self.in_use.acquire(blocking=False):
+            raise RuntimeError("concurrent decode on one model")
+        try:
+            time.sleep(0.05)
+            self.decoded += 1
+            return {"text": str(len(audio))}
+        finally:
+            self.in_use.release()
+
+
+def test_workers_decode_in_parallel_on_their_own_models():
+    models = []
+
+    def loader(name, device):
+        models.append(ExclusiveModel())
+        return models[-1]
+
+    worker = TranscriptionWorker(TranscriptionEngine(loader=loader), workers=3, max_batch=1, batch_wait_ms=0)
+    start = time.perf_counter()
+    futures = [worker.submit(clip(100 + i)) for i in range(9)]
+    assert [future.result(5)["text"] for future in futures] == [str(100 + i) for i in range(9)]
+    assert time.perf_counter() - start < 9 * 0.05  # not one decode at a time
+    assert len(models) == 3 and sum(model.decoded for model in models) == 9
+    worker.shutdown()
+
+    # Callers sharing one engine (a worker, a streaming transcriber) take turns on its model
+    engine = TranscriptionEngine(loader=loader)
+    errors = []
+
+    def decode():
+        try:
+            engine.transcribe(clip(10))
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=decode) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [] and engine.model.decoded == 4
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk TTS phrase cache, with a fake synthesiser that counts network calls.
+"""
+
+import asyncio
+import os
+
+from tts_cache import TTSCache, prewarm
+
+
+class FakeSynth:
+    def __init__(self):
+        self.calls = []
+
+    async def synthesize(self, text, voice):
+        self.calls.append((text, voice))
+        return f"{voice}:{text}".encode() * 10
+
+    async def stream(self, text, voice):
+        self.calls.append((text, voice))
+        audio = f"{voice}:{text}".encode() * 10
+        for i in range(0, len(audio), 16):
+            yield audio[i:i + 16]
+
+
+async def collect(aiter):
+    return b"".join([chunk async for chunk in aiter])
+
+
+def test_hit_skips_synthesis_and_counts(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    synth = FakeSynth()
+    first = asyncio.run(cache.synthesize("Goodbye.", "voice-a", synth.synthesize))
+    second = asyncio.run(cache.synthesize("Goodbye.", "voice-a", synth.synthesize))
+    assert first == second
+    assert len(synth.calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_key_includes_voice_and_format(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    assert cache.key("Hi", "voice-a") != cache.key("Hi", "voice-b")
+    other_format = TTSCache(str(tmp_path), audio_format="riff-24khz-16bit-mono-pcm")
+    assert cache.key("Hi", "voice-a") != other_format.key("Hi", "voice-a")
+
+
+def test_stream_passes_chunks_through_and_stores_complete_clips(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    synth = FakeSynth()
+    streamed = asyncio.run(collect(cache.stream("You have no tasks.", "v", synth.stream)))
+    cached = asyncio.run(collect(cache.stream("You have no tasks.", "v", synth.stream)))
+    assert streamed == cached
+    assert len(synth.calls) == 1
+
+
+def test_interrupted_stream_is_not_stored(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    synth = FakeSynth()
+
+    async def play_first_chunk_only():
+        stream = cache.stream("A long reply.", "v", synth.stream)
+        async for _ in stream:
+            break
+        await stream.aclose()
+
+    asyncio.run(play_first_chunk_only())
+    assert ("A long reply.", "v") not in cache
+
+
+def test_lru_eviction_respects_size_cap(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    for phrase in ("one", "two", "three"):
+        cache.put(phrase, "v", b"x" * 100)
+    # Cap of 250 bytes holds two clips; "one" was least recently used.
+    assert ("one", "v") not in cache
+    assert cache.get("two", "v") is not None  # touch "two"
+    cache.put("four", "v", b"x" * 100)
+    assert ("three", "v") not in cache
+    assert ("two", "v") in cache and ("four", "v") in cache
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] == 200
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 2
+
+
+def test_index_and_recency_survive_restart(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    cache.put("old", "v", b"x" * 100)
+    cache.put("new", "v", b"x" * 100)
+    os.utime(cache._path(cache.key("old", "v")), (1, 1))
+
+    reopened = TTSCache(str(tmp_path), max_bytes=250)
+    assert reopened.get("new", "v") == b"x" * 100
+    reopened.put("newest", "v", b"x" * 100)
+    assert ("old", "v") not in reopened
+
+
+def test_prewarm_renders_only_missing_phrases(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    synth = FakeSynth()
+    phrases = ["Goodbye.", "You have no tasks."]
+    assert asyncio.run(prewarm(cache, "v", phrases, synth.synthesize)) == 2
+    assert asyncio.run(prewarm(cache, "v", phrases, synth.synthesize)) == 0
+    assert len(synth.calls) == 2
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for sentence-streamed TTS, with a fake streaming LLM and a fake TTS.
+
+The harness measures time-to-first-audio: from the start of the turn until
+the first sentence begins playing.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import pipeline
+import tts
+
+REPLY = ("Greetings, traveller. The stars are kind tonight. "
+         "Rest well, and may your path be bright tomorrow.")
+TOKEN_DELAY = 0.01      # per token from the LLM
+SYNTH_PER_CHAR = 0.002  # synthesis cost per character
+PLAY_PER_CHAR = 0.003   # playback time per character
+
+
+async def fake_llm_stream(prompt):
+    for token in REPLY.split(" "):
+        await asyncio.sleep(TOKEN_DELAY)
+        yield token + " "
+
+
+class FakeTTS:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_audio = None
+        self.played = []
+        self.synthesised = []
+
+    async def synthesize(self, sentence):
+        await asyncio.sleep(SYNTH_PER_CHAR * len(sentence))
+        self.synthesised.append(sentence)
+        return f"<audio:{sentence}>"
+
+    async def play(self, audio, sentence):
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter() - self.start
+        assert audio == f"<audio:{sentence}>"
+        self.played.append(sentence)
+        await asyncio.sleep(PLAY_PER_CHAR * len(sentence))
+
+
+async def collect(aiter):
+    return [item async for item in aiter]
+
+
+def test_split_sentences_on_token_boundaries():
+    async def deltas():
+        for piece in ["Hello th", "ere. How", " are you", "? I am", " well! Fine"]:
+            yield piece
+
+    assert asyncio.run(collect(tts.split_sentences(deltas(), min_chars=1))) == [
+        "Hello there.", "How are you?", "I am well!", "Fine"]
+
+
+def test_split_sentences_joins_short_fragments():
+    sentences = asyncio.run(collect(tts.split_sentences(tts.iterate(["Ah. I see. That is fine. "]))))
+    assert sentences == ["Ah. I see. That is fine."]
+
+
+def test_speak_stream_plays_in_order_and_overlaps():
+    fake = FakeTTS()
+    sentences = ["One fine sentence.", "Two fine sentences.", "Three fine sentences."]
+    start = time.perf_counter()
+    played = asyncio.run(tts.speak_stream(tts.iterate(sentences), fake.synthesize, fake.play))
+    elapsed = time.perf_counter() - start
+    assert played == sentences == fake.played
+    serial = sum((SYNTH_PER_CHAR + PLAY_PER_CHAR) * len(s) for s in sentences)
+    assert elapsed < serial
+
+
+def test_speak_stream_surfaces_llm_errors_after_playing_what_arrived():
+    async def broken():
+        yield "A complete sentence here. "
+        raise RuntimeError("stream dropped")
+
+    fake = FakeTTS()
+    with pytest.raises(RuntimeError):
+        asyncio.run(tts.speak_stream(tts.split_sentences(broken()), fake.synthesize, fake.play))
+    assert fake.played == ["A complete sentence here."]
+
+
+def turn_time_to_first_audio(streaming):
+    fake = FakeTTS()
+
+    def respond(text):
+        time.sleep(TOKEN_DELAY * len(REPLY.split(" ")))
+        return REPLY
+
+    async def speak(text):
+        await fake.play(await fake.synthesize(text), text)
+
+    async def speak_stream(sentences):
+        return await tts.speak_stream(sentences, fake.synthesize, fake.play)
+
+    backends = pipeline.Backends(
+        classify=lambda text: {"intent": "conversation"},
+        respond=respond,
+        add_task=None,
+        get_weather=None,
+        speak=speak,
+        respond_stream=fake_llm_stream if streaming else None,
+        speak_stream=speak_stream if streaming else None,
+    )
+    turn = asyncio.run(pipeline.handle_turn("tell me something", backends))
+    assert turn["response"] == REPLY
+    return fake.first_audio, fake.played
+
+
+def test_streaming_cuts_time_to_first_audio():
+    whole, whole_played = turn_time_to_first_audio(streaming=False)
+    streamed, streamed_played = turn_time_to_first_audio(streaming=True)
+    assert whole_played == [REPLY]
+    assert len(streamed_played) == 3
+    assert " ".join(streamed_played) == REPLY
+    assert streamed < whole * 0.6
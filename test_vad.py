@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the energy-based voice-activity detector, using synthetic audio.
+"""
+
+import numpy as np
+
+from vad import EnergyVAD
+
+SAMPLE_RATE = 16000
+CHUNK = 1024
+
+
+def chunks_of(samples):
+    samples = np.clip(samples, -32768, 32767).astype(np.int16)
+    return [samples[i:i + CHUNK].tobytes() for i in range(0, len(samples) - CHUNK + 1, CHUNK)]
+
+
+def noise(seconds, level, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, level, int(SAMPLE_RATE * seconds))
+
+
+def tone(seconds, amplitude, freq=220.0):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return amplitude * np.sin(2 * np.pi * freq * t)
+
+
+def run(vad, samples):
+    return [vad.process(chunk) for chunk in chunks_of(samples)]
+
+
+def test_rms_matches_reference():
+    vad = EnergyVAD()
+    samples = tone(CHUNK / SAMPLE_RATE, 1000)
+    chunk = chunks_of(samples)[0]
+    reference = np.sqrt(np.mean(np.frombuffer(chunk, dtype=np.int16).astype(np.float64) ** 2))
+    assert abs(vad.rms(chunk) - reference) < 0.5
+    assert vad.rms(b"") == 0.0
+
+
+def test_detects_speech_and_silence():
+    vad = EnergyVAD(hangover_ms=0)
+    states = run(vad, np.concatenate([noise(1.0, 30), tone(1.0, 3000), noise(1.0, 30)]))
+
+    def chunk_at(seconds):
+        return int(seconds * SAMPLE_RATE) // CHUNK
+
+    assert not any(states[:chunk_at(1.0)])
+    assert all(states[chunk_at(1.0) + 1:chunk_at(2.0)])
+    assert not any(states[chunk_at(2.0) + 1:])
+
+
+def test_adaptive_floor_ignores_steady_background_noise():
+    # Background noise louder than the minimum threshold would trip a fixed detector.
+    background = noise(2.0, 600)
+    fixed = EnergyVAD(fixed_threshold=300)
+    assert any(run(fixed, background))
+
+    adaptive = EnergyVAD()
+    assert not any(run(adaptive, background))
+    assert adaptive.noise_floor > 400
+    # Speech over the same noise is still detected.
+    assert any(run(adaptive, background[:SAMPLE_RATE] + tone(1.0, 5000)))
+
+
+def test_hangover_bridges_short_gaps():
+    gap = np.concatenate([tone(0.5, 3000), noise(0.15, 30), tone(0.5, 3000)])
+    with_hangover = run(EnergyVAD(hangover_ms=300, calibration_ms=0), gap)
+    without = run(EnergyVAD(hangover_ms=0, calibration_ms=0), gap)
+    first_speech = with_hangover.index(True)
+    assert all(with_hangover[first_speech:])
+    assert not all(without[without.index(True):])
+
+
+def test_pre_roll_keeps_audio_before_onset():
+    vad = EnergyVAD(pre_roll_ms=200)
+    chunks = chunks_of(np.concatenate([noise(1.0, 30), tone(0.5, 3000)]))
+    for i, chunk in enumerate(chunks):
+        if vad.process(chunk):
+            break
+    pre_roll = vad.take_pre_roll()
+    assert len(pre_roll) == 3  # 200 ms of 64 ms chunks
+    assert pre_roll == chunks[i - 3:i]
+    assert vad.take_pre_roll() == []
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached weather service against the local OpenWeatherMap stub.
+Each test counts the requests that actually reached the "API".
+"""
+
+import threading
+
+import pytest
+
+import http_pool
+import weather_stub
+from weather_service import WeatherService
+
+API_KEY = "test-key"
+STUB = weather_stub
+
+
+def wait_for_refresh():
+    for thread in threading.enumerate():
+        if thread.name == "weather-refresh":
+            thread.join(5)
+
+
+@pytest.fixture(autouse=True)
+def no_refresh_in_flight():
+    # Autouse, so it runs before the stub reset: an earlier test's refresh can't land in this one's counts
+    wait_for_refresh()
+
+
+def make_service(client, clock, **kwargs):
+    return WeatherService(API_KEY, client=client, clock=clock, **kwargs)
+
+
+def test_geocoding_is_memoised(stub, client, clock):
+    service = make_service(client, clock)
+    for name in ["London", "london", "  LONDON "]:
+        assert service.geocode(name)["name"] == "London"
+    assert stub.calls["geocode"] == 1
+
+
+def test_conditions_are_cached_for_the_ttl(stub, client, clock):
+    service = make_service(client, clock, ttl=600)
+    first = service.describe("London")
+    assert first == "The weather in London is light rain with a temperature of 12.0°C."
+    clock.now += 599
+    assert service.describe("London") == first
+    assert stub.calls == {"geocode": 1, "weather": 1}
+
+
+def test_stale_entry_is_served_while_refreshing(stub, client, clock):
+    service = make_service(client, clock, ttl=600, max_stale=3600)
+    service.current("Paris")
+    stub.set_conditions("paris", 20.0, "clear sky")
+    clock.now += 601
+
+    assert service.current("Paris")["description"] == "light rain"  # answered from the stale entry
+    wait_for_refresh()
+    assert stub.calls["weather"] == 2
+    assert service.current("Paris") == {"temp": 20.0, "description": "clear sky"}
+    assert stub.calls["weather"] == 2
+    assert service.stats()["stale_hits"] == 1
+
+
+def test_entry_past_max_stale_is_refetched(stub, client, clock):
+    service = make_service(client, clock, ttl=600, max_stale=3600)
+    service.current("Tokyo")
+    stub.set_conditions("tokyo", 25.0, "few clouds")
+    clock.now += 3601
+    assert service.current("Tokyo")["temp"] == 25.0
+    assert stub.calls["weather"] == 2 and service.stats()["misses"] == 2
+
+
+def test_failed_refresh_keeps_serving_the_stale_entry(stub, client, clock):
+    service = make_service(client, clock, ttl=600)
+    service.current("London")
+    clock.now += 700
+    stub.fail_next(3)
+    assert service.current("London")["temp"] == 12.0
+    wait_for_refresh()
+    assert service.current("London")["temp"] == 12.0
+
+
+def test_unknown_city_is_looked_up_once(stub, client, clock):
+    service = make_service(client, clock)
+    assert service.describe("Atlantis") == "Could not fetch weather for Atlantis."
+    assert service.describe("Atlantis") == "Could not fetch weather for Atlantis."
+    assert stub.calls == {"geocode": 1}
+
+
+def test_prefetch_warms_favourite_and_frequent_locations(stub, client, clock):
+    service = make_service(client, clock, ttl=600, favourites=["Edinburgh"])
+    for city in ["London", "London", "London", "Paris", "Manchester"]:
+        service.current(city)
+    stub.calls.clear()
+
+    assert service.prefetch(limit=1) == ["edinburgh"]  # London is still fresh
+    clock.now += 400
+    assert service.prefetch(limit=1) == ["edinburgh", "london"]
+    assert stub.calls == {"geocode": 1, "weather": 3}
+
+    clock.now += 300  # past the TTL, but London was prefetched 300 s ago
+    stub.calls.clear()
+    service.current("London")
+    assert stub.calls == {}
+
+
+def test_get_weather_uses_the_cache(stub, server, monkeypatch):
+    import elven
+    import weather_service
+
+    monkeypatch.setattr(weather_service, "_services", {})
+    http_pool.configure("openweathermap", server, timeout=5)
+    try:
+        assert elven.get_weather("New York", api_key=API_KEY).startswith("The weather in New York is light rain")
+        elven.get_weather("New York", api_key=API_KEY)
+        assert stub.calls == {"geocode": 1, "weather": 1}
+    finally:
+        http_pool.configure("openweathermap", elven.OPENWEATHERMAP_API_URL, timeout=10)
@@ -0,0 +1,235 @@
+"""
+Local mirror of the user's Todoist tasks.
+
+"List my tasks" used to download the whole task collection on every query.
+The mirror does one full sync, then keeps itself current with incremental
+Sync API reads: each read sends the last sync_token and gets back only what
+changed. Queries are answered from memory. When the mirror is older than
+max_age, or the assistant has just added a task, it is refreshed in the
+background while the current answer comes from what is already there.
+
+Long lists are read out a page at a time: "you have 23 tasks, here are the
+first 5 ... say 'more tasks' to hear the next 5".
+
+Configuration:
+    TODOIST_MIRROR_MAX_AGE  seconds before a background refresh (default 60)
+    TODOIST_PAGE_SIZE       tasks read out per page (default 5)
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+import http_pool
+import todoist_queue
+
+logger = logging.getLogger(__name__)
+
+_RELATIVE_DAYS = {"today": 0, "tonight": 0, "this morning": 0, "this afternoon": 0,
+                  "this evening": 0, "tomorrow": 1}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+class TaskMirror:
+    """In-memory copy of the user's active tasks and projects, synced incrementally."""
+
+    def __init__(self, token=None, client=None, max_age=60.0, page_size=5,
+                 clock=time.time, today=datetime.date.today):
+        """
+        Args:
+            token (str|None): Todoist API token
+            client (ServiceClient|None): defaults to the shared "todoist" client
+            max_age (float): seconds after a sync before a query triggers a refresh
+            page_size (int): tasks read out per page
+            clock (callable): time source for max_age
+            today (callable): returns today's date, for the due filters
+        """
+        self.token = token
+        self.client = client
+        self.max_age = max_age
+        self.page_size = page_size
+        self.clock = clock
+        self.today = today
+        self.items = {}      # id -> item, active tasks only
+        self.projects = {}   # id -> name
+        self.sync_token = "*"
+        self.synced_at = None
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self._dirty = False
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._refresher = None
+        self._cursor = None  # (tasks, next offset, description) of the last list read out
+
+    def sync(self):
+        """Fetch what changed since the last sync (everything on the first call)."""
+        with self._sync_lock:
+            with self._lock:
+                invalidations = self._invalidations
+            client = self.client or http_pool.get_client("todoist")
+            response = client.post(
+                todoist_queue.SYNC_PATH,
+                headers={"Authorization": f"Bearer {self.token}"},
+                data={"sync_token": self.sync_token, "resource_types": json.dumps(["items", "projects"])},
+            )
+            response.raise_for_status()
+            result = response.json()
+            with self._lock:
+                if result.get("full_sync"):
+                    self.items.clear()
+                    self.projects.clear()
+                    self.full_syncs += 1
+                else:
+                    self.incremental_syncs += 1
+                for item in result.get("items", []):
+                    if item.get("checked") or item.get("is_deleted"):
+                        self.items.pop(item["id"], None)
+                    else:
+                        self.items[item["id"]] = item
+                for project in result.get("projects", []):
+                    if project.get("is_deleted"):
+                        self.projects.pop(project["id"], None)
+                    else:
+                        self.projects[project["id"]] = project["name"]
+                self.sync_token = result["sync_token"]
+                self.synced_at = self.clock()
+                # A change made while the request was out may not be in its response
+                if self._invalidations == invalidations:
+                    self._dirty = False
+
+    def invalidate(self, *_):
+        """Mark the mirror out of date (e.g. the assistant added a task) and refresh it."""
+        with self._lock:
+            self._invalidations += 1
+            self._dirty = True
+        self.refresh_in_background()
+
+    def refresh_in_background(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return self._refresher
+
+        def refresh():
+            try:
+                self.sync()
+                # Invalidated during that sync: its answer may predate the change
+                while self._dirty:
+                    self.sync()
+            except Exception as e:
+                logger.error("Todoist mirror refresh failed: %s", e)
+
+        self._refresher = threading.Thread(target=refresh, name="todoist-mirror", daemon=True)
+        self._refresher.start()
+        return self._refresher
+
+    def ensure_fresh(self):
+        """Block only for the very first sync; after that, refresh behind the current answer."""
+        if self.synced_at is None:
+            self.sync()
+        elif self._dirty or self.clock() - self.synced_at >= self.max_age:
+            self.refresh_in_background()
+
+    def _due_date(self, item):
+        due = item.get("due") or {}
+        if due.get("date"):
+            return datetime.date.fromisoformat(due["date"][:10])
+        days = _RELATIVE_DAYS.get((due.get("string") or "").lower())
+        return self.today() + datetime.timedelta(days=days) if days is not None else None
+
+    def _matches_due(self, item, due):
+        date = self._due_date(item)
+        today = self.today()
+        if due in _RELATIVE_DAYS:
+            return date == today + datetime.timedelta(days=_RELATIVE_DAYS[due])
+        if due == "overdue":
+            return date is not None and date < today
+        if due == "this week":
+            return date is not None and today <= date < today + datetime.timedelta(days=7 - today.weekday())
+        if due == "next week":
+            start = today + datetime.timedelta(days=7 - today.weekday())
+            return date is not None and start <= date < start + datetime.timedelta(days=7)
+        if due in WEEKDAYS:
+            return date is not None and date.weekday() == WEEKDAYS.index(due) and date >= today
+        return ((item.get("due") or {}).get("string") or "").lower() == due
+
+    def tasks(self, due=None, project=None, extra=()):
+        """
+        Active tasks, soonest due first, optionally filtered.
+
+        Args:
+            due (str|None): "today", "tomorrow", "overdue", "this week", "next week", a weekday, ...
+            project (str|None): project name (case-insensitive)
+            extra (iterable): tasks not in Todoist yet (e.g. still queued), in the same shape
+        """
+        self.ensure_fresh()
+        with self._lock:
+            items = list(self.items.values())
+            project_ids = None
+            if project:
+                project_ids = {pid for pid, name in self.projects.items() if name.lower() == project.lower()}
+        items += [dict(item, project_id=item.get("project_id") or self._inbox_id()) for item in extra]
+        if due:
+            items = [item for item in items if self._matches_due(item, due.lower())]
+        if project_ids is not None:
+            items = [item for item in items if item.get("project_id") in project_ids]
+        undated = datetime.date.max
+        return sorted(items, key=lambda item: self._due_date(item) or undated)
+
+    def _inbox_id(self):
+        return next((pid for pid, name in self.projects.items() if name == "Inbox"), None)
+
+    def speak(self, due=None, project=None, more=False, extra=()):
+        """
+        Spoken answer for a task query, one page at a time. With more=True,
+        continue the last list read out.
+        """
+        if more and self._cursor is not None:
+            tasks, offset, description = self._cursor
+        else:
+            tasks = self.tasks(due, project, extra)
+            offset = 0
+            description = " ".join(filter(None, [f"due {due}" if due and due != "overdue" else due,
+                                                 f"in {project}" if project else None]))
+        if not tasks:
+            self._cursor = None
+            return f"You have no tasks {description}.".replace(" .", ".")
+        if more and offset >= len(tasks):
+            self._cursor = None
+            return "That's all of your tasks."
+
+        page = tasks[offset:offset + self.page_size]
+        end = offset + len(page)
+        names = ", ".join(task["content"] for task in page)
+        if len(tasks) <= self.page_size:
+            text = f"Your tasks {description}: {names}." if description else f"Your tasks are: {names}"
+        elif offset == 0:
+            label = f"{len(tasks)} tasks {description}".rstrip()
+            text = f"You have {label}. Here are the first {len(page)}: {names}."
+        else:
+            text = f"Tasks {offset + 1} to {end} of {len(tasks)}: {names}."
+        self._cursor = (tasks, end, description)
+        if end < len(tasks):
+            text += f" Say \"more tasks\" to hear the next {min(self.page_size, len(tasks) - end)}."
+        return text
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror(token=None):
+    """Return the process-wide mirror, refreshed whenever the write-behind queue syncs a task."""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = TaskMirror(token=token or os.getenv("TODOIST_API_TOKEN"),
+                                 max_age=float(os.getenv("TODOIST_MIRROR_MAX_AGE", "60")),
+                                 page_size=int(os.getenv("TODOIST_PAGE_SIZE", "5")))
+            queue = todoist_queue.get_queue(token)
+            if queue is not None:
+                queue.on_synced = _mirror.invalidate
+    return _mirror
@@ -0,0 +1,308 @@
+"""
+Write-behind queue for Todoist task additions.
+
+add_todoist_task used to block on a POST while the user waited, and failed
+outright when the network was slow or down. Tasks are now written to a local
+SQLite queue first, which lets the assistant confirm at once. A background
+worker flushes the queue to Todoist in batches through the Sync API.
+
+Every queued task carries a command uuid that is stored with it. Todoist
+ignores a command whose uuid it has already applied, so a batch can be
+resent safely after a timeout, a lost response or a crash between sending
+and recording the result. Nothing is ever added twice. Transient failures
+(network errors, 429/5xx) are retried with exponential backoff; tasks that
+Todoist rejects outright, or whose request it refuses with another 4xx (a
+bad token, say), are marked failed and kept for inspection.
+
+Configuration:
+    TODOIST_QUEUE       "0" adds tasks synchronously over REST (default "1")
+    TODOIST_QUEUE_DB    SQLite file for the queue (default "todoist_queue.db")
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+import http_pool
+
+logger = logging.getLogger(__name__)
+
+SYNC_PATH = "/sync/v9/sync"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uuid TEXT NOT NULL UNIQUE,
+    temp_id TEXT NOT NULL,
+    content TEXT NOT NULL,
+    due_string TEXT,
+    created_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    task_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_pending ON tasks (status, next_attempt);
+"""
+
+
+class TodoistQueue:
+    """Durable queue of task additions, synced to Todoist in batches."""
+
+    def __init__(self, path="todoist_queue.db", token=None, client=None, batch_size=50,
+                 batch_delay=0.2, retry_base=1.0, max_backoff=300.0, clock=time.time, on_synced=None):
+        """
+        Args:
+            path (str): SQLite database file (":memory:" for a throwaway queue)
+            token (str|None): Todoist API token
+            client (ServiceClient|None): defaults to the shared "todoist" client
+            batch_size (int): most commands sent in one sync request
+            batch_delay (float): seconds the worker waits after a new task, so
+                                 tasks added in quick succession share a request
+            retry_base (float): first retry delay; doubles per failed attempt
+            max_backoff (float): cap on the retry delay
+            clock (callable): time source for scheduling retries
+            on_synced (callable|None): called with the number of tasks after
+                                       Todoist confirms a batch
+        """
+        self.path = path
+        self.token = token
+        self.client = client
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.retry_base = retry_base
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.on_synced = on_synced
+        self.synced = 0
+        self.failed = 0
+        self.requests = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")  # a confirmed task survives power loss
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._worker = None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # One commit (and one fsync) per batch rather than per row
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def enqueue(self, content, due_string=None):
+        """Durably queue a task and return its command uuid. Returns once it is on disk."""
+        command_uuid = str(uuid.uuid4())
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO tasks (uuid, temp_id, content, due_string, created_at) VALUES (?, ?, ?, ?, ?)",
+                (command_uuid, str(uuid.uuid4()), content, due_string, self.clock()),
+            )
+        self._wake.set()
+        return command_uuid
+
+    def pending(self):
+        """Queued tasks not yet confirmed by Todoist, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT content, due_string FROM tasks WHERE status = 'pending' ORDER BY id").fetchall()
+        return [{"content": content, "due_string": due} for content, due in rows]
+
+    def failures(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT content, error FROM tasks WHERE status = 'failed' ORDER BY id").fetchall()
+
+    def _ready_batch(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, uuid, temp_id, content, due_string, attempts FROM tasks "
+                "WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?",
+                (self.clock(), self.batch_size),
+            ).fetchall()
+
+    def _commands(self, rows):
+        commands = []
+        for _, command_uuid, temp_id, content, due_string, _ in rows:
+            args = {"content": content}
+            if due_string:
+                args["due"] = {"string": due_string}
+            commands.append({"type": "item_add", "uuid": command_uuid, "temp_id": temp_id, "args": args})
+        return commands
+
+    def _retry_later(self, rows, error):
+        now = self.clock()
+        with self._transaction():
+            for row_id, _, _, _, _, attempts in rows:
+                delay = min(self.max_backoff, self.retry_base * 2 ** attempts)
+                self._db.execute(
+                    "UPDATE tasks SET attempts = attempts + 1, next_attempt = ?, error = ? WHERE id = ?",
+                    (now + delay, error, row_id),
+                )
+
+    def _fail(self, rows, error):
+        with self._transaction():
+            for row in rows:
+                self._db.execute("UPDATE tasks SET status = 'failed', error = ? WHERE id = ?", (error, row[0]))
+        self.failed += len(rows)
+
+    def flush_once(self):
+        """
+        Send one batch of ready tasks.
+
+        Returns:
+            int: tasks settled in this batch, confirmed or permanently
+                 rejected (0 if none were ready or the request failed and
+                 was rescheduled)
+        """
+        rows = self._ready_batch()
+        if not rows:
+            return 0
+        client = self.client or http_pool.get_client("todoist")
+        self.requests += 1
+        try:
+            response = client.post(
+                SYNC_PATH,
+                headers={"Authorization": f"Bearer {self.token}"},
+                data={"commands": json.dumps(self._commands(rows))},
+            )
+        except requests.RequestException as e:
+            self._retry_later(rows, str(e))
+            return 0
+        if response.status_code != 200:
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code == 429 or response.status_code >= 500:
+                self._retry_later(rows, error)
+                return 0
+            # Resending won't help (401/403 mean the token is wrong); don't retry forever
+            logger.error("Todoist refused the sync request, %d task(s) not added: %s", len(rows), error)
+            self._fail(rows, error)
+            return len(rows)
+
+        result = response.json()
+        status = result.get("sync_status", {})
+        mapping = result.get("temp_id_mapping", {})
+        confirmed = rejected = 0
+        retry = []
+        with self._transaction():
+            for row in rows:
+                row_id, command_uuid, temp_id = row[0], row[1], row[2]
+                outcome = status.get(command_uuid)
+                if outcome == "ok":
+                    self._db.execute("UPDATE tasks SET status = 'synced', task_id = ?, error = NULL WHERE id = ?",
+                                     (mapping.get(temp_id), row_id))
+                    confirmed += 1
+                elif isinstance(outcome, dict) and 400 <= outcome.get("http_code", 500) < 500 \
+                        and outcome.get("http_code") != 429:
+                    # Todoist will never accept this one; keep it for inspection
+                    self._db.execute("UPDATE tasks SET status = 'failed', error = ? WHERE id = ?",
+                                     (json.dumps(outcome), row_id))
+                    rejected += 1
+                else:
+                    retry.append(row)
+        if retry:
+            self._retry_later(retry, "command not applied")
+        self.synced += confirmed
+        self.failed += rejected
+        if confirmed and self.on_synced is not None:
+            self.on_synced(confirmed)
+        return confirmed + rejected
+
+    def flush(self):
+        """Send batches until nothing is ready. Returns the number of tasks confirmed."""
+        before = self.synced
+        while self.flush_once():
+            pass
+        return self.synced - before
+
+    def _next_wakeup(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(next_attempt) FROM tasks WHERE status = 'pending'").fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - self.clock())
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(timeout=self._next_wakeup())
+            self._wake.clear()
+            if self._stopping.wait(self.batch_delay):
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Todoist sync failed: %s", e)
+                self._stopping.wait(self.retry_base)
+
+    def start(self):
+        """Start the background worker; tasks left over from a previous run are sent first."""
+        if self._worker is None or not self._worker.is_alive():
+            self._stopping.clear()
+            self._worker = threading.Thread(target=self._run, name="todoist-sync", daemon=True)
+            self._worker.start()
+            self._wake.set()
+        return self
+
+    def stop(self, flush=True, timeout=5.0):
+        """Stop the worker, by default trying one last flush. Unsent tasks stay queued."""
+        self._stopping.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+        if flush:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Todoist sync failed: %s", e)
+
+    def close(self):
+        self.stop(flush=False)
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        return {
+            "pending": counts.get("pending", 0),
+            "synced": counts.get("synced", 0),
+            "failed": counts.get("failed", 0),
+            "requests": self.requests,
+        }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue(token=None):
+    """Return the process-wide queue with its worker running, or None if disabled."""
+    global _queue
+    if os.getenv("TODOIST_QUEUE", "1") == "0":
+        return None
+    with _queue_lock:
+        if _queue is None:
+            _queue = TodoistQueue(os.getenv("TODOIST_QUEUE_DB", "todoist_queue.db"),
+                                  token=token or os.getenv("TODOIST_API_TOKEN"))
+            _queue.start()
+            atexit.register(_queue.stop)
+    return _queue
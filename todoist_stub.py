@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Todoist endpoints Elven uses, for offline testing.
+
+Implements:
+    POST /sync/v9/sync     batched commands (item_add, item_close) with the
+                           real API's uuid de-duplication and temp_id mapping,
+                           and full or incremental (sync_token) reads of
+                           items and projects
+    GET  /rest/v2/tasks    active tasks
+    POST /rest/v2/tasks    add one task
+
+Faults can be injected to test retries and crash recovery: fail_next()
+answers the next requests with an error status, and lose_next_response()
+applies the next sync but drops its response, as if the connection broke.
+
+Usage:
+    python3 todoist_stub.py [--port 8001]
+    # then point Elven at it with TODOIST_API_URL=http://localhost:8001
+"""
+
+import argparse
+import datetime
+import json
+import threading
+import uuid as uuid_module
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class TodoistStub:
+    """In-memory Todoist account state, shared by the stub's endpoints."""
+
+    def __init__(self, token=None):
+        self.token = token
+        self.tasks = {}            # id -> task dict, in creation order
+        self.projects = {"2000": "Inbox"}
+        self.changes = {}          # id -> change sequence number, for incremental reads
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self._seq = 0
+        self.command_status = {}   # uuid -> "ok" or error dict, like Todoist's sync_status
+        self.temp_ids = {}         # temp_id -> id
+        self.sync_batches = []     # number of commands in each sync request
+        self._next_id = 1000
+        self._failures = []        # status codes for the next requests
+        self._lose_responses = 0
+        self._lock = threading.Lock()
+
+    def fail_next(self, count=1, status=503):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def lose_next_response(self, count=1):
+        with self._lock:
+            self._lose_responses += count
+
+    def reset(self):
+        self.__init__(self.token)
+
+    def _take_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def _touch(self, task_id):
+        self._seq += 1
+        self.changes[task_id] = self._seq
+
+    def _add(self, content, due_string=None, due_date=None, project_id=None):
+        self._next_id += 1
+        task = {"id": str(self._next_id), "content": content, "is_completed": False, "due": None,
+                "project_id": project_id or "2000"}
+        if due_string or due_date:
+            task["due"] = {"string": due_string or due_date, "date": due_date or _resolve_date(due_string)}
+        self.tasks[task["id"]] = task
+        self._touch(task["id"])
+        return task
+
+    def add_task(self, content, due_string=None, due_date=None, project=None):
+        """Add a task directly, as if from another Todoist client. Returns the task."""
+        with self._lock:
+            project_id = None
+            if project:
+                project_id = next((pid for pid, name in self.projects.items() if name == project), None)
+                if project_id is None:
+                    project_id = str(3000 + len(self.projects))
+                    self.projects[project_id] = project
+            return dict(self._add(content, due_string, due_date, project_id))
+
+    def complete_task(self, task_id):
+        with self._lock:
+            self.tasks[task_id]["is_completed"] = True
+            self._touch(task_id)
+
+    def read(self, sync_token, resource_types):
+        """Items and projects changed since sync_token ("*" for everything)."""
+        with self._lock:
+            since = 0 if sync_token in (None, "*") else int(sync_token.split("-")[-1])
+            if since:
+                self.incremental_syncs += 1
+            else:
+                self.full_syncs += 1
+            response = {"sync_token": f"stub-{self._seq}", "full_sync": not since}
+            if "items" in resource_types or "all" in resource_types:
+                response["items"] = [
+                    {"id": t["id"], "content": t["content"], "project_id": t["project_id"], "due": t["due"],
+                     "checked": t["is_completed"], "is_deleted": False}
+                    for t in self.tasks.values()
+                    if self.changes[t["id"]] > since and (since or not t["is_completed"])
+                ]
+            if "projects" in resource_types or "all" in resource_types:
+                response["projects"] = [{"id": pid, "name": name} for pid, name in self.projects.items()]
+            return response
+
+    def sync(self, commands):
+        """Apply commands; a uuid that was already applied is acknowledged, not repeated."""
+        with self._lock:
+            self.sync_batches.append(len(commands))
+            status = {}
+            mapping = {}
+            for command in commands:
+                command_uuid = command.get("uuid")
+                if command_uuid in self.command_status:
+                    status[command_uuid] = self.command_status[command_uuid]
+                    if command.get("temp_id") in self.temp_ids:
+                        mapping[command["temp_id"]] = self.temp_ids[command["temp_id"]]
+                    continue
+                result = self._apply(command, mapping)
+                status[command_uuid] = result
+                self.command_status[command_uuid] = result
+            lose = self._lose_responses > 0
+            self._lose_responses -= lose
+        return {"sync_status": status, "temp_id_mapping": mapping,
+                "sync_token": f"stub-{self._seq}", "full_sync": False}, lose
+
+    def _apply(self, command, mapping):
+        args = command.get("args") or {}
+        if command.get("type") == "item_add":
+            if not (args.get("content") or "").strip():
+                return {"error_code": 15, "error": "Invalid argument value", "http_code": 400}
+            due = args.get("due") or {}
+            task = self._add(args["content"], due.get("string"), due.get("date"), args.get("project_id"))
+            if command.get("temp_id"):
+                self.temp_ids[command["temp_id"]] = task["id"]
+                mapping[command["temp_id"]] = task["id"]
+            return "ok"
+        if command.get("type") == "item_close":
+            task = self.tasks.get(str(args.get("id")))
+            if task is None:
+                return {"error_code": 22, "error": "Item not found", "http_code": 404}
+            task["is_completed"] = True
+            self._touch(task["id"])
+            return "ok"
+        return {"error_code": 500, "error": "Unknown command", "http_code": 400}
+
+    def active_tasks(self):
+        with self._lock:
+            return [dict(t) for t in self.tasks.values() if not t["is_completed"]]
+
+
+def _resolve_date(due_string):
+    """The few natural-language due strings the stub understands."""
+    today = datetime.date.today()
+    offsets = {"today": 0, "tonight": 0, "tomorrow": 1}
+    if due_string and due_string.lower() in offsets:
+        return (today + datetime.timedelta(days=offsets[due_string.lower()])).isoformat()
+    return None
+
+
+def create_app(stub):
+    app = FastAPI(title="Todoist stub")
+
+    def rejected(request):
+        status = stub._take_failure()
+        if status is not None:
+            return JSONResponse({"error": "injected failure"}, status_code=status)
+        if stub.token and request.headers.get("authorization") != f"Bearer {stub.token}":
+            return JSONResponse({"error": "Unauthorized"}, status_code=401)
+        return None
+
+    @app.post("/sync/v9/sync")
+    async def sync(request: Request):
+        error = rejected(request)
+        if error is not None:
+            return error
+        body = (await request.body()).decode("utf-8")
+        if request.headers.get("content-type", "").startswith("application/json"):
+            form = json.loads(body or "{}")
+        else:
+            form = {key: values[0] for key, values in parse_qs(body).items()}
+        fields = {key: json.loads(value) if key in ("commands", "resource_types") and isinstance(value, str)
+                  else value for key, value in form.items()}
+        response, lose = {}, False
+        if fields.get("commands"):
+            response, lose = stub.sync(fields["commands"])
+        if fields.get("resource_types"):
+            response.update(stub.read(fields.get("sync_token", "*"), fields["resource_types"]))
+        if lose:
+            return JSONResponse({"error": "connection reset"}, status_code=502)
+        return response
+
+    @app.get("/rest/v2/tasks")
+    def list_tasks(request: Request):
+        return rejected(request) or stub.active_tasks()
+
+    @app.post("/rest/v2/tasks")
+    async def add_task(request: Request):
+        error = rejected(request)
+        if error is not None:
+            return error
+        data = await request.json()
+        command_uuid, temp_id = str(uuid_module.uuid4()), str(uuid_module.uuid4())
+        due = {"string": data["due_string"]} if data.get("due_string") else None
+        response, _ = stub.sync([{"type": "item_add", "uuid": command_uuid, "temp_id": temp_id,
+                                  "args": {"content": data.get("content", ""), "due": due}}])
+        status = response["sync_status"][command_uuid]
+        if status != "ok":
+            return JSONResponse(status, status_code=status["http_code"])
+        return stub.tasks[response["temp_id_mapping"][temp_id]]
+
+    return app
+
+
+stub = TodoistStub()
+app = create_app(stub)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Todoist API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+    print(f"🗂️  Todoist stub on http://{args.host}:{args.port} (sync: /sync/v9/sync, REST: /rest/v2/tasks)")
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Per-stage latency tracing for assistant turns.
+
+Wrap each stage of a turn in a span:
+
+    with tracing.turn():
+        with tracing.span("whisper"):
+            text = transcribe(...)
+        with tracing.span("phi2"):
+            ...
+
+Every span is added to a running latency histogram for its stage (p50, p95
+and p99 are available from stats(), the --stats flag or the metrics
+endpoint). Spans that run inside a turn are also collected into one record
+per turn, which is written out either as JSON lines or as a Chrome trace
+(open it at chrome://tracing or https://ui.perfetto.dev). The turn is tracked
+in a context variable, so spans opened in asyncio tasks and in
+asyncio.to_thread workers attach to the turn that started them.
+
+Tracing is off until configure() is called. While it is off, span() and
+turn() return a shared no-op context manager, so instrumented code pays one
+function call per span.
+
+Configuration (read by configure_from_env):
+    ELVEN_TRACE          "jsonl" or "chrome" writes per-turn records, "stats" only keeps histograms
+    ELVEN_TRACE_FILE     output file (default traces.jsonl / trace.json)
+    ELVEN_METRICS_PORT   serve GET /metrics (JSON histograms) on this local port
+"""
+
+import contextvars
+import datetime
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_current_turn = contextvars.ContextVar("elven_turn", default=None)
+_tracer = None
+
+
+class Histogram:
+    """Log-bucketed latency histogram: constant memory, percentiles within about 2.5%."""
+
+    GROWTH = 1.05
+    SMALLEST_MS = 0.001
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, ms):
+        index = int(math.log(max(ms, self.SMALLEST_MS) / self.SMALLEST_MS, self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                value = self.SMALLEST_MS * self.GROWTH ** (index + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class _NoopSpan:
+    """Returned by span() and turn() while tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _lane():
+    # Concurrent asyncio tasks share a thread, so give each task its own timeline row.
+    # (No asyncio import here: if nothing has imported it, there is no task.)
+    asyncio = sys.modules.get("asyncio")
+    try:
+        task = asyncio.current_task() if asyncio is not None else None
+    except RuntimeError:
+        task = None
+    return task.get_name() if task is not None else threading.current_thread().name
+
+
+class Span:
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.turn = _current_turn.get()
+        self.start = self.end = None
+        self.lane = None
+        self.error = None
+
+    def set(self, **attrs):
+        """Attach attributes, e.g. span.set(first_token_ms=...)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.lane = _lane()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer.record(self)
+        return False
+
+    @property
+    def duration_ms(self):
+        return (self.end - self.start) * 1000
+
+
+class Turn:
+    """Everything traced during one command, from recording to the end of the reply."""
+
+    def __init__(self, tracer, number, attrs):
+        self.tracer = tracer
+        self.number = number
+        self.attrs = attrs
+        self.spans = []
+        self.start = self.end = None
+        self.wall_start = None
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current_turn.set(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        _current_turn.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.finish_turn(self)
+        return False
+
+    @property
+    def duration_ms(self):
+        return (self.end - self.start) * 1000
+
+    def to_dict(self):
+        spans = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            record = {"name": span.name, "start_ms": round((span.start - self.start) * 1000, 3),
+                      "duration_ms": round(span.duration_ms, 3), "lane": span.lane}
+            if span.error:
+                record["error"] = span.error
+            record.update(span.attrs)
+            spans.append(record)
+        return {
+            "turn": self.number,
+            "time": datetime.datetime.fromtimestamp(self.wall_start).isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration_ms, 3),
+            **self.attrs,
+            "spans": spans,
+        }
+
+
+class JsonlExporter:
+    """One JSON object per turn, appended to a file."""
+
+    def __init__(self, path="traces.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, turn, origin):
+        line = json.dumps(turn.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class ChromeTraceExporter:
+    """
+    Chrome trace event format ("JSON array" flavour). The closing bracket is
+    optional in that format, so events are appended as turns finish and the
+    file stays loadable even if the assistant is killed.
+    """
+
+    def __init__(self, path="trace.json"):
+        self.path = path
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("[\n")
+
+    def _event(self, name, start, end, lane, args, origin):
+        return {"name": name, "ph": "X", "pid": self.pid, "tid": lane,
+                "ts": round((start - origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                "args": args}
+
+    def export(self, turn, origin):
+        events = [self._event(f"turn {turn.number}", turn.start, turn.end, "turn", turn.attrs, origin)]
+        for span in turn.spans:
+            args = dict(span.attrs, error=span.error) if span.error else span.attrs
+            events.append(self._event(span.name, span.start, span.end, span.lane, args, origin))
+        text = "".join(json.dumps(event, default=str) + ",\n" for event in events)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+
+
+class Tracer:
+    """Collects spans into per-stage histograms and hands finished turns to an exporter."""
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.histograms = {}
+        self.turns = 0
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = Histogram()
+            histogram.add(span.duration_ms)
+            if span.turn is not None:
+                span.turn.spans.append(span)
+
+    def new_turn(self, attrs):
+        with self._lock:
+            self.turns += 1
+            return Turn(self, self.turns, attrs)
+
+    def finish_turn(self, turn):
+        with self._lock:
+            histogram = self.histograms.setdefault("turn", Histogram())
+            histogram.add(turn.duration_ms)
+        if self.exporter is not None:
+            try:
+                self.exporter.export(turn, self.origin)
+            except OSError as e:
+                logger.error("Could not write trace: %s", e)
+
+    def stats(self):
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+
+def span(name, **attrs):
+    """Time a stage. A no-op while tracing is off."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return Span(tracer, name, attrs)
+
+
+def turn(**attrs):
+    """Group the spans of one command into a single record. A no-op while tracing is off."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return tracer.new_turn(attrs)
+
+
+def annotate(**attrs):
+    """Attach attributes (e.g. the intent) to the turn in progress, if any."""
+    current = _current_turn.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+def enabled():
+    return _tracer is not None
+
+
+def configure(export=None, path=None, stats=True):
+    """
+    Turn tracing on or off.
+
+    Args:
+        export (str|object|None): "jsonl" or "chrome" to write per-turn records, or any
+                                  object with export(turn, origin)
+        path (str|None): output file for the exporter
+        stats (bool): keep histograms even without an exporter; with neither,
+                      tracing is switched off
+
+    Returns:
+        Tracer|None: the active tracer
+    """
+    global _tracer
+    exporter = None
+    if export == "jsonl":
+        exporter = JsonlExporter(path or "traces.jsonl")
+    elif export == "chrome":
+        exporter = ChromeTraceExporter(path or "trace.json")
+    elif hasattr(export, "export"):
+        exporter = export
+    elif export:
+        raise ValueError(f"Unknown trace format '{export}' (expected 'jsonl' or 'chrome')")
+    _tracer = Tracer(exporter) if exporter is not None or stats else None
+    return _tracer
+
+
+def configure_from_env(stats=False, export=None, path=None):
+    """configure() from ELVEN_TRACE / ELVEN_TRACE_FILE / ELVEN_METRICS_PORT; arguments take precedence."""
+    mode = os.getenv("ELVEN_TRACE", "").lower()
+    export = export or (mode if mode in ("jsonl", "chrome") else None)
+    return configure(export=export, path=path or os.getenv("ELVEN_TRACE_FILE") or None,
+                     stats=stats or mode == "stats" or bool(os.getenv("ELVEN_METRICS_PORT")))
+
+
+def stats():
+    """Per-stage {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}; empty while off."""
+    return _tracer.stats() if _tracer is not None else {}
+
+
+def format_stats(summary=None):
+    summary = stats() if summary is None else summary
+    if not summary:
+        return "No stages traced."
+    width = max(len(name) for name in summary)
+    lines = [f"{'stage':<{width}}  {'count':>6}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}  {'max ms':>9}"]
+    for name, s in summary.items():
+        lines.append(f"{name:<{width}}  {s['count']:>6}  {s['p50_ms']:>9.1f}  {s['p95_ms']:>9.1f}  "
+                     f"{s['p99_ms']:>9.1f}  {s['max_ms']:>9.1f}")
+    return "\n".join(lines)
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serve GET /metrics with the current histograms from a daemon thread. Returns the server."""
+    import http.server
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = json.dumps(stats()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,626 @@
+"""
+Resident Whisper transcription engine.
+
+The Whisper model is loaded once per process (at startup or on first use) and
+shared by every caller, instead of being re-read from disk for each utterance.
+
+Configuration (read when the engine is first created):
+    WHISPER_MODEL   model size/name passed to whisper.load_model (default "small")
+    WHISPER_DEVICE  torch device, e.g. "cpu" or "cuda" (default: whisper's choice)
+    WHISPER_FP16    "1", "0" or "auto" (default "auto": fp16 only on CUDA)
+    WHISPER_PRELOAD "1" to load the model at startup, "0" to load lazily (default "1")
+    WHISPER_WARMUP  "1" to run a short warm-up decode after loading (default "0")
+
+Queued transcription (TranscriptionWorker, read by get_worker):
+    WHISPER_WORKERS        decoding threads, each with its own copy of the model (default 1)
+    WHISPER_MAX_BATCH      clips decoded together (default 8, 1 disables batching)
+    WHISPER_BATCH_WAIT_MS  how long a clip waits for others to batch with (default 10)
+    WHISPER_QUEUE          clips allowed to wait beyond those being decoded (default 16, 0 = no limit)
+    WHISPER_SHED           when the queue is full: "reject" the new clip or drop the "oldest" (default "reject")
+    WHISPER_TORCH_THREADS  torch threads for each decode; a process-wide setting (default: cores / WHISPER_WORKERS)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+MAX_BATCH_SECONDS = 30  # Whisper's window; longer clips are decoded on their own
+
+
+def _env_flag(name, default):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _load_whisper_model(model_name, device=None):
+    # Imported here so that modules which only need the engine handle
+    # do not pay for importing whisper/torch.
+    import whisper
+    return whisper.load_model(model_name, device=device)
+
+
+class TranscriptionEngine:
+    """
+    Holds a loaded Whisper model and transcribes audio with it.
+
+    Decodes on one engine run one at a time: Whisper's decoder hooks a
+    kv-cache onto the model's modules, so two decodes on the same model
+    would corrupt each other. Decode in parallel on replica() engines.
+    """
+
+    def __init__(self, model_name="small", device=None, fp16=None, loader=None):
+        """
+        Args:
+            model_name (str): Whisper model size, e.g. "tiny", "base", "small"
+            device (str|None): torch device; None lets whisper pick
+            fp16 (bool|None): decode in half precision; None means "only on CUDA"
+            loader (callable|None): loader(model_name, device) -> model,
+                                    defaults to whisper.load_model
+        """
+        self.model_name = model_name
+        self.device = device
+        self.fp16 = fp16
+        self._loader = loader or _load_whisper_model
+        self._model = None
+        self._lock = threading.Lock()
+        self._decode_lock = threading.Lock()
+        self.load_seconds = None
+
+    @classmethod
+    def from_env(cls, loader=None):
+        fp16_setting = os.getenv("WHISPER_FP16", "auto").strip().lower()
+        fp16 = None if fp16_setting == "auto" else fp16_setting in ("1", "true", "yes", "on")
+        return cls(
+            model_name=os.getenv("WHISPER_MODEL", "small"),
+            device=os.getenv("WHISPER_DEVICE") or None,
+            fp16=fp16,
+            loader=loader,
+        )
+
+    def replica(self):
+        """A new engine with the same settings, which loads its own copy of the model."""
+        return TranscriptionEngine(self.model_name, self.device, self.fp16, self._loader)
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        return self.load()
+
+    def load(self):
+        """Load the model if needed and return it. Safe to call from any thread."""
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                start = time.perf_counter()
+                model = self._loader(self.model_name, self.device)
+                self.load_seconds = time.perf_counter() - start
+                self._model = model
+        return self._model
+
+    def _use_fp16(self, model):
+        if self.fp16 is not None:
+            return self.fp16
+        device = getattr(model, "device", None)
+        return getattr(device, "type", None) == "cuda"
+
+    def transcribe(self, audio, language="en", **options):
+        """
+        Transcribe a file path or a 16 kHz float32 NumPy array.
+
+        Returns:
+            dict: Whisper's result dict ("text", "segments", ...)
+        """
+        model = self.load()
+        options.setdefault("fp16", self._use_fp16(model))
+        with self._decode_lock:
+            return model.transcribe(audio, language=language, **options)
+
+    def transcribe_batch(self, clips, language="en"):
+        """
+        Transcribe several 16 kHz float32 arrays, with one batched decode where possible.
+
+        Whisper pads every clip to 30 s for the encoder, so clips up to that
+        length are stacked into one mel batch and decoded together (without
+        segment timestamps). Longer clips, single clips and models without
+        batched decoding go through transcribe() one at a time. A model that
+        has its own transcribe_batch(clips, language) is used as is.
+
+        Returns:
+            list: one result dict ("text", ...) per clip, in order
+        """
+        model = self.load()
+        if hasattr(model, "transcribe_batch"):
+            with self._decode_lock:
+                return model.transcribe_batch(clips, language=language)
+        if len(clips) > 1 and hasattr(model, "dims") and \
+                all(len(clip) <= MAX_BATCH_SECONDS * SAMPLE_RATE for clip in clips):
+            with self._decode_lock:
+                return self._decode_batch(model, clips, language)
+        return [self.transcribe(clip, language=language) for clip in clips]
+
+    def _decode_batch(self, model, clips, language):
+        import torch
+        import whisper
+
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(clip)), model.dims.n_mels)
+            for clip in clips
+        ]).to(model.device)
+        options = whisper.DecodingOptions(language=language, fp16=self._use_fp16(model), without_timestamps=True)
+        return [{"text": result.text, "language": result.language} for result in whisper.decode(model, mel, options)]
+
+    def warm_up(self, seconds=1.0):
+        """Run one decode on silence so the first real command is not the slow one."""
+        import numpy as np
+        start = time.perf_counter()
+        self.transcribe(np.zeros(int(SAMPLE_RATE * seconds), dtype=np.float32))
+        return time.perf_counter() - start
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide transcription engine, creating it from the environment."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = TranscriptionEngine.from_env()
+    return _engine
+
+
+def preload(warm_up=None):
+    """
+    Load (and optionally warm up) the shared engine according to the environment.
+
+    Returns:
+        TranscriptionEngine: the shared engine
+    """
+    engine = get_engine()
+    if _env_flag("WHISPER_PRELOAD", True):
+        engine.load()
+        if warm_up is None:
+            warm_up = _env_flag("WHISPER_WARMUP", False)
+        if warm_up:
+            engine.warm_up()
+    return engine
+
+
+def pin_torch_threads(threads):
+    """
+    Limit torch's intra-op threads for the whole process (torch.set_num_threads
+    is not per thread). Every decode, on whichever thread, then uses at most
+    this many, so several decoding threads don't each spread over every core.
+
+    Returns:
+        bool: False when there is nothing to pin (no count given or no torch)
+    """
+    if not threads:
+        return False
+    try:
+        import torch
+    except ImportError:
+        return False
+    torch.set_num_threads(threads)
+    return True
+
+
+class QueueFull(RuntimeError):
+    """The transcription queue is full: the clip was refused, or dropped for a newer one."""
+
+
+class _Job:
+    __slots__ = ("audio", "language", "future", "queued_at")
+
+    def __init__(self, audio, language):
+        self.audio = audio
+        self.language = language
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class TranscriptionWorker:
+    """
+    Transcribes queued clips on a few threads, batching clips that arrive
+    close together. The first thread decodes on the given engine and each
+    other one on a replica with its own copy of the model (loaded on its
+    first batch), since decodes on one model can't run concurrently.
+
+    The oldest waiting clip is always decoded next, so none starves; it is
+    joined by the waiting clips nearest to it in length. The decoder runs
+    until the longest transcript in a batch is finished, so a short command
+    batched with a long dictation would wait for all of it; when more clips
+    are waiting than fit in a batch, the long ones go together.
+    """
+
+    def __init__(self, engine=None, workers=1, max_batch=8, batch_wait_ms=10, max_queued=16,
+                 shed="reject", torch_threads=None, by_length=True):
+        """
+        Args:
+            engine (TranscriptionEngine|None): defaults to the shared engine
+            workers (int): decoding threads; each extra one holds another copy of the model
+            max_batch (int): most clips decoded together
+            batch_wait_ms (float): how long the oldest clip waits for others to batch with
+            max_queued (int): clips allowed to wait beyond the workers' batches; 0 for no limit
+            shed (str): when the queue is full, "reject" the new clip or drop the "oldest" waiting one
+            torch_threads (int|None): torch threads for each decode (set for the whole
+                                      process); defaults to the cores shared between the workers
+            by_length (bool): fill batches with the clips nearest in length, not in arrival order
+        """
+        if shed not in ("reject", "oldest"):
+            raise ValueError(f"shed must be 'reject' or 'oldest', not '{shed}'")
+        self.engine = engine or get_engine()
+        self.workers = workers
+        self.max_batch = max(1, max_batch)
+        self.batch_wait = batch_wait_ms / 1000
+        self.max_queued = max_queued
+        self.shed = shed
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.by_length = by_length
+        self._queue = []  # waiting jobs, oldest first
+        self._running = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._closed = False
+        self.completed = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.batches = 0
+
+    @classmethod
+    def from_env(cls, engine=None, **overrides):
+        settings = dict(
+            workers=int(os.getenv("WHISPER_WORKERS", "1")),
+            max_batch=int(os.getenv("WHISPER_MAX_BATCH", "8")),
+            batch_wait_ms=float(os.getenv("WHISPER_BATCH_WAIT_MS", "10")),
+            max_queued=int(os.getenv("WHISPER_QUEUE", "16")),
+            shed=os.getenv("WHISPER_SHED", "reject").strip().lower(),
+            torch_threads=int(os.getenv("WHISPER_TORCH_THREADS", "0")) or None,
+        )
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(engine, **settings)
+
+    def submit(self, audio, language="en"):
+        """
+        Queue a 16 kHz float32 array for transcription.
+
+        Returns:
+            concurrent.futures.Future: resolves to the result dict ("text", ...);
+                                       fails with QueueFull if the clip is dropped for a newer one
+
+        Raises:
+            QueueFull: the queue is full and the policy is to reject new clips
+        """
+        job = _Job(audio, language)
+        dropped = None
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("TranscriptionWorker is shut down")
+            if not self._threads:
+                self._start()
+            # Clips being decoded, or that the workers' next batches will take, don't count as queued
+            capacity = self.workers * self.max_batch + self.max_queued
+            if self.max_queued and len(self._queue) + self._running >= capacity:
+                if self.shed == "oldest" and self._queue:
+                    dropped = self._queue.pop(0)
+                    self.dropped += 1
+                else:
+                    self.rejected += 1
+                    raise QueueFull(f"{len(self._queue) + self._running} clips already queued or decoding")
+            self._queue.append(job)
+            self._cond.notify()
+        if dropped is not None and dropped.future.set_running_or_notify_cancel():
+            dropped.future.set_exception(QueueFull("dropped for a newer clip"))
+        return job.future
+
+    def transcribe(self, audio, language="en"):
+        """Queue a clip and wait for its result."""
+        return self.submit(audio, language).result()
+
+    def _start(self):
+        pin_torch_threads(self.torch_threads)
+        for i in range(self.workers):
+            engine = self.engine if i == 0 else self.engine.replica()
+            thread = threading.Thread(target=self._run, args=(engine,), name=f"whisper-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return None
+                # Give clips arriving close behind the oldest a moment to join it
+                deadline = self._queue[0].queued_at + self.batch_wait
+                while 0 < len(self._queue) < self.max_batch and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._queue:
+                    continue  # another worker took them
+                first = self._queue[0]
+                others = [job for job in self._queue[1:] if job.language == first.language]
+                if self.by_length:
+                    others.sort(key=lambda job: abs(len(job.audio) - len(first.audio)))
+                batch = [first] + others[:self.max_batch - 1]
+                taken = set(map(id, batch))
+                self._queue = [job for job in self._queue if id(job) not in taken]
+                self._running += len(batch)
+                return batch
+
+    def _run(self, engine):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            jobs = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            try:
+                if jobs:
+                    results = engine.transcribe_batch([job.audio for job in jobs], language=jobs[0].language)
+                    for job, result in zip(jobs, results):
+                        job.future.set_result(result)
+            except Exception as e:
+                for job in jobs:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running -= len(batch)
+                    self.completed += len(jobs)
+                    self.batches += 1 if jobs else 0
+
+    def stats(self):
+        with self._cond:
+            return {"workers": self.workers, "max_batch": self.max_batch, "max_queued": self.max_queued,
+                    "queued": len(self._queue), "running": self._running,
+                    "active": len(self._queue) + self._running, "completed": self.completed,
+                    "rejected": self.rejected, "dropped": self.dropped, "batches": self.batches,
+                    "mean_batch": round(self.completed / self.batches, 2) if self.batches else 0.0}
+
+    def shutdown(self, wait=True):
+        """Stop taking clips; clips already queued are still decoded."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """Return the process-wide transcription worker, creating it from the environment."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = TranscriptionWorker.from_env()
+    return _worker
+
+
+def load_wav(path):
+    """Read a 16 kHz 16-bit mono WAV file into a float32 array."""
+    return pcm_to_float32(b"".join(pcm_chunks_from_wav(path)))
+
+
+def pcm_to_float32(pcm):
+    """Convert raw 16-bit little-endian mono PCM bytes to a float32 array in [-1, 1)."""
+    import numpy as np
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def pcm_chunks_from_wav(path, chunk_size=1024):
+    """
+    Yield raw PCM chunks from a 16-bit mono WAV file, the same shape of data
+    the microphone stream produces. Used in place of a microphone in tests.
+    """
+    import wave
+    with wave.open(path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit mono audio")
+        if wf.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz, got {wf.getframerate()} Hz")
+        while True:
+            data = wf.readframes(chunk_size)
+            if not data:
+                break
+            yield data
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcription over a rolling window of live audio.
+
+    PCM chunks are fed in as they are read from the input stream. A background
+    thread periodically decodes the uncommitted audio to produce a partial
+    hypothesis; segments that Whisper has clearly finished are committed and
+    their audio dropped, so each decode stays bounded by the window. When the
+    utterance ends, finish() only has to decode the short uncommitted tail.
+    """
+
+    def __init__(self, engine=None, sample_rate=SAMPLE_RATE, window_seconds=8.0,
+                 partial_interval=1.0, commit_margin=1.0, language="en", on_partial=None):
+        """
+        Args:
+            engine (TranscriptionEngine|None): defaults to the shared engine
+            window_seconds (float): max uncommitted audio kept for decoding
+            partial_interval (float): seconds of new audio between partial decodes
+            commit_margin (float): segments ending this close to the live edge
+                                   are not committed yet, they may still change
+            on_partial (callable|None): called with the partial text after each decode
+        """
+        self.engine = engine or get_engine()
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_seconds * sample_rate)
+        self.partial_samples = int(partial_interval * sample_rate)
+        self.margin_samples = int(commit_margin * sample_rate)
+        self.language = language
+        self.on_partial = on_partial
+
+        self._chunks = []
+        self._buffered = 0
+        self._since_decode = 0
+        self._committed = []
+        self._hypothesis = ""
+        self._lock = threading.Lock()
+        self._decode_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.decode_count = 0
+        self._worker = threading.Thread(target=self._run, name="streaming-transcriber", daemon=True)
+        self._worker.start()
+
+    @property
+    def committed_text(self):
+        with self._lock:
+            return "".join(self._committed).strip()
+
+    @property
+    def partial(self):
+        """Best current guess at the whole utterance."""
+        with self._lock:
+            return ("".join(self._committed) + self._hypothesis).strip()
+
+    @property
+    def buffered_seconds(self):
+        with self._lock:
+            return self._buffered / self.sample_rate
+
+    def feed(self, pcm):
+        """Add a chunk of raw 16-bit PCM. Never blocks on decoding."""
+        samples = pcm_to_float32(pcm)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("StreamingTranscriber already finished")
+            self._chunks.append(samples)
+            self._buffered += len(samples)
+            self._since_decode += len(samples)
+            due = self._since_decode >= self.partial_samples
+        if due:
+            self._wake.set()
+
+    def _snapshot(self):
+        import numpy as np
+        with self._lock:
+            if len(self._chunks) > 1:
+                self._chunks = [np.concatenate(self._chunks)]
+            self._since_decode = 0
+            return self._chunks[0] if self._chunks else None
+
+    def _decode(self, audio):
+        prompt = "".join(self._committed)[-200:].strip() or None
+        result = self.engine.transcribe(
+            audio,
+            language=self.language,
+            condition_on_previous_text=False,
+            initial_prompt=prompt,
+        )
+        self.decode_count += 1
+        return result
+
+    def _commit(self, audio_len, segments):
+        """
+        Commit finished segments and drop their audio from the buffer.
+
+        Within the window, the last segment and any that reach the live edge
+        are left to grow. Over it, everything that ends before the live edge
+        is committed; if that still leaves more than a window (one long
+        segment), all segments are committed so the buffer stays bounded.
+        """
+        if not segments:
+            return 0
+        over_window = audio_len > self.window_samples
+        live_edge = audio_len - self.margin_samples
+        commit_upto = 0
+        committed_segments = 0
+        for i, segment in enumerate(segments):
+            end = min(int(segment["end"] * self.sample_rate), audio_len)
+            is_last = i == len(segments) - 1
+            if end > live_edge and (is_last or not over_window):
+                break
+            if is_last and not over_window:
+                break
+            commit_upto = end
+            committed_segments = i + 1
+        if over_window and audio_len - commit_upto > self.window_samples:
+            last_end = min(int(segments[-1]["end"] * self.sample_rate), audio_len)
+            commit_upto = max(last_end, audio_len - self.window_samples)
+            committed_segments = len(segments)
+        if committed_segments:
+            with self._lock:
+                self._committed.extend(s["text"] for s in segments[:committed_segments])
+                self._chunks = [self._chunks[0][commit_upto:]] + self._chunks[1:]
+                self._buffered -= commit_upto
+        return committed_segments
+
+    def _decode_partial(self):
+        with self._decode_lock:
+            audio = self._snapshot()
+            if audio is None or len(audio) == 0:
+                return
+            result = self._decode(audio)
+            segments = result.get("segments") or []
+            committed = self._commit(len(audio), segments)
+            with self._lock:
+                self._hypothesis = "".join(s["text"] for s in segments[committed:]) if segments \
+                    else result.get("text", "")
+            if self.on_partial:
+                self.on_partial(self.partial)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+            try:
+                self._decode_partial()
+            except Exception as e:
+                logger.error("Partial transcription failed: %s", e)
+
+    def finish(self):
+        """
+        Stop partial decoding, decode the remaining tail and return the full text.
+        """
+        with self._lock:
+            self._closed = True
+        self._wake.set()
+        self._worker.join()
+        with self._decode_lock:
+            audio = self._snapshot()
+            tail = ""
+            if audio is not None and len(audio):
+                tail = self._decode(audio).get("text", "")
+            with self._lock:
+                self._committed.append(tail)
+                self._hypothesis = ""
+                self._chunks = []
+                self._buffered = 0
+        return self.committed_text
+
+
+def transcribe_stream(chunks, engine=None, **kwargs):
+    """Feed an iterable of PCM chunks through a StreamingTranscriber and return the text."""
+    stream = StreamingTranscriber(engine=engine, **kwargs)
+    for chunk in chunks:
+        stream.feed(chunk)
+    return stream.finish()
@@ -0,0 +1,116 @@
+"""
+Sentence-streamed text-to-speech.
+
+A streamed LLM reply is cut into sentences as the tokens arrive. Each
+sentence is sent to the synthesiser as soon as it is complete, and playback
+of the first sentence starts while the following ones are still being
+generated and synthesised, so time-to-first-audio no longer waits for the
+whole reply.
+"""
+
+import asyncio
+import re
+
+VOICE = "en-GB-ThomasNeural"
+AUDIO_FORMAT = "audio-24khz-48kbitrate-mono-mp3"  # what edge_tts.Communicate produces
+
+# End of sentence: terminal punctuation (plus closing quotes/brackets) followed by whitespace
+SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+")
+
+
+async def split_sentences(deltas, min_chars=12):
+    """
+    Turn an async iterable of text deltas into an async iterable of sentences.
+
+    Sentences shorter than min_chars are held back and joined with the next one,
+    so the synthesiser is not called for fragments like "Ah." on their own.
+    """
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            if match.end() - start < min_chars:
+                continue
+            sentence = buffer[start:match.end()].strip()
+            start = match.end()
+            if sentence:
+                yield sentence
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def iterate(items):
+    """Adapt a plain iterable to an async iterable."""
+    for item in items:
+        yield item
+
+
+async def stream_edge(text, voice=VOICE):
+    """Yield MP3 chunks from Microsoft Edge TTS as they are synthesised."""
+    import edge_tts
+    communicate = edge_tts.Communicate(text, voice)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+async def synthesize_edge(text, voice=VOICE):
+    """Synthesise text with Microsoft Edge TTS and return the MP3 bytes."""
+    audio = bytearray()
+    async for chunk in stream_edge(text, voice):
+        audio.extend(chunk)
+    return bytes(audio)
+
+
+async def speak_stream(sentences, synthesize, play, lookahead=2, on_sentence=None):
+    """
+    Synthesise and play sentences in order, overlapping synthesis with playback.
+
+    Args:
+        sentences: async iterable of sentence strings
+        synthesize (coroutine function): synthesize(sentence) -> audio
+        play (coroutine function): play(audio, sentence) plays one sentence
+        lookahead (int): sentences synthesised ahead of the one playing
+        on_sentence (callable|None): called with each sentence as it starts playing
+
+    Returns:
+        list: the sentences that were played
+    """
+    queue = asyncio.Queue(maxsize=lookahead)
+    pending = []
+
+    async def produce():
+        try:
+            async for sentence in sentences:
+                audio_task = asyncio.create_task(synthesize(sentence))
+                pending.append(audio_task)
+                await queue.put((sentence, audio_task))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Let the consumer finish what it has; the error surfaces when it awaits us.
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    played = []
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            sentence, audio_task = item
+            audio = await audio_task
+            if on_sentence:
+                on_sentence(sentence)
+            await play(audio, sentence)
+            played.append(sentence)
+        await producer
+    finally:
+        producer.cancel()
+        for task in pending:
+            task.cancel()
+    return played
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache of synthesised speech.
+
+Audio is stored under the SHA-256 of (format, voice, text), so a repeated
+phrase such as "Goodbye." or "You have no tasks." plays straight from disk
+without a network round-trip. The cache has a size cap with least-recently
+used eviction (recency survives restarts through file mtimes) and keeps hit
+and miss counters.
+
+Configuration:
+    TTS_CACHE          "0" disables the cache (default "1")
+    TTS_CACHE_DIR      cache directory (default ".tts_cache")
+    TTS_CACHE_MAX_MB   size cap in megabytes (default 50)
+
+Pre-render the fixed phrases:
+    python3 tts_cache.py --prewarm
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import tts
+
+# Phrases the assistant says verbatim, worth rendering ahead of time
+FIXED_PHRASES = [
+    "Goodbye.",
+    "Email functionality is not available yet.",
+    "You have no tasks.",
+    "Weather API key not set.",
+    "I'm sorry, I can't process your request right now.",
+]
+
+
+class TTSCache:
+    """Size-capped LRU cache of audio clips keyed by text, voice and format."""
+
+    def __init__(self, directory=".tts_cache", max_bytes=50 * 1024 * 1024, audio_format=tts.AUDIO_FORMAT):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.audio_format = audio_format
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".audio"):
+                        path = os.path.join(root, name)
+                        stat = os.stat(path)
+                        entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    def key(self, text, voice):
+        return hashlib.sha256(f"{self.audio_format}\0{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.audio")
+
+    def get(self, text, voice):
+        """Return cached audio bytes, or None on a miss."""
+        key = self.key(text, voice)
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    audio = f.read()
+                os.utime(self._path(key))  # recency for the next process
+            except OSError:
+                self._bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, text, voice, audio):
+        if not audio or len(audio) > self.max_bytes:
+            return
+        key = self.key(text, voice)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename, so a crash never leaves a truncated clip.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(audio) - self._index.pop(key, 0)
+            self._index[key] = len(audio)
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def __contains__(self, item):
+        text, voice = item
+        return self.key(text, voice) in self._index
+
+    async def synthesize(self, text, voice, synthesize):
+        """Return audio for text from the cache, or from synthesize(text, voice) on a miss."""
+        audio = self.get(text, voice)
+        if audio is None:
+            audio = await synthesize(text, voice)
+            self.put(text, voice, audio)
+        return audio
+
+    async def stream(self, text, voice, stream):
+        """
+        Yield audio chunks for text: the cached clip on a hit, otherwise the
+        chunks of stream(text, voice) as they arrive. A fully received clip is
+        stored; an interrupted one is not.
+        """
+        audio = self.get(text, voice)
+        if audio is not None:
+            yield audio
+            return
+        received = bytearray()
+        async for chunk in stream(text, voice):
+            received.extend(chunk)
+            yield chunk
+        self.put(text, voice, bytes(received))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "bytes": self._bytes,
+        }
+
+
+async def prewarm(cache, voice=tts.VOICE, phrases=FIXED_PHRASES, synthesize=tts.synthesize_edge):
+    """Render any phrases not yet cached. Returns the number synthesised."""
+    rendered = 0
+    for phrase in phrases:
+        if (phrase, voice) not in cache:
+            cache.put(phrase, voice, await synthesize(phrase, voice))
+            rendered += 1
+    return rendered
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache configured from the environment, or None if disabled."""
+    global _cache
+    if os.getenv("TTS_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache(
+                directory=os.getenv("TTS_CACHE_DIR", ".tts_cache"),
+                max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", "50")) * 1024 * 1024),
+            )
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Elven TTS phrase cache")
+    parser.add_argument("--prewarm", action="store_true", help="render the fixed phrases now")
+    parser.add_argument("--voice", default=tts.VOICE)
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if cache is None:
+        print("TTS cache is disabled (TTS_CACHE=0)")
+        return
+    if args.prewarm:
+        rendered = asyncio.run(prewarm(cache, args.voice))
+        print(f"🔥 Pre-warmed {rendered} phrase(s) for {args.voice}")
+    stats = cache.stats()
+    print(f"📦 {stats['entries']} clip(s), {stats['bytes'] / 1024:.0f} KiB in {cache.directory}")
+
+
+if __name__ == "__main__":
+    main()
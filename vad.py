@@ -0,0 +1,133 @@
+"""
+Voice-activity detection for the recording loop.
+
+EnergyVAD measures RMS energy over a zero-copy NumPy view of each PCM chunk
+and compares it against an adaptive noise floor, so the same settings work in
+a quiet room and next to a fan. A short hangover keeps the speech state up
+through the gaps between words, and a pre-roll buffer keeps the chunks heard
+just before speech was detected so the first syllable is not clipped.
+
+Any object with the same process()/take_pre_roll()/reset() methods can be
+passed to the recording functions instead.
+
+Configuration (read by EnergyVAD.from_env):
+    VAD_THRESHOLD_RATIO  speech threshold as a multiple of the noise floor (default 3.0)
+    VAD_MIN_THRESHOLD    lowest RMS threshold, in 16-bit sample units (default 300)
+    VAD_HANGOVER_MS      how long speech state is held after energy drops (default 300)
+    VAD_PRE_ROLL_MS      audio kept from before the speech onset (default 300)
+    VAD_CALIBRATION_MS   audio used to measure the noise floor after reset (default 200)
+"""
+
+import math
+import os
+from collections import deque
+
+import numpy as np
+
+
+class EnergyVAD:
+    """RMS energy detector with an adaptive noise floor, hangover and pre-roll."""
+
+    def __init__(self, sample_rate=16000, chunk_size=1024, threshold_ratio=3.0,
+                 min_threshold=300.0, fixed_threshold=None, hangover_ms=300,
+                 pre_roll_ms=300, calibration_ms=200, floor_adapt=0.05, initial_floor=None):
+        """
+        Args:
+            sample_rate (int): samples per second of the PCM stream
+            chunk_size (int): expected samples per chunk (used to size buffers)
+            threshold_ratio (float): speech when RMS > noise floor * ratio
+            min_threshold (float): lower bound on the adaptive threshold
+            fixed_threshold (float|None): disable adaptation and use this RMS threshold
+            hangover_ms (int): keep reporting speech this long after energy drops
+            pre_roll_ms (int): audio to keep from just before the speech onset
+            calibration_ms (int): audio after reset() used only to measure the noise floor
+            floor_adapt (float): smoothing factor for the noise floor (0-1)
+            initial_floor (float|None): starting noise floor; defaults to min_threshold / ratio
+        """
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.threshold_ratio = threshold_ratio
+        self.min_threshold = float(min_threshold)
+        self.fixed_threshold = fixed_threshold
+        self.floor_adapt = floor_adapt
+        self.initial_floor = initial_floor if initial_floor is not None else self.min_threshold / threshold_ratio
+        chunk_ms = 1000.0 * chunk_size / sample_rate
+        self.hangover_chunks = int(round(hangover_ms / chunk_ms))
+        self._pre_roll = deque(maxlen=max(0, int(round(pre_roll_ms / chunk_ms))))
+        self.calibration_chunks = 0 if fixed_threshold is not None else int(round(calibration_ms / chunk_ms))
+        # Scratch buffer reused for every chunk so measuring energy does not allocate.
+        self._scratch = np.empty(chunk_size, dtype=np.float32)
+        self.reset()
+
+    @classmethod
+    def from_env(cls, sample_rate=16000, chunk_size=1024, fixed_threshold=None):
+        return cls(
+            sample_rate=sample_rate,
+            chunk_size=chunk_size,
+            threshold_ratio=float(os.getenv("VAD_THRESHOLD_RATIO", "3.0")),
+            min_threshold=float(os.getenv("VAD_MIN_THRESHOLD", "300")),
+            fixed_threshold=fixed_threshold,
+            hangover_ms=int(os.getenv("VAD_HANGOVER_MS", "300")),
+            pre_roll_ms=int(os.getenv("VAD_PRE_ROLL_MS", "300")),
+            calibration_ms=int(os.getenv("VAD_CALIBRATION_MS", "200")),
+        )
+
+    def reset(self):
+        self.noise_floor = self.initial_floor
+        self.speaking = False
+        self._quiet_chunks = 0
+        self._calibrated = 0
+        self._pre_roll.clear()
+
+    @property
+    def threshold(self):
+        if self.fixed_threshold is not None:
+            return float(self.fixed_threshold)
+        return max(self.min_threshold, self.noise_floor * self.threshold_ratio)
+
+    def rms(self, pcm):
+        """RMS of a chunk of 16-bit PCM bytes, without copying it into Python objects."""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        n = len(samples)
+        if n == 0:
+            return 0.0
+        if n > len(self._scratch):
+            self._scratch = np.empty(n, dtype=np.float32)
+        scratch = self._scratch[:n]
+        np.copyto(scratch, samples, casting="unsafe")
+        return math.sqrt(float(np.dot(scratch, scratch)) / n)
+
+    def process(self, pcm):
+        """
+        Feed one chunk and return whether the stream is currently in speech.
+
+        While idle, chunks are kept in the pre-roll buffer and quiet chunks
+        train the noise floor. The first chunks after reset() only calibrate
+        the floor and never count as speech.
+        """
+        energy = self.rms(pcm)
+        if self._calibrated < self.calibration_chunks:
+            # Average the first chunks into the floor; the room may already be noisy.
+            self._calibrated += 1
+            self.noise_floor += (energy - self.noise_floor) / self._calibrated
+            self._pre_roll.append(pcm)
+            return False
+        loud = energy > self.threshold
+        if loud:
+            self._quiet_chunks = 0
+            self.speaking = True
+        elif self.speaking:
+            self._quiet_chunks += 1
+            if self._quiet_chunks > self.hangover_chunks:
+                self.speaking = False
+        elif self.fixed_threshold is None:
+            self.noise_floor += self.floor_adapt * (energy - self.noise_floor)
+        if not self.speaking:
+            self._pre_roll.append(pcm)
+        return self.speaking
+
+    def take_pre_roll(self):
+        """Return and clear the chunks buffered before the current speech onset."""
+        chunks = list(self._pre_roll)
+        self._pre_roll.clear()
+        return chunks
@@ -0,0 +1,237 @@
+"""
+Weather lookups with caching.
+
+get_weather used to call OpenWeatherMap by city name on every request. This
+layer sits in front of it and:
+
+- memoises the city -> coordinates lookup (geocoding), since places don't move;
+- caches current conditions per location for a TTL (10 minutes by default);
+- after the TTL, answers from the stale entry immediately and refreshes it
+  in the background (stale-while-revalidate), up to max_stale;
+- counts how often each location is asked for and can pre-fetch the most
+  frequent ones (plus any configured favourites) before they expire.
+
+Configuration:
+    WEATHER_TTL          seconds conditions count as fresh (default 600)
+    WEATHER_MAX_STALE    seconds a stale entry may still be served (default 3600)
+    WEATHER_PREFETCH     comma-separated locations kept warm, e.g. "London,Paris"
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+import requests
+
+import http_pool
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherService:
+    """Cached OpenWeatherMap client for current conditions by place name."""
+
+    def __init__(self, api_key, client=None, ttl=600.0, max_stale=3600.0, units="metric",
+                 favourites=(), clock=time.time):
+        """
+        Args:
+            api_key (str): OpenWeatherMap API key
+            client (ServiceClient|None): defaults to the shared "openweathermap" client
+            ttl (float): seconds conditions count as fresh
+            max_stale (float): seconds past fetching that a stale entry may still be
+                               served while it is refreshed; older entries are refetched
+            units (str): OpenWeatherMap units
+            favourites (iterable): locations always included in prefetch()
+            clock (callable): time source
+        """
+        self.api_key = api_key
+        self.client = client
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.units = units
+        self.favourites = list(favourites)
+        self.clock = clock
+        self.requested = Counter()      # normalised location -> times asked for
+        self.upstream = Counter()       # "geocode" / "weather" -> upstream calls
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._places = {}      # normalised location -> place dict, or None if unknown
+        self._conditions = {}  # coordinate key -> (fetched_at, conditions)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._prefetcher = None
+        self._stop = threading.Event()
+
+    def _client(self):
+        return self.client or http_pool.get_client("openweathermap")
+
+    @staticmethod
+    def _normalise(location):
+        return " ".join(location.lower().split())
+
+    def geocode(self, location):
+        """Return {"name", "lat", "lon", "country"} for a place name, or None if unknown. Memoised."""
+        key = self._normalise(location)
+        with self._lock:
+            if key in self._places:
+                return self._places[key]
+        self.upstream["geocode"] += 1
+        response = self._client().get("/geo/1.0/direct", params={"q": location, "limit": 1, "appid": self.api_key})
+        response.raise_for_status()
+        results = response.json()
+        place = None
+        if results:
+            first = results[0]
+            place = {"name": first["name"], "lat": first["lat"], "lon": first["lon"],
+                     "country": first.get("country")}
+        with self._lock:
+            self._places[key] = place
+        return place
+
+    @staticmethod
+    def _coordinate_key(place):
+        # ~1 km grid, so two names for one place share an entry
+        return round(place["lat"], 2), round(place["lon"], 2)
+
+    def _fetch(self, place):
+        self.upstream["weather"] += 1
+        response = self._client().get("/data/2.5/weather", params={
+            "lat": place["lat"], "lon": place["lon"], "appid": self.api_key, "units": self.units})
+        response.raise_for_status()
+        data = response.json()
+        conditions = {"temp": data["main"]["temp"], "description": data["weather"][0]["description"]}
+        with self._lock:
+            self._conditions[self._coordinate_key(place)] = (self.clock(), conditions)
+        return conditions
+
+    def _refresh_in_background(self, place):
+        key = self._coordinate_key(place)
+        with self._lock:
+            if key in self._refreshing:
+                return None
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(place)
+            except Exception as e:
+                logger.error("Weather refresh for %s failed: %s", place["name"], e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        thread = threading.Thread(target=refresh, name="weather-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def current(self, location):
+        """
+        Current conditions for a place name: {"temp", "description"}.
+
+        Raises:
+            LookupError: the place is unknown
+            requests.RequestException: nothing usable is cached and the API failed
+        """
+        with self._lock:
+            self.requested[self._normalise(location)] += 1
+        place = self.geocode(location)
+        if place is None:
+            raise LookupError(location)
+        with self._lock:
+            entry = self._conditions.get(self._coordinate_key(place))
+        if entry is not None:
+            age = self.clock() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                return entry[1]
+            if age < self.max_stale:
+                self.stale_hits += 1
+                self._refresh_in_background(place)
+                return entry[1]
+        self.misses += 1
+        return self._fetch(place)
+
+    def describe(self, location):
+        """Spoken answer for a weather question."""
+        try:
+            conditions = self.current(location)
+        except (LookupError, requests.RequestException, KeyError, ValueError):
+            return f"Could not fetch weather for {location}."
+        return (f"The weather in {location} is {conditions['description']} "
+                f"with a temperature of {conditions['temp']}°C.")
+
+    def frequent(self, limit=3):
+        with self._lock:
+            return [location for location, _ in self.requested.most_common(limit)]
+
+    def prefetch(self, limit=3):
+        """
+        Refresh the favourites and the most frequently requested locations
+        unless they are still fresh for at least another half TTL.
+
+        Returns:
+            list: the locations fetched
+        """
+        fetched = []
+        for location in dict.fromkeys([self._normalise(f) for f in self.favourites] + self.frequent(limit)):
+            try:
+                place = self.geocode(location)
+                if place is None:
+                    continue
+                with self._lock:
+                    entry = self._conditions.get(self._coordinate_key(place))
+                if entry is None or self.clock() - entry[0] >= self.ttl / 2:
+                    self._fetch(place)
+                    fetched.append(location)
+            except requests.RequestException as e:
+                logger.error("Weather prefetch for %s failed: %s", location, e)
+        return fetched
+
+    def start_prefetch(self, interval=None, limit=3):
+        """Keep favourite and frequent locations warm from a background thread."""
+        interval = interval or self.ttl / 2
+
+        def run():
+            while not self._stop.is_set():
+                self.prefetch(limit)
+                self._stop.wait(interval)
+
+        if self._prefetcher is None or not self._prefetcher.is_alive():
+            self._stop.clear()
+            self._prefetcher = threading.Thread(target=run, name="weather-prefetch", daemon=True)
+            self._prefetcher.start()
+        return self._prefetcher
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "upstream_geocode": self.upstream["geocode"],
+            "upstream_weather": self.upstream["weather"],
+        }
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_service(api_key):
+    """Return the process-wide weather service for an API key, configured from the environment."""
+    with _services_lock:
+        service = _services.get(api_key)
+        if service is None:
+            favourites = [c.strip() for c in os.getenv("WEATHER_PREFETCH", "").split(",") if c.strip()]
+            service = WeatherService(api_key, ttl=float(os.getenv("WEATHER_TTL", "600")),
+                                     max_stale=float(os.getenv("WEATHER_MAX_STALE", "3600")),
+                                     favourites=favourites)
+            _services[api_key] = service
+    return service
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenWeatherMap endpoints Elven uses, for offline testing.
+
+Implements:
+    GET /geo/1.0/direct    city name -> coordinates
+    GET /data/2.5/weather  current conditions by lat/lon (or by q=city)
+
+Every upstream call is counted per endpoint, so tests can assert how many
+requests a cache really saved.
+
+Usage:
+    python3 weather_stub.py [--port 8002]
+    # then point Elven at it with OPENWEATHERMAP_API_URL=http://localhost:8002
+"""
+
+import argparse
+import threading
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+CITIES = {
+    "london": ("London", 51.5073, -0.1276, "GB"),
+    "paris": ("Paris", 48.8589, 2.3200, "FR"),
+    "new york": ("New York", 40.7127, -74.0060, "US"),
+    "tokyo": ("Tokyo", 35.6828, 139.7594, "JP"),
+    "manchester": ("Manchester", 53.4794, -2.2453, "GB"),
+    "edinburgh": ("Edinburgh", 55.9533, -3.1883, "GB"),
+}
+
+
+class WeatherStub:
+    """Fixed geography and adjustable conditions, with per-endpoint call counts."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.conditions = {}  # city key -> (temp, description)
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def reset(self):
+        self.__init__()
+
+    def set_conditions(self, city, temp, description):
+        with self._lock:
+            self.conditions[city.lower()] = (temp, description)
+
+    def fail_next(self, count=1, status=503):
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def _take_failure(self):
+        with self._lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def geocode(self, query):
+        city = CITIES.get(query.split(",")[0].strip().lower())
+        if city is None:
+            return []
+        name, lat, lon, country = city
+        return [{"name": name, "lat": lat, "lon": lon, "country": country}]
+
+    def weather(self, lat=None, lon=None, q=None):
+        for key, (name, city_lat, city_lon, country) in CITIES.items():
+            if (q and q.strip().lower() == key) or (lat is not None and abs(lat - city_lat) < 0.01
+                                                    and abs(lon - city_lon) < 0.01):
+                temp, description = self.conditions.get(key, (12.0, "light rain"))
+                return {"name": name, "coord": {"lat": city_lat, "lon": city_lon},
+                        "main": {"temp": temp}, "weather": [{"description": description}],
+                        "sys": {"country": country}}
+        return None
+
+
+def create_app(stub):
+    app = FastAPI(title="OpenWeatherMap stub")
+
+    def rejected(request, endpoint):
+        with stub._lock:
+            stub.calls[endpoint] += 1
+        status = stub._take_failure()
+        if status is not None:
+            return JSONResponse({"cod": status, "message": "injected failure"}, status_code=status)
+        if not request.query_params.get("appid"):
+            return JSONResponse({"cod": 401, "message": "Invalid API key"}, status_code=401)
+        return None
+
+    @app.get("/geo/1.0/direct")
+    def direct(request: Request):
+        return rejected(request, "geocode") or stub.geocode(request.query_params.get("q", ""))
+
+    @app.get("/data/2.5/weather")
+    def weather(request: Request):
+        error = rejected(request, "weather")
+        if error is not None:
+            return error
+        params = request.query_params
+        lat = float(params["lat"]) if "lat" in params else None
+        lon = float(params["lon"]) if "lon" in params else None
+        result = stub.weather(lat, lon, params.get("q"))
+        if result is None:
+            return JSONResponse({"cod": "404", "message": "city not found"}, status_code=404)
+        return result
+
+    return app
+
+
+stub = WeatherStub()
+app = create_app(stub)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenWeatherMap stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    args = parser.parse_args()
+    print(f"🌤️  OpenWeatherMap stub on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False)
+
+
+if __name__ == "__main__":
+    main()